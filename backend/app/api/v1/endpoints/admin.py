@@ -0,0 +1,124 @@
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import datetime, timedelta, timezone
+import secrets
+
+from app.core.config import settings
+from app.db.models.usage import DailyUsage, UsageEvent
+from app.db.session import get_db
+
+TOKEN_COLUMNS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+
+
+async def require_admin(x_admin_key: Optional[str] = Header(None)):
+    """Check the X-Admin-Key header; the admin API doesn't exist without ADMIN_API_KEY"""
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_key or not secrets.compare_digest(x_admin_key, settings.ADMIN_API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+def _since(days: int):
+    return datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+
+
+def _totals(row) -> dict:
+    """Token, image and cost totals of a result row"""
+    return {
+        "calls": int(row.calls or 0),
+        **{column: int(getattr(row, column) or 0) for column in TOKEN_COLUMNS},
+        "images": int(row.images or 0),
+        "cost_usd": round(float(row.cost_usd or 0), 6),
+    }
+
+
+@router.get("/usage/daily")
+async def get_daily_usage(
+    user_key: Optional[str] = None,
+    days: int = Query(7, ge=1, le=366),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Usage per user and day (UTC), most recent and most expensive first
+
+    - **user_key**: Only this user (user ID, "anon:<ip>" or "system")
+    - **days**: Number of days back, including today
+    """
+    query = select(DailyUsage).where(DailyUsage.day >= _since(days))
+    if user_key:
+        query = query.where(DailyUsage.user_key == user_key)
+    query = query.order_by(DailyUsage.day.desc(), DailyUsage.cost_usd.desc())
+    rows = (await db.execute(query)).scalars().all()
+
+    return {
+        "since": _since(days).isoformat(),
+        "days": [
+            {"user_key": row.user_key, "day": row.day.isoformat(), **_totals(row)}
+            for row in rows
+        ],
+        "total_cost_usd": round(sum(row.cost_usd for row in rows), 6),
+    }
+
+
+@router.get("/usage/users")
+async def get_top_users(
+    days: int = Query(7, ge=1, le=366),
+    limit: int = Query(50, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+):
+    """Users with the highest estimated cost over the last days"""
+    sums = [func.sum(getattr(DailyUsage, column)).label(column) for column in DailyUsage.TOTAL_COLUMNS]
+    query = (
+        select(DailyUsage.user_key, *sums)
+        .where(DailyUsage.day >= _since(days))
+        .group_by(DailyUsage.user_key)
+        .order_by(func.sum(DailyUsage.cost_usd).desc())
+        .limit(limit)
+    )
+    rows = (await db.execute(query)).all()
+
+    return {
+        "since": _since(days).isoformat(),
+        "users": [{"user_key": row.user_key, **_totals(row)} for row in rows],
+    }
+
+
+@router.get("/usage/jobs/{job_id}")
+async def get_job_usage(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Usage of one analysis or design job, broken down by call site and model"""
+    sums = [
+        func.count().label("calls"),
+        *[func.sum(getattr(UsageEvent, column)).label(column) for column in TOKEN_COLUMNS],
+        func.sum(UsageEvent.images).label("images"),
+        func.sum(UsageEvent.cost_usd).label("cost_usd"),
+    ]
+    query = (
+        select(UsageEvent.user_key, UsageEvent.kind, UsageEvent.call_site, UsageEvent.model, *sums)
+        .where(UsageEvent.job_id == job_id)
+        .group_by(UsageEvent.user_key, UsageEvent.kind, UsageEvent.call_site, UsageEvent.model)
+        .order_by(func.sum(UsageEvent.cost_usd).desc())
+    )
+    rows = (await db.execute(query)).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="No usage recorded for this job")
+
+    return {
+        "job_id": job_id,
+        "user_key": rows[0].user_key,
+        "kind": rows[0].kind,
+        "calls": [
+            {"call_site": row.call_site, "model": row.model, **_totals(row)}
+            for row in rows
+        ],
+        "total_cost_usd": round(sum(float(row.cost_usd or 0) for row in rows), 6),
+    }
@@ -1,21 +1,33 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends, Request
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
+import asyncio
 import uuid
 import base64
 import logging
 
-from app.services.vision_service import VisionService
-from app.services.segmentation_service import SegmentationService
+from app.services.analysis_localization import relocalize_result
+from app.services.analysis_pipeline import RoomAnalysisPipeline
 from app.services.storage_service import StorageService
+from app.api.v1.endpoints.users import get_current_user_id
 from app.core.config import settings
+from app.core.metering import metered_job
+from app.core.rate_limit import client_ip
+from app.core.uploads import ImageUploadReader
+from app.tasks.analysis_tasks import (
+    analyze_room_image,
+    cancel_batch,
+    get_batch_status,
+    start_batch_analysis,
+    summarize_batch,
+)
+from app.tasks.results import get_task_status
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 # Initialize services
-vision_service = VisionService()
-segmentation_service = SegmentationService()
+analysis_pipeline = RoomAnalysisPipeline()
 storage_service = StorageService()
 
 
@@ -37,25 +49,115 @@ class RoomAnalysisResponse(BaseModel):
     confidence: float
     image_url: str
     segmentation_url: Optional[str] = None
+    language: Optional[str] = None
 
 
 class AnalysisStatusResponse(BaseModel):
     id: str
-    status: str  # "pending", "processing", "completed", "failed"
+    status: str  # "pending", "processing", "completed", "failed", "cancelled" (batch members)
     progress: int  # 0-100
-    result: Optional[RoomAnalysisResponse] = None
+    result: Optional[RoomAnalysisResponse] = None  # Set while processing once vision analysis is done
+    stages: Optional[Dict[str, str]] = None  # Stage name -> pending/running/completed/failed/skipped
     error: Optional[str] = None
 
 
+class BatchAnalysisResponse(BaseModel):
+    id: str
+    status: str  # "pending", "processing", "completed", "cancelled"
+    progress: int  # 0-100
+    total: int
+    completed: int
+    failed: int
+    cancelled: int
+    jobs: List[dict]
+
+
 # In-memory storage for demo (use Redis in production)
 analysis_jobs: dict = {}
+# Batches run in process (background mode): batch ID -> member job IDs
+analysis_batches: dict = {}
+
+# Images of one in-process batch analyzed at the same time
+BATCH_CONCURRENCY = 4
+
+# Member job status -> Celery state, so both modes report batches the same way
+BATCH_JOB_STATES = {
+    "pending": "PENDING",
+    "processing": "STARTED",
+    "completed": "SUCCESS",
+    "failed": "FAILURE",
+    "cancelled": "REVOKED",
+}
+
+
+def request_user_key(user_id: Optional[str], request: Request) -> str:
+    """User ID, or "anon:<ip>" for anonymous requests (usage metering key)"""
+    return user_id or f"anon:{client_ip(request.scope)}"
+
+
+def new_analysis_job(file_url: str, content: bytes, sha256: str, language: str, user_key: str) -> dict:
+    """Initial analysis_jobs entry for an in-process analysis"""
+    return {
+        "status": "pending",
+        "progress": 0,
+        "image_url": file_url,
+        "image_data": base64.b64encode(content).decode("utf-8"),
+        "image_sha256": sha256,
+        "language": language,
+        "user_key": user_key,
+        "result": None,
+        "error": None,
+    }
+
+
+async def store_room_image(file: UploadFile, keep_content: bool = False) -> tuple:
+    """
+    Validate an uploaded room photo and stream it to storage
+    
+    The file is read in chunks straight into storage, so memory per request
+    stays bounded: the size limit is enforced while reading, the type is taken
+    from the file's magic bytes (not the client's content type) and the content
+    is hashed on the way through.
+    
+    Args:
+        file: Uploaded file
+        keep_content: Also return the file content (for in-process analysis)
+    
+    Returns:
+        (job_id, storage_key, file_url, content or None, sha256)
+    
+    Raises:
+        UploadRejected: Unsupported type (400) or over the size limit (413)
+    """
+    reader = ImageUploadReader(file)
+    content_type, extension = await reader.sniff()
+    
+    # Generate job ID
+    job_id = str(uuid.uuid4())
+    
+    kept = bytearray() if keep_content else None
+    
+    async def chunks():
+        async for chunk in reader.chunks():
+            if kept is not None:
+                kept.extend(chunk)
+            yield chunk
+    
+    # Store file (under our own name; the client's filename is not trusted)
+    storage_key = f"rooms/{job_id}/original.{extension}"
+    file_url = await storage_service.upload_stream(chunks(), storage_key, content_type)
+    
+    logger.info(f"Stored upload {storage_key} ({reader.size} bytes, {content_type}, sha256 {reader.sha256[:12]})")
+    return job_id, storage_key, file_url, bytes(kept) if kept is not None else None, reader.sha256
 
 
 @router.post("/upload", response_model=dict)
 async def upload_room_image(
     background_tasks: BackgroundTasks,
+    http_request: Request,
     file: UploadFile = File(...),
     language: str = "zh",
+    user_id: Optional[str] = Depends(get_current_user_id),
 ):
     """
     Upload room photo and start analysis
@@ -65,42 +167,28 @@ async def upload_room_image(
     
     Returns job ID for polling analysis results
     """
-    # Validate file type
-    allowed_types = ["image/jpeg", "image/png", "image/webp"]
-    if file.content_type not in allowed_types:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported file type. Supported types: {', '.join(allowed_types)}"
-        )
-    
-    # Validate file size (max 10MB)
-    content = await file.read()
-    if len(content) > 10 * 1024 * 1024:
-        raise HTTPException(
-            status_code=400,
-            detail="File size cannot exceed 10MB"
-        )
-    
-    # Generate job ID
-    job_id = str(uuid.uuid4())
-    
-    # Store file
-    file_url = await storage_service.upload_file(
-        content,
-        f"rooms/{job_id}/{file.filename}",
-        file.content_type
+    job_id, storage_key, file_url, content, sha256 = await store_room_image(
+        file, keep_content=settings.JOB_EXECUTION_MODE != "celery"
     )
+    user_key = request_user_key(user_id, http_request)
+    
+    # Hand off to the Celery analysis queue; status is read back from the result backend.
+    # Only the storage key goes through the broker, the worker loads the image itself.
+    if settings.JOB_EXECUTION_MODE == "celery":
+        with metered_job(job_id, user_key, "analysis"):
+            analyze_room_image.apply_async(
+                args=[job_id, None, file_url],
+                kwargs={"language": language, "storage_key": storage_key},
+                task_id=job_id,
+            )
+        return {
+            "id": job_id,
+            "status": "pending",
+            "message": "Image uploaded successfully, analysis in progress..."
+        }
     
     # Initialize job status
-    analysis_jobs[job_id] = {
-        "status": "pending",
-        "progress": 0,
-        "image_url": file_url,
-        "image_data": base64.b64encode(content).decode("utf-8"),
-        "language": language,
-        "result": None,
-        "error": None,
-    }
+    analysis_jobs[job_id] = new_analysis_job(file_url, content, sha256, language, user_key)
     
     # Start background analysis
     background_tasks.add_task(process_analysis, job_id, language)
@@ -112,8 +200,124 @@ async def upload_room_image(
     }
 
 
+@router.post("/batch", response_model=dict)
+async def upload_room_batch(
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    files: List[UploadFile] = File(...),
+    language: str = "zh",
+    user_id: Optional[str] = Depends(get_current_user_id),
+):
+    """
+    Upload many room photos and analyze them in parallel (on the Celery workers
+    in celery mode, a few at a time in the API process otherwise)
+    
+    - **files**: Room photo files (JPG, PNG, WebP)
+    - **language**: Response language ("zh" or "en")
+    
+    Returns batch ID for polling aggregated progress; each image also gets its own
+    job ID that works with `/status/{job_id}`
+    """
+    if len(files) > settings.MAX_BATCH_UPLOAD_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.MAX_BATCH_UPLOAD_FILES} images per batch"
+        )
+    
+    user_key = request_user_key(user_id, http_request)
+    in_process = settings.JOB_EXECUTION_MODE != "celery"
+    
+    items = []
+    for file in files:
+        job_id, storage_key, file_url, content, sha256 = await store_room_image(file, keep_content=in_process)
+        items.append({"job_id": job_id, "key": storage_key, "url": file_url})
+        if in_process:
+            analysis_jobs[job_id] = new_analysis_job(file_url, content, sha256, language, user_key)
+    
+    if in_process:
+        batch_id = str(uuid.uuid4())
+        analysis_batches[batch_id] = [item["job_id"] for item in items]
+        background_tasks.add_task(process_batch, batch_id, language)
+    else:
+        # Each member is metered as its own job (its task ID)
+        with metered_job(None, user_key, "analysis"):
+            batch_id = start_batch_analysis(items, language).id
+    
+    return {
+        "id": batch_id,
+        "status": "pending",
+        "jobs": [item["job_id"] for item in items],
+        "message": f"{len(items)} images uploaded, analysis in progress..."
+    }
+
+
+@router.get("/batch/{batch_id}", response_model=BatchAnalysisResponse)
+async def get_batch_status_endpoint(batch_id: str):
+    """
+    Get aggregated progress of a batch analysis
+    
+    - **batch_id**: Batch ID
+    """
+    if batch_id in analysis_batches:
+        batch = local_batch_status(batch_id)
+    elif settings.JOB_EXECUTION_MODE == "celery":
+        batch = get_batch_status(batch_id)
+    else:
+        batch = None
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return BatchAnalysisResponse(**batch)
+
+
+@router.delete("/batch/{batch_id}")
+async def cancel_batch_endpoint(batch_id: str):
+    """
+    Cancel a batch analysis; queued images are skipped
+    
+    - **batch_id**: Batch ID
+    """
+    if batch_id in analysis_batches:
+        # Images not yet started are skipped; running ones finish
+        for job_id in analysis_batches[batch_id]:
+            if analysis_jobs[job_id]["status"] == "pending":
+                analysis_jobs[job_id]["status"] = "cancelled"
+    elif settings.JOB_EXECUTION_MODE != "celery" or not cancel_batch(batch_id):
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return {"id": batch_id, "status": "cancelled"}
+
+
+def local_batch_status(batch_id: str) -> dict:
+    """Aggregated progress of an in-process batch, in the shape of get_batch_status"""
+    jobs = [
+        {"job_id": job_id, "state": BATCH_JOB_STATES.get(analysis_jobs[job_id]["status"], "PENDING")}
+        for job_id in analysis_batches[batch_id]
+    ]
+    return summarize_batch(batch_id, jobs)
+
+
+async def process_batch(batch_id: str, language: str = "zh"):
+    """Background task analyzing the images of a batch, BATCH_CONCURRENCY at a time"""
+    limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def analyze(job_id: str):
+        async with limit:
+            if analysis_jobs[job_id]["status"] != "pending":
+                return  # Cancelled while waiting
+            await process_analysis(job_id, language)
+    
+    await asyncio.gather(*(analyze(job_id) for job_id in analysis_batches[batch_id]))
+    logger.info(f"Batch {batch_id} finished")
+
+
 async def process_analysis(job_id: str, language: str = "zh"):
     """Background task to process room analysis"""
+    job = analysis_jobs.get(job_id) or {}
+    with metered_job(job_id, job.get("user_key"), "analysis"):
+        await run_analysis_job(job_id, language)
+
+
+async def run_analysis_job(job_id: str, language: str = "zh"):
+    """Analyze the image of a job in analysis_jobs"""
     try:
         job = analysis_jobs.get(job_id)
         if not job:
@@ -123,42 +327,27 @@ async def process_analysis(job_id: str, language: str = "zh"):
         job["status"] = "processing"
         job["progress"] = 10
         
-        # Step 1: GPT-4 Vision Analysis
-        logger.info(f"Starting GPT-4 Vision analysis for job {job_id} (language: {language})")
-        job["progress"] = 20
-        
-        analysis_result = await vision_service.analyze_room(job["image_data"], language)
-        job["progress"] = 50
+        # Vision analysis and segmentation run concurrently; the vision result is
+        # published as soon as it's ready while segmentation finishes
+        logger.info(f"Starting room analysis for job {job_id} (language: {language})")
         
-        # Step 2: SAM Segmentation (optional)
-        logger.info(f"Starting segmentation for job {job_id}")
-        job["progress"] = 60
+        async def on_progress(progress, stages, partial_result):
+            job["progress"] = progress
+            job["stages"] = stages
+            job["result"] = partial_result
         
-        segmentation_url = None
-        try:
-            segmentation_result = await segmentation_service.segment_image(
-                job["image_data"]
-            )
-            if segmentation_result:
-                segmentation_url = await storage_service.upload_file(
-                    base64.b64decode(segmentation_result),
-                    f"rooms/{job_id}/segmentation.png",
-                    "image/png"
-                )
-        except Exception as e:
-            logger.warning(f"Segmentation failed: {e}")
-        
-        job["progress"] = 90
+        result = await analysis_pipeline.run(
+            job_id,
+            job["image_data"],
+            job["image_url"],
+            language,
+            on_progress=on_progress,
+        )
         
         # Complete
         job["status"] = "completed"
         job["progress"] = 100
-        job["result"] = {
-            "id": job_id,
-            "image_url": job["image_url"],
-            "segmentation_url": segmentation_url,
-            **analysis_result
-        }
+        job["result"] = result
         
         logger.info(f"Analysis completed for job {job_id}")
         
@@ -169,24 +358,33 @@ async def process_analysis(job_id: str, language: str = "zh"):
 
 
 @router.get("/status/{job_id}", response_model=AnalysisStatusResponse)
-async def get_analysis_status(job_id: str):
+async def get_analysis_status(job_id: str, language: Optional[str] = None):
     """
     Get analysis job status
     
     - **job_id**: Job ID
+    - **language**: Return the result in this language ("zh" or "en"); switching
+      language re-localizes the stored analysis instead of analyzing the photo again
     """
     job = analysis_jobs.get(job_id)
+    if not job and settings.JOB_EXECUTION_MODE == "celery":
+        job = get_task_status(job_id)
     if not job:
         raise HTTPException(
             status_code=404,
             detail="任务不存在"
         )
     
+    result = job.get("result")
+    if result and language:
+        result = await relocalize_result(result, language)
+    
     return AnalysisStatusResponse(
         id=job_id,
         status=job["status"],
         progress=job["progress"],
-        result=job.get("result"),
+        result=result,
+        stages=job.get("stages"),
         error=job.get("error"),
     )
 
@@ -1,13 +1,21 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, Request
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
 import uuid
 import logging
 
 from app.services.design_service import DesignService
-from app.services.image_generation_service import ImageGenerationService
+from app.services.image_generation_service import GenerationBudget, ImageGenerationService
 from app.services.furniture_matching_service import FurnitureMatchingService
 from app.api.v1.endpoints.analysis import analysis_jobs  # Import to get source image
+from app.api.v1.endpoints.users import get_current_user_id, get_user_by_id
+from app.core.config import settings
+from app.core.metering import metered_job
+from app.core.rate_limit import client_ip
+from app.tasks.design_tasks import generate_design_proposals
+from app.tasks.results import get_completed_result, get_task_status
+from app.tasks.scheduling import QuotaExceeded, admit_design_job
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -82,6 +90,8 @@ design_jobs: dict = {}
 async def generate_designs(
     background_tasks: BackgroundTasks,
     request: dict,
+    http_request: Request,
+    user_id: Optional[str] = Depends(get_current_user_id),
 ):
     """
     Generate design proposals
@@ -125,6 +135,37 @@ async def generate_designs(
             source_image = analysis_job["image_data"]
             logger.info(f"Found source image for img2img from analysis {analysis_id}")
     
+    # Usage is metered and quotas apply per user key
+    user = get_user_by_id(user_id) if user_id else None
+    user_key = user_id if user else f"anon:{client_ip(http_request.scope)}"
+    
+    # Hand off to the Celery design queue; status is read back from the result backend
+    if settings.JOB_EXECUTION_MODE == "celery":
+        # Premium users get their own queue and higher priority; quotas apply per user and tier.
+        # Admission makes blocking Redis and result backend calls, so it runs off the event loop.
+        try:
+            routing = await asyncio.to_thread(admit_design_job, job_id, user_key, bool(user and user.get("is_premium")))
+        except QuotaExceeded as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+        
+        analysis_data = {}
+        if analysis_id and analysis_id != "demo":
+            analysis_job = analysis_jobs.get(analysis_id)
+            analysis_data = (analysis_job or {}).get("result") or get_completed_result(analysis_id) or {}
+        
+        with metered_job(job_id, user_key, "design"):
+            generate_design_proposals.apply_async(
+                args=[job_id, analysis_data, normalized_prefs],
+                kwargs={"language": language, "routing": routing},
+                task_id=job_id,
+                **routing,
+            )
+        return {
+            "id": job_id,
+            "status": "pending",
+            "message": "Generating design proposals..."
+        }
+    
     # Initialize job
     design_jobs[job_id] = {
         "status": "pending",
@@ -133,6 +174,7 @@ async def generate_designs(
         "preferences": normalized_prefs,
         "source_image": source_image,  # Store source image for img2img
         "language": language,  # Store language for generation
+        "user_key": user_key,
         "proposals": None,
         "error": None,
     }
@@ -149,6 +191,13 @@ async def generate_designs(
 
 async def process_design_generation(job_id: str):
     """Background task to generate design proposals"""
+    job = design_jobs.get(job_id) or {}
+    with metered_job(job_id, job.get("user_key"), "design"):
+        await generate_design_job(job_id)
+
+
+async def generate_design_job(job_id: str):
+    """Generate the proposals of a design job in design_jobs"""
     try:
         job = design_jobs.get(job_id)
         if not job:
@@ -165,11 +214,7 @@ async def process_design_generation(job_id: str):
         job["progress"] = 20
         
         # Combine all user requirements for strict adherence
-        all_user_requirements = preferences.get("special_needs", "")
-        if preferences.get("room_description"):
-            all_user_requirements = f"Room condition: {preferences['room_description']}. " + all_user_requirements
-        if preferences.get("additional_notes"):
-            all_user_requirements += f" Additional requirements: {preferences['additional_notes']}"
+        all_user_requirements = design_service.combine_user_requirements(preferences)
         
         concepts = await design_service.generate_concepts(
             style=preferences["style"],
@@ -180,31 +225,25 @@ async def process_design_generation(job_id: str):
         )
         job["progress"] = 40
         
-        # Step 2: Generate images for each concept
-        import asyncio
+        # Step 2: Generate images for all concepts. Concepts with identical prompts
+        # share one multi-output prediction; the rest start 12 seconds apart to
+        # stay under Replicate's burst limit. Untouched template concepts are
+        # served from the pre-rendered style gallery whenever it has them.
         proposals = []
-        for i, concept in enumerate(concepts):
-            logger.info(f"Generating image for concept {i+1}")
-            job["progress"] = 40 + (i * 15)
-            
-            # Wait between requests to avoid rate limiting (Replicate burst limit)
-            if i > 0:
-                logger.info(f"Waiting 12 seconds before next image generation to avoid rate limit...")
-                await asyncio.sleep(12)
-            
-            # Generate image (use img2img if source image available)
-            source_image = job.get("source_image")
-            image_url = await image_gen_service.generate_room_image(
-                concept["prompt"],
-                style=preferences["style"],
-                source_image=source_image,  # Pass source image for img2img
-            )
-            
+        prompts = [concept["prompt"] for concept in concepts]
+        image_urls = await image_gen_service.generate_room_images(
+            prompts,
+            style=DesignService.normalize_style(preferences["style"]),
+            source_image=job.get("source_image"),  # Pass source image for img2img
+            budget=GenerationBudget(),
+            stagger_seconds=12,
+            cache_hit_rate=1.0 if all(map(DesignService.is_template_prompt, prompts)) else None,
+        )
+        job["progress"] = 70
+        
+        for i, (concept, image_url) in enumerate(zip(concepts, image_urls)):
             # Match furniture with user needs
-            # Combine requirements and special_needs for brand/item detection
-            user_needs = " ".join(preferences.get("requirements", []))
-            if preferences.get("special_needs"):
-                user_needs += " " + preferences.get("special_needs", "")
+            user_needs = design_service.furniture_needs(preferences)
             
             furniture = await furniture_service.match_furniture(
                 style=preferences["style"],
@@ -249,6 +288,15 @@ async def process_design_generation(job_id: str):
 async def get_design_status(job_id: str):
     """Get design generation status"""
     job = design_jobs.get(job_id)
+    if not job and settings.JOB_EXECUTION_MODE == "celery":
+        task_status = get_task_status(job_id)
+        return {
+            "id": job_id,
+            "status": task_status["status"],
+            "progress": task_status["progress"],
+            "proposals": task_status["result"],
+            "error": task_status["error"],
+        }
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
@@ -1,7 +1,11 @@
 from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from functools import lru_cache
 from typing import List, Optional
+import json
 import logging
+import urllib.parse
 
 from app.services.furniture_matching_service import FurnitureMatchingService
 
@@ -159,6 +163,55 @@ async def match_furniture_for_design(
     }
 
 
+@router.get("/match/stream")
+async def stream_furniture_matches(
+    style: str,
+    room_type: str,
+    budget: float,
+    user_needs: str = "",
+    region: str = "CA",
+    language: str = "zh",
+    existing_furniture: Optional[List[str]] = Query(None),
+):
+    """
+    Stream furniture matches as Server-Sent Events
+    
+    Emits a `product` event for each recommended item as soon as Claude produces it,
+    followed by a final `done` event with the cost summary.
+    """
+    async def event_stream():
+        total_cost = 0.0
+        count = 0
+        async for product in furniture_service.match_furniture_stream(
+            style=style,
+            room_type=room_type,
+            budget=budget,
+            user_needs=user_needs,
+            region=region,
+            exclude=existing_furniture or [],
+            language=language,
+        ):
+            total_cost += product["price"]
+            count += 1
+            yield f"event: product\ndata: {json.dumps(product, ensure_ascii=False)}\n\n"
+        
+        summary = {
+            "count": count,
+            "total_cost": total_cost,
+            "within_budget": total_cost <= budget,
+        }
+        yield f"event: done\ndata: {json.dumps(summary)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Disable proxy buffering so events flush immediately
+        },
+    )
+
+
 @router.post("/shopping-list/create")
 async def create_shopping_list(design_id: str, items: List[dict]):
     """Create shopping list"""
@@ -179,21 +232,31 @@ async def download_shopping_list_pdf(list_id: str):
     return {"message": "PDF download feature under development", "list_id": list_id}
 
 
-def generate_search_links(product_name: str, brand: str) -> dict:
-    """Generate search links for multiple e-commerce platforms"""
-    import urllib.parse
-    
+# Catalog search URLs, split around the query so links are built by concatenation
+CATALOG_LINK_TEMPLATES = (
+    ("taobao", "https://s.taobao.com/search?q="),
+    ("jd", "https://search.jd.com/Search?keyword="),
+    ("tmall", "https://list.tmall.com/search_product.htm?q="),
+    ("amazon", "https://www.amazon.cn/s?k="),
+)
+CATALOG_IKEA_TEMPLATE = "https://www.ikea.cn/cn/zh/search/?q="
+
+
+@lru_cache(maxsize=1024)
+def _compiled_catalog_links(product_name: str, brand: str) -> tuple:
+    """Build (platform, url) pairs for a catalog product (cached)"""
     # Use product name + brand for better search results
     search_query = f"{brand} {product_name}" if brand else product_name
     encoded_query = urllib.parse.quote(search_query)
     
-    return {
-        "taobao": f"https://s.taobao.com/search?q={encoded_query}",
-        "jd": f"https://search.jd.com/Search?keyword={encoded_query}",
-        "tmall": f"https://list.tmall.com/search_product.htm?q={encoded_query}",
-        "amazon": f"https://www.amazon.cn/s?k={encoded_query}",
-        "ikea": f"https://www.ikea.cn/cn/zh/search/?q={urllib.parse.quote(product_name)}",
-    }
+    links = [(platform, f"{prefix}{encoded_query}") for platform, prefix in CATALOG_LINK_TEMPLATES]
+    links.append(("ikea", f"{CATALOG_IKEA_TEMPLATE}{urllib.parse.quote(product_name)}"))
+    return tuple(links)
+
+
+def generate_search_links(product_name: str, brand: str) -> dict:
+    """Generate search links for multiple e-commerce platforms"""
+    return dict(_compiled_catalog_links(product_name, brand or ""))
 
 
 @router.get("/products")
@@ -8,12 +8,14 @@ import json
 import logging
 from pathlib import Path
 
+from app.core.config import settings
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 # Database setup
-DB_PATH = Path(__file__).parent.parent.parent.parent / "data" / "users.db"
+DB_PATH = Path(settings.USERS_DB_PATH or Path(__file__).parent.parent.parent.parent / "data" / "users.db")
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
 
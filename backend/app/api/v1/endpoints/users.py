@@ -17,7 +17,7 @@ logger = logging.getLogger(__name__)
 import sqlite3
 from pathlib import Path
 
-DB_PATH = Path(__file__).parent.parent.parent.parent / "data" / "users.db"
+DB_PATH = Path(settings.USERS_DB_PATH or Path(__file__).parent.parent.parent.parent / "data" / "users.db")
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
 def get_db_connection():
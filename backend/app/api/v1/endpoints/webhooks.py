@@ -0,0 +1,41 @@
+from fastapi import APIRouter, HTTPException, Request
+import json
+import logging
+
+from app.core.config import settings
+from app.services.replicate_predictions import (
+    TERMINAL_STATUSES,
+    get_prediction_waiter,
+    verify_webhook_signature,
+)
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.post("/replicate")
+async def replicate_webhook(request: Request):
+    """
+    Completion callback for Replicate predictions
+    
+    Wakes up the generation waiting on the prediction, in this process or any
+    other API/Celery worker.
+    """
+    body = await request.body()
+    
+    # Never unsigned: the output URLs are served to users and stored in the shared cache
+    if not settings.REPLICATE_WEBHOOK_SECRET or not verify_webhook_signature(request.headers, body):
+        logger.warning("Rejected Replicate webhook with invalid signature")
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+    
+    try:
+        prediction = json.loads(body)
+        prediction_id = prediction["id"]
+    except (ValueError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid prediction payload")
+    
+    if prediction.get("status") in TERMINAL_STATUSES:
+        logger.info(f"Prediction {prediction_id} finished: {prediction['status']}")
+        await get_prediction_waiter().publish(prediction)
+    
+    return {"received": True}
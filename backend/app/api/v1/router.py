@@ -1,11 +1,13 @@
 from fastapi import APIRouter
 
 from app.api.v1.endpoints import (
+    admin,
     analysis,
     design,
     furniture,
     users,
     projects,
+    webhooks,
 )
 
 api_router = APIRouter()
@@ -41,3 +43,14 @@ api_router.include_router(
     tags=["项目管理"]
 )
 
+api_router.include_router(
+    webhooks.router,
+    prefix="/webhooks",
+    tags=["Webhooks"]
+)
+
+api_router.include_router(
+    admin.router,
+    prefix="/admin",
+    tags=["Admin"]
+)
@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.schedules import crontab
 from app.core.config import settings
 
 celery_app = Celery(
@@ -9,6 +10,7 @@ celery_app = Celery(
         "app.tasks.analysis_tasks",
         "app.tasks.design_tasks",
         "app.tasks.export_tasks",
+        "app.tasks.gallery_tasks",
     ],
 )
 
@@ -25,7 +27,15 @@ celery_app.conf.update(
     worker_prefetch_multiplier=1,
     task_acks_late=True,
     task_reject_on_worker_lost=True,
-    result_expires=3600,  # 1 hour
+    result_expires=settings.JOB_RESULT_TTL,
+    # Redis priority levels: 0 is highest. Workers consume queues in the order
+    # given to -Q, so list design_premium first.
+    task_default_priority=5,
+    broker_transport_options={
+        "priority_steps": list(range(10)),
+        "sep": ":",
+        "queue_order_strategy": "priority",
+    },
 )
 
 # Task routing
@@ -33,6 +43,16 @@ celery_app.conf.task_routes = {
     "app.tasks.analysis_tasks.*": {"queue": "analysis"},
     "app.tasks.design_tasks.*": {"queue": "design"},
     "app.tasks.export_tasks.*": {"queue": "export"},
+    "app.tasks.gallery_tasks.*": {"queue": "design"},
+}
+
+# Periodic tasks (run by the celery-beat service)
+celery_app.conf.beat_schedule = {
+    "warm-style-gallery": {
+        "task": "app.tasks.gallery_tasks.warm_style_gallery",
+        "schedule": crontab(hour=3, minute=0),  # Nightly, in the configured timezone
+        "options": {"priority": 9},  # Behind any user job waiting on the design queue
+    },
 }
 
 # Rate limiting
@@ -40,6 +60,12 @@ celery_app.conf.task_annotations = {
     "app.tasks.design_tasks.generate_design_image": {
         "rate_limit": "10/m",  # 10 per minute
     },
+    "app.tasks.design_tasks.generate_concept_proposal": {
+        "rate_limit": "10/m",  # One image generation per concept
+    },
+    "app.tasks.design_tasks.generate_concept_batch": {
+        "rate_limit": "10/m",  # One multi-output prediction per batch
+    },
     "app.tasks.analysis_tasks.analyze_room_image": {
         "rate_limit": "20/m",  # 20 per minute
     },
@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import provider_calls
+from app.core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Calls slower than this count against a provider like errors (seconds)
+DEFAULT_SLOW_CALL_SECONDS = 90.0
+PROVIDER_SLOW_CALL_SECONDS = {
+    "dalle3": 60.0,
+    "flux-pro": 60.0,
+    "flux-dev": 60.0,
+    "flux-schnell": 20.0,
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open"""
+
+
+class ProviderBreaker:
+    """
+    Circuit breaker and adaptive concurrency limit for one external provider
+
+    Keeps a rolling window of call outcomes and latencies. When the error rate
+    or the share of slow calls in the window crosses the threshold the circuit
+    opens and calls fail fast with CircuitOpenError; after a cooldown a single
+    probe call is let through (half open) and its outcome closes or reopens it.
+
+    Concurrency follows AIMD: the limit grows by one per "limit" fast successes
+    and halves on an error or slow call, so each provider settles near the
+    concurrency it can actually sustain.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: float = None,
+        min_calls: int = None,
+        failure_threshold: float = None,
+        open_seconds: float = None,
+        slow_call_seconds: float = None,
+        initial_limit: float = None,
+        max_limit: float = None,
+    ):
+        self.name = name
+        self.window = window or settings.CIRCUIT_BREAKER_WINDOW
+        self.min_calls = min_calls or settings.CIRCUIT_BREAKER_MIN_CALLS
+        self.failure_threshold = failure_threshold or settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD
+        self.open_seconds = open_seconds or settings.CIRCUIT_BREAKER_OPEN_SECONDS
+        self.slow_call_seconds = slow_call_seconds or PROVIDER_SLOW_CALL_SECONDS.get(name, DEFAULT_SLOW_CALL_SECONDS)
+        self.min_limit = 1.0
+        self.max_limit = max_limit or settings.PROVIDER_MAX_CONCURRENCY
+        self.limit = min(initial_limit or settings.PROVIDER_INITIAL_CONCURRENCY, self.max_limit)
+
+        self._lock = threading.Lock()
+        self._calls: deque = deque()  # (finished_at, ok, slow, latency)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._waiters: deque = deque()  # Futures of calls waiting for a concurrency slot
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def _prune(self, now: float) -> None:
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+
+    def _allow(self) -> bool:
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record(self, ok: bool, latency: float) -> None:
+        """Record one finished call and update the circuit state and limit"""
+        now = time.monotonic()
+        slow = latency >= self.slow_call_seconds
+        provider_calls.inc(self.name, "error" if not ok else "slow" if slow else "ok")
+        with self._lock:
+            self._calls.append((now, ok, slow, latency))
+            self._prune(now)
+
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+                if ok and not slow:
+                    self._state = CLOSED
+                    self._calls.clear()
+                    logger.info(f"Circuit for {self.name} closed")
+                else:
+                    self._trip(now)
+            elif self._state == CLOSED and len(self._calls) >= self.min_calls:
+                failures = sum(1 for _, call_ok, call_slow, _ in self._calls if not call_ok or call_slow)
+                if failures / len(self._calls) >= self.failure_threshold:
+                    self._trip(now)
+
+            # AIMD: additive increase per window of fast successes, multiplicative
+            # decrease at most once per slow-call period so one burst of failures
+            # doesn't collapse the limit to the floor
+            if ok and not slow:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            elif now - self._last_decrease >= min(self.slow_call_seconds, 5.0):
+                self.limit = max(self.min_limit, self.limit / 2)
+                self._last_decrease = now
+
+    def _trip(self, now: float) -> None:
+        if self._state != OPEN:
+            logger.warning(f"Circuit for {self.name} opened for {self.open_seconds:.0f}s")
+        self._state = OPEN
+        self._opened_at = now
+
+    def latency_percentile(self, q: float) -> Optional[float]:
+        """Latency percentile of successful calls in the window, None without data"""
+        with self._lock:
+            self._prune(time.monotonic())
+            latencies = sorted(latency for _, ok, _, latency in self._calls if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+    async def _acquire(self) -> None:
+        while self._in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Pass the wake-up on if this waiter had already been chosen
+                self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self._in_flight += 1
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        free = int(self.limit) - self._in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, timeout: float = None, **kwargs) -> Any:
+        """
+        Call a provider through the breaker
+
+        Args:
+            func: Coroutine function making the provider call
+            timeout: Optional timeout in seconds; a timeout counts as a failure
+
+        Raises:
+            CircuitOpenError: If the circuit is open (the call is not made)
+        """
+        if not self._allow():
+            provider_calls.inc(self.name, "circuit_open")
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+        # The span includes any wait for a concurrency slot
+        with span(f"provider.{self.name}"):
+            return await self._call(func, *args, timeout=timeout, **kwargs)
+
+    async def _call(self, func: Callable[..., Awaitable[Any]], *args, timeout: float = None, **kwargs) -> Any:
+        try:
+            await self._acquire()
+        except asyncio.CancelledError:
+            with self._lock:
+                self._probe_in_flight = False
+            raise
+
+        start = time.monotonic()
+        ok = False
+        cancelled = False
+        try:
+            result = await asyncio.wait_for(func(*args, **kwargs), timeout)
+            ok = True
+            return result
+        except asyncio.CancelledError:
+            # Cancelled by the caller (e.g. a lost hedge), not the provider's fault
+            cancelled = True
+            raise
+        finally:
+            self._release()
+            if cancelled:
+                with self._lock:
+                    self._probe_in_flight = False
+            else:
+                self.record(ok, time.monotonic() - start)
+                self._wake()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            self._prune(now)
+            calls = list(self._calls)
+
+        failures = sum(1 for _, ok, _, _ in calls if not ok)
+        slow = sum(1 for _, ok, call_slow, _ in calls if ok and call_slow)
+        return {
+            "state": state,
+            "calls": len(calls),
+            "error_rate": round(failures / len(calls), 4) if calls else 0.0,
+            "slow_rate": round(slow / len(calls), 4) if calls else 0.0,
+            "p50_latency": self.latency_percentile(0.5),
+            "p90_latency": self.latency_percentile(0.9),
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self._in_flight,
+        }
+
+
+class ProviderBreakers:
+    """Registry of breakers by provider name"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, ProviderBreaker] = {}
+
+    def get(self, name: str) -> ProviderBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = ProviderBreaker(name)
+            return breaker
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+
+provider_breakers = ProviderBreakers()
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+# One pooled client per event loop: the API server has a single loop, and each
+# Celery worker process runs one long-lived loop (see app.tasks.runtime)
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared AsyncClient for the running event loop, creating it on first use"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(timeout=60.0, limits=HTTP_LIMITS)
+        _clients[loop] = client
+    return client
+
+
+class _SharedClientView:
+    """Shared client with a per-call default timeout"""
+
+    def __init__(self, client: httpx.AsyncClient, timeout: float):
+        self._client = client
+        self._timeout = timeout
+
+    async def get(self, url, **kwargs) -> httpx.Response:
+        kwargs.setdefault("timeout", self._timeout)
+        return await self._client.get(url, **kwargs)
+
+    async def post(self, url, **kwargs) -> httpx.Response:
+        kwargs.setdefault("timeout", self._timeout)
+        return await self._client.post(url, **kwargs)
+
+    def stream(self, method: str, url, **kwargs):
+        kwargs.setdefault("timeout", self._timeout)
+        return self._client.stream(method, url, **kwargs)
+
+
+@asynccontextmanager
+async def shared_http_client(timeout: float = 60.0) -> AsyncIterator[_SharedClientView]:
+    """
+    Borrow the loop's shared client, keeping connections alive between calls
+
+    Drop-in replacement for `async with httpx.AsyncClient(timeout=...) as client`;
+    the client is not closed on exit.
+    """
+    yield _SharedClientView(get_http_client(), timeout)
+
+
+async def close_http_client() -> None:
+    """Close the shared client for the running event loop"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
@@ -0,0 +1,188 @@
+import json
+import re
+from typing import List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+# Characters that matter when scanning for balanced objects; everything else is
+# skipped by the regex engine instead of a Python-level loop
+_STRUCTURAL_CHARS = re.compile(r'[{}"\\]')
+_DECODER = json.JSONDecoder()
+
+
+def iter_json_objects(content: str):
+    """
+    Yield every top-level JSON object embedded in free-form text
+
+    Single linear pass: braces are matched while tracking string literals and
+    escapes, and each balanced span is parsed once. Spans that fail to parse are
+    skipped as a whole, so no input is rescanned.
+    """
+    depth = 0
+    start = -1
+    in_string = False
+    skip_until = -1
+
+    for match in _STRUCTURAL_CHARS.finditer(content):
+        pos = match.start()
+        if pos < skip_until:
+            continue
+        char = match.group()
+
+        if in_string:
+            if char == "\\":
+                skip_until = pos + 2
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            # Strings only matter inside an object
+            in_string = depth > 0
+        elif char == "{":
+            if depth == 0:
+                start = pos
+            depth += 1
+        elif char == "}" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                try:
+                    obj = json.loads(content[start:pos + 1])
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(obj, dict):
+                    yield obj
+
+
+def _matches_schema(obj, schema: Optional[Type[BaseModel]]) -> bool:
+    if not isinstance(obj, dict):
+        return False
+    if schema is None:
+        return True
+    try:
+        schema.model_validate(obj)
+    except ValidationError:
+        return False
+    return True
+
+
+def extract_json(content: str, schema: Optional[Type[BaseModel]] = None) -> dict:
+    """
+    Extract the first valid JSON object from a model response
+
+    Handles bare JSON, markdown code fences and objects surrounded by prose.
+
+    Args:
+        content: Raw model output
+        schema: Optional pydantic model; objects that fail validation are skipped
+
+    Returns:
+        The first matching JSON object
+
+    Raises:
+        ValueError: If no (valid) JSON object is found
+    """
+    # Fast path: well-behaved responses start their JSON at the first brace,
+    # which the C decoder handles without a Python-level scan
+    start = content.find("{")
+    if start == -1:
+        raise ValueError("Could not extract JSON from response")
+    try:
+        obj, _ = _DECODER.raw_decode(content, start)
+        if _matches_schema(obj, schema):
+            return obj
+    except json.JSONDecodeError:
+        pass
+
+    for obj in iter_json_objects(content):
+        if _matches_schema(obj, schema):
+            return obj
+
+    raise ValueError("Could not extract JSON from response")
+
+
+class StreamingArrayParser:
+    """
+    Incrementally parse objects from a JSON array inside a streamed model response
+
+    Text is fed in arbitrary chunks (e.g. streaming deltas). Each object in the
+    array under `array_key` is returned as soon as its closing brace arrives,
+    without waiting for the rest of the document. Surrounding prose and
+    markdown code fences are ignored.
+    """
+
+    def __init__(self, array_key: str = "products"):
+        self._array_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(array_key))
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._obj_start = -1
+
+    @property
+    def done(self) -> bool:
+        """True once the closing bracket of the array has been seen"""
+        return self._done
+
+    @property
+    def text(self) -> str:
+        """All text fed so far"""
+        return self._buffer
+
+    def feed(self, chunk: str) -> List[dict]:
+        """
+        Feed the next chunk of text
+
+        Returns:
+            Objects completed by this chunk, in order
+        """
+        self._buffer += chunk
+        if self._done:
+            return []
+
+        if not self._in_array:
+            match = self._array_pattern.search(self._buffer)
+            if not match:
+                return []
+            self._in_array = True
+            self._pos = match.end()
+
+        completed = []
+        buffer = self._buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._obj_start = i
+                self._depth += 1
+            elif char == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        obj = json.loads(buffer[self._obj_start:i + 1])
+                    except json.JSONDecodeError:
+                        obj = None
+                    if isinstance(obj, dict):
+                        completed.append(obj)
+            elif char == "]" and self._depth == 0:
+                self._done = True
+                self._pos = i + 1
+                return completed
+
+        self._pos = len(buffer)
+        return completed
@@ -0,0 +1,64 @@
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List
+
+
+class KeywordMatcher:
+    """
+    Case-insensitive multi-keyword matcher (Aho-Corasick)
+
+    Keywords are grouped under tags and compiled once into a single automaton,
+    so finding every tag whose keywords occur in a text is one pass over the
+    text however many keywords there are. Matching is by substring, like the
+    `keyword in text.lower()` checks it replaces.
+    """
+
+    def __init__(self, keywords: Dict[str, Iterable[str]]):
+        # State 0 is the root; each state has goto transitions, a failure link
+        # and the tags of every keyword ending there (including via failure links)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[FrozenSet[str]] = [frozenset()]
+
+        outputs = [set()]
+        for tag, words in keywords.items():
+            for word in words:
+                state = 0
+                for char in word.lower():
+                    next_state = self._goto[state].get(char)
+                    if next_state is None:
+                        next_state = len(self._goto)
+                        self._goto[state][char] = next_state
+                        self._goto.append({})
+                        self._fail.append(0)
+                        outputs.append(set())
+                    state = next_state
+                outputs[state].add(tag)
+
+        # Breadth-first so a state's failure target is complete before its
+        # children; the root's children fail back to the root
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                outputs[child] |= outputs[self._fail[child]]
+
+        self._output = [frozenset(tags) for tags in outputs]
+
+    def tags(self, *texts: str) -> FrozenSet[str]:
+        """Tags with at least one keyword occurring in any of the texts"""
+        found = set()
+        goto, fail, output = self._goto, self._fail, self._output
+        for text in texts:
+            state = 0
+            for char in (text or "").lower():
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+                if output[state]:
+                    found |= output[state]
+        return frozenset(found)
@@ -0,0 +1,138 @@
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metering import usage_meter
+
+logger = logging.getLogger(__name__)
+
+
+ANTHROPIC_MESSAGES_URL = f"{settings.ANTHROPIC_API_BASE}/v1/messages"
+
+USAGE_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+
+
+# USD per million tokens (input, output) by model ID prefix. Cache writes cost
+# 1.25x the input rate and cache reads 0.1x.
+MODEL_PRICING = {
+    "claude-3-haiku": (0.25, 1.25),
+    "claude-3-5-haiku": (0.80, 4.00),
+    "claude-haiku-4": (1.00, 5.00),
+    "claude-3-5-sonnet": (3.00, 15.00),
+    "claude-3-7-sonnet": (3.00, 15.00),
+    "claude-sonnet-4": (3.00, 15.00),
+    "claude-3-opus": (15.00, 75.00),
+    "claude-opus-4": (15.00, 75.00),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+# Unknown models are priced like Sonnet rather than as free
+DEFAULT_PRICING = (3.00, 15.00)
+
+
+def model_pricing(model: Optional[str]) -> Tuple[float, float]:
+    """(input, output) USD per million tokens for a model ID"""
+    matches = [prefix for prefix in MODEL_PRICING if model and model.startswith(prefix)]
+    return MODEL_PRICING[max(matches, key=len)] if matches else DEFAULT_PRICING
+
+
+def estimate_llm_cost(model: Optional[str], tokens: Dict[str, int]) -> float:
+    """Estimated USD cost of one Messages API call from its token counts"""
+    input_rate, output_rate = model_pricing(model)
+    return (
+        tokens.get("input_tokens", 0) * input_rate
+        + tokens.get("cache_creation_input_tokens", 0) * input_rate * 1.25
+        + tokens.get("cache_read_input_tokens", 0) * input_rate * 0.1
+        + tokens.get("output_tokens", 0) * output_rate
+    ) / 1_000_000
+
+
+def anthropic_headers() -> dict:
+    """HTTP headers for direct Messages API calls"""
+    return {
+        "x-api-key": settings.ANTHROPIC_API_KEY,
+        "anthropic-version": "2023-06-01",
+        "content-type": "application/json",
+    }
+
+
+def cached_system(text: str) -> List[dict]:
+    """
+    Build a system prompt block marked for Anthropic prompt caching
+
+    Static instructions go here so that repeated calls reuse the cached prefix
+    instead of paying full input cost and latency for it every time.
+    """
+    return [
+        {
+            "type": "text",
+            "text": text,
+            "cache_control": {"type": "ephemeral"},
+        }
+    ]
+
+
+class LLMUsageMetrics:
+    """In-process token counters for Claude calls, keyed by call site"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usage: Dict[str, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(USAGE_FIELDS + ("calls",), 0))
+
+    def record(self, call_site: str, usage: Any, model: Optional[str] = None) -> None:
+        """
+        Record token usage from a Messages API response
+
+        Also meters the call's estimated cost against the current job.
+
+        Args:
+            call_site: Logical name of the caller (e.g. "furniture.search")
+            usage: `usage` from the response, either a dict (raw HTTP) or an SDK object
+            model: Model ID from the response, used to price the call
+        """
+        if usage is None:
+            return
+
+        values = {}
+        for field in USAGE_FIELDS:
+            value = usage.get(field) if isinstance(usage, dict) else getattr(usage, field, None)
+            values[field] = int(value or 0)
+
+        with self._lock:
+            totals = self._usage[call_site]
+            totals["calls"] += 1
+            for field, value in values.items():
+                totals[field] += value
+
+        usage_meter.record(call_site, model, estimate_llm_cost(model, values), tokens=values)
+
+        logger.debug(
+            f"LLM usage [{call_site}]: input={values['input_tokens']} output={values['output_tokens']} "
+            f"cache_write={values['cache_creation_input_tokens']} cache_read={values['cache_read_input_tokens']}"
+        )
+
+    def snapshot(self) -> dict:
+        """Current totals per call site, with the share of input tokens served from cache"""
+        with self._lock:
+            result = {site: dict(totals) for site, totals in self._usage.items()}
+
+        for totals in result.values():
+            total_input = (
+                totals["input_tokens"]
+                + totals["cache_creation_input_tokens"]
+                + totals["cache_read_input_tokens"]
+            )
+            totals["cache_hit_ratio"] = (
+                round(totals["cache_read_input_tokens"] / total_input, 4) if total_input else 0.0
+            )
+        return result
+
+
+llm_usage = LLMUsageMetrics()
@@ -0,0 +1,269 @@
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+import weakref
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from app.core.config import settings
+from app.core.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+
+# Cost metering
+#
+# Every paid call (Claude tokens, generated images) is recorded together with
+# the job and user it was made for. The job is a context variable set around
+# job execution: API background tasks set it directly and Celery tasks get it
+# from a message header (app.tasks.runtime), so services record usage without
+# being handed job or user IDs.
+#
+# Records are buffered in process and written in batches: usage_events keeps
+# one row per call for per-job breakdowns and daily_usage keeps running totals
+# per user and day. Each user's spend for the day is also kept in Redis, where
+# quota checks read it without a database query.
+
+# User key for calls made outside any job (gallery warm-up, re-localization)
+SYSTEM_USER = "system"
+
+DAILY_SPEND_KEY = "usage:spend:{user_key}:{day}"
+DAILY_SPEND_TTL = 2 * 24 * 3600
+
+# Records kept for a retry when the database is unavailable
+MAX_PENDING_RECORDS = 10000
+
+TOKEN_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+
+
+class UsageContext(NamedTuple):
+    job_id: Optional[str]
+    user_key: str
+    kind: str  # "analysis", "design", "gallery", ...
+
+
+class UsageRecord(NamedTuple):
+    job_id: Optional[str]
+    user_key: str
+    kind: Optional[str]
+    call_site: str
+    model: str
+    tokens: Dict[str, int]
+    images: int
+    cost_usd: float
+    created_at: datetime
+
+
+_context: contextvars.ContextVar[Optional[UsageContext]] = contextvars.ContextVar("usage_context", default=None)
+
+
+@contextmanager
+def metered_job(job_id: Optional[str], user_key: Optional[str], kind: str) -> Iterator[UsageContext]:
+    """Attribute usage recorded inside the block to a job and user"""
+    context = UsageContext(job_id, user_key or SYSTEM_USER, kind)
+    token = _context.set(context)
+    try:
+        yield context
+    finally:
+        _context.reset(token)
+
+
+def current_usage_context() -> Optional[UsageContext]:
+    return _context.get()
+
+
+def set_usage_context(context: Optional[UsageContext]) -> contextvars.Token:
+    """Set the context directly, for callers that can't use `metered_job` (Celery signals)"""
+    return _context.set(context)
+
+
+def reset_usage_context(token: contextvars.Token) -> None:
+    try:
+        _context.reset(token)
+    except ValueError:
+        pass
+
+
+def encode_usage_context(context: UsageContext) -> str:
+    return json.dumps(list(context))
+
+
+def decode_usage_context(value: Optional[str]) -> Optional[UsageContext]:
+    if not value:
+        return None
+    try:
+        job_id, user_key, kind = json.loads(value)
+    except (TypeError, ValueError):
+        return None
+    return UsageContext(job_id, user_key, kind)
+
+
+def daily_spend_key(user_key: str, day: Optional[date] = None) -> str:
+    day = day or datetime.now(timezone.utc).date()
+    return DAILY_SPEND_KEY.format(user_key=user_key, day=day.isoformat())
+
+
+class UsageMeter:
+    """Buffers usage records and writes them to the database in batches"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: List[UsageRecord] = []
+        # Records whose database write failed; their spend is already in Redis
+        self._retry: List[UsageRecord] = []
+        self._flushes: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]" = weakref.WeakKeyDictionary()
+        self._tables_ready = False
+
+    def record(
+        self,
+        call_site: str,
+        model: Optional[str],
+        cost_usd: float,
+        tokens: Optional[Dict[str, int]] = None,
+        images: int = 0,
+    ) -> None:
+        """
+        Record one paid call for the current job
+
+        Args:
+            call_site: Logical name of the caller (e.g. "design.translate", "image.flux-pro")
+            model: Model ID the provider reports (or was asked for)
+            cost_usd: Estimated cost of the call
+            tokens: Token counts by TOKEN_FIELDS name, for LLM calls
+            images: Number of images produced, for image models
+        """
+        if not settings.METERING_ENABLED:
+            return
+        context = _context.get() or UsageContext(None, SYSTEM_USER, None)
+        record = UsageRecord(
+            job_id=context.job_id,
+            user_key=context.user_key,
+            kind=context.kind,
+            call_site=call_site,
+            model=model or "unknown",
+            tokens={field: int((tokens or {}).get(field, 0)) for field in TOKEN_FIELDS},
+            images=images,
+            cost_usd=cost_usd,
+            created_at=datetime.now(timezone.utc),
+        )
+        with self._lock:
+            self._pending.append(record)
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Written by the next flush on a loop, or at shutdown
+            return
+        task = self._flushes.get(loop)
+        if task is None or task.done():
+            self._flushes[loop] = loop.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(settings.METERING_FLUSH_SECONDS)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """
+        Write pending records; on a database error they are kept for the next flush
+
+        Daily spend in Redis is added once per record, as soon as it is flushed,
+        so quota checks see it during a database outage. Records kept for a
+        retry are not added again.
+        """
+        with self._lock:
+            records, self._pending = self._pending, []
+            retried, self._retry = self._retry, []
+        if not records and not retried:
+            return
+
+        if records:
+            await self._add_daily_spend(records)
+        try:
+            await self._write(retried + records)
+        except Exception as e:
+            logger.error(f"Failed to write {len(retried) + len(records)} usage records: {e}")
+            with self._lock:
+                self._retry = (retried + records + self._retry)[-MAX_PENDING_RECORDS:]
+
+    @staticmethod
+    async def _add_daily_spend(records: List[UsageRecord]) -> None:
+        spend: Dict[str, float] = defaultdict(float)
+        for record in records:
+            spend[daily_spend_key(record.user_key, record.created_at.date())] += record.cost_usd
+        try:
+            pipe = get_async_redis().pipeline(transaction=False)
+            for key, amount in spend.items():
+                pipe.incrbyfloat(key, amount)
+                pipe.expire(key, DAILY_SPEND_TTL)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to update daily spend: {e}")
+
+    async def _write(self, records: List[UsageRecord]) -> None:
+        from sqlalchemy.dialects.postgresql import insert
+
+        from app.db.base import Base
+        from app.db.models.usage import DailyUsage, UsageEvent
+        from app.db.session import async_session_maker, engine
+
+        if not self._tables_ready:
+            async with engine.begin() as conn:
+                await conn.run_sync(
+                    Base.metadata.create_all,
+                    tables=[UsageEvent.__table__, DailyUsage.__table__],
+                )
+            self._tables_ready = True
+
+        # One row per user and day; a single upsert can't touch a row twice
+        daily: Dict[tuple, dict] = {}
+        for record in records:
+            key = (record.user_key, record.created_at.date())
+            totals = daily.setdefault(key, dict.fromkeys(DailyUsage.TOTAL_COLUMNS, 0))
+            totals["calls"] += 1
+            totals["images"] += record.images
+            totals["cost_usd"] += record.cost_usd
+            for field, value in record.tokens.items():
+                totals[field] += value
+
+        async with async_session_maker() as session:
+            session.add_all([
+                UsageEvent(
+                    job_id=record.job_id,
+                    user_key=record.user_key,
+                    kind=record.kind,
+                    call_site=record.call_site,
+                    model=record.model,
+                    images=record.images,
+                    cost_usd=record.cost_usd,
+                    created_at=record.created_at.replace(tzinfo=None),
+                    **record.tokens,
+                )
+                for record in records
+            ])
+            stmt = insert(DailyUsage).values([
+                {"user_key": user_key, "day": day, **totals}
+                for (user_key, day), totals in daily.items()
+            ])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["user_key", "day"],
+                set_={
+                    column: getattr(DailyUsage, column) + getattr(stmt.excluded, column)
+                    for column in DailyUsage.TOTAL_COLUMNS
+                },
+            )
+            await session.execute(stmt)
+            await session.commit()
+
+
+usage_meter = UsageMeter()
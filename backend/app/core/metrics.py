@@ -0,0 +1,269 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Prometheus metrics
+#
+# Counters and histograms are kept in process. With METRICS_BACKEND=redis every
+# process (API workers and Celery workers alike) also pushes its increments to
+# one Redis hash every few seconds and /metrics renders the merged totals, so
+# stages that run on the workers show up next to the API's own. Gauges are
+# read at scrape time by collector callbacks.
+
+REDIS_KEY = "metrics:v1"
+
+# Seconds; covers cache lookups up to slow image generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Labels, float] = defaultdict(float)
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        shared = metrics_registry.start_sharing()
+        with metrics_registry.lock:
+            self._values[labels] += amount
+            if shared:
+                metrics_registry.pending[(self.name, labels, "")] += amount
+
+    def samples(self, values: Dict[Tuple[Labels, str], float]) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for (labels, _), value in sorted(values.items())
+        ]
+
+    def local_values(self) -> Dict[Tuple[Labels, str], float]:
+        return {(labels, ""): value for labels, value in self._values.items()}
+
+
+class Histogram:
+    """Histogram with labels; bucket counts are stored per bucket and summed on render"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[Labels, str], float] = defaultdict(float)
+
+    def _bucket(self, value: float) -> str:
+        for bound in self.buckets:
+            if value <= bound:
+                return repr(bound)
+        return "+Inf"
+
+    def observe(self, value: float, *labels: str) -> None:
+        bucket = self._bucket(value)
+        shared = metrics_registry.start_sharing()
+        with metrics_registry.lock:
+            for suffix, amount in ((bucket, 1.0), ("sum", value), ("count", 1.0)):
+                self._values[(labels, suffix)] += amount
+                if shared:
+                    metrics_registry.pending[(self.name, labels, suffix)] += amount
+
+    def samples(self, values: Dict[Tuple[Labels, str], float]) -> List[str]:
+        lines = []
+        for labels in sorted({labels for labels, _ in values}):
+            cumulative = 0.0
+            for bound in [repr(bound) for bound in self.buckets] + ["+Inf"]:
+                cumulative += values.get((labels, bound), 0.0)
+                le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {_format_value(cumulative)}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(values.get((labels, 'sum'), 0.0))}")
+            lines.append(f"{self.name}_count{label_str} {_format_value(values.get((labels, 'count'), 0.0))}")
+        return lines
+
+    def local_values(self) -> Dict[Tuple[Labels, str], float]:
+        return dict(self._values)
+
+
+class MetricsRegistry:
+    """All metrics of the process plus the Redis aggregation"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics: Dict[str, object] = {}
+        # Increments not yet pushed to Redis: (metric, labels, suffix) -> amount
+        self.pending: Dict[Tuple[str, Labels, str], float] = defaultdict(float)
+        self._collectors: List[Callable[[], List[Tuple[str, str, Dict[Labels, float], Tuple[str, ...]]]]] = []
+        self._flusher_pid: Optional[int] = None
+        self._redis = None
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable) -> None:
+        """
+        Register a gauge callback, called at scrape time
+
+        The callback returns a list of (name, help, {label values: value}, label names).
+        """
+        self._collectors.append(collector)
+
+    @property
+    def shared(self) -> bool:
+        return settings.METRICS_BACKEND == "redis"
+
+    def start_sharing(self) -> bool:
+        """True if increments go to Redis, starting this process's flusher if needed"""
+        if not self.shared:
+            return False
+        self.ensure_flusher()
+        return True
+
+    def _client(self):
+        if self._redis is None:
+            import redis
+
+            self._redis = redis.Redis.from_url(settings.REDIS_URL)
+        return self._redis
+
+    def ensure_flusher(self) -> None:
+        """Start the background push to Redis (again after a fork)"""
+        if not self.shared or self._flusher_pid == os.getpid():
+            return
+        with self.lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            self._redis = None
+            # Increments copied from the parent were pushed by the parent
+            self.pending.clear()
+        threading.Thread(target=self._flush_loop, name="metrics-flusher", daemon=True).start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(settings.METRICS_FLUSH_SECONDS)
+            self.flush()
+
+    def flush(self) -> None:
+        """Push pending increments to Redis"""
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(float)
+        if not pending:
+            return
+        try:
+            pipe = self._client().pipeline(transaction=False)
+            for (name, labels, suffix), amount in pending.items():
+                pipe.hincrbyfloat(REDIS_KEY, json.dumps([name, list(labels), suffix]), amount)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to push metrics to Redis: {e}")
+            # Keep them for the next attempt
+            with self.lock:
+                for key, amount in pending.items():
+                    self.pending[key] += amount
+
+    def _values(self) -> Dict[str, Dict[Tuple[Labels, str], float]]:
+        if not self.shared:
+            with self.lock:
+                return {name: metric.local_values() for name, metric in self.metrics.items()}
+
+        self.flush()
+        values: Dict[str, Dict[Tuple[Labels, str], float]] = defaultdict(dict)
+        for field, amount in self._client().hgetall(REDIS_KEY).items():
+            name, labels, suffix = json.loads(field)
+            values[name][(tuple(labels), suffix)] = float(amount)
+        return values
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text format (blocking: may call Redis)"""
+        lines = []
+        values = self._values()
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.samples(values.get(name, {})))
+
+        for collector in self._collectors:
+            try:
+                gauges = collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+                continue
+            for name, help, samples, labelnames in gauges:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} gauge")
+                for labels, value in sorted(samples.items()):
+                    lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+stage_duration = metrics_registry.register(Histogram(
+    "smartroom_stage_duration_seconds",
+    "Duration of traced stages (service calls, provider calls, Celery tasks, HTTP requests)",
+    ("stage", "status"),
+))
+provider_calls = metrics_registry.register(Counter(
+    "smartroom_provider_calls_total",
+    "External provider calls by outcome (ok, error, slow, circuit_open)",
+    ("provider", "outcome"),
+))
+
+
+def _queue_depths():
+    """Messages waiting per Celery queue, read from the Redis broker"""
+    broker = settings.CELERY_BROKER_URL
+    if not broker.startswith(("redis://", "rediss://")):
+        return []
+
+    import redis
+
+    from app.tasks.scheduling import TIER_QUEUES
+
+    queues = ["analysis", "export", *TIER_QUEUES.values()]
+    client = redis.Redis.from_url(broker)
+    pipe = client.pipeline(transaction=False)
+    for queue in queues:
+        # Kombu keeps one list per priority step: "queue" for 0, "queue:N" above
+        pipe.llen(queue)
+        for priority in range(1, 10):
+            pipe.llen(f"{queue}:{priority}")
+    lengths = pipe.execute()
+    client.close()
+
+    depths = {(queue,): sum(lengths[i * 10:(i + 1) * 10]) for i, queue in enumerate(queues)}
+    return [("smartroom_queue_depth", "Messages waiting in each Celery queue", depths, ("queue",))]
+
+
+metrics_registry.add_collector(_queue_depths)
@@ -0,0 +1,250 @@
+import json
+import logging
+import math
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.api.v1.endpoints.users import verify_token
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Rate limiting uses GCRA (generic cell rate algorithm): each key stores one
+# timestamp, the "theoretical arrival time" (TAT) of its next request. A request
+# is allowed if it does not push the TAT more than one window into the future,
+# which behaves like a sliding window of `limit` requests without storing a log
+# of timestamps per client.
+
+
+def client_ip(scope) -> str:
+    """
+    Client address of a request, seen through TRUSTED_PROXY_HOPS reverse proxies
+
+    Each proxy appends the address it received the request from to
+    X-Forwarded-For, so only the last TRUSTED_PROXY_HOPS entries are
+    trustworthy; anything further left may be forged by the client.
+    """
+    hops = settings.TRUSTED_PROXY_HOPS
+    if hops > 0:
+        forwarded = [
+            entry.strip()
+            for name, value in scope.get("headers", [])
+            if name.lower() == b"x-forwarded-for"
+            for entry in value.decode("latin-1").split(",")
+            if entry.strip()
+        ]
+        if forwarded:
+            return forwarded[-min(hops, len(forwarded))]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitRule(NamedTuple):
+    name: str
+    paths: Tuple[str, ...]  # Exact paths, or prefixes ending with "/"
+    methods: Optional[Tuple[str, ...]]  # None matches every method
+    limit: int
+    window: int  # seconds
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.methods is not None and method not in self.methods:
+            return False
+        return any(
+            path.startswith(p) if p.endswith("/") else path == p
+            for p in self.paths
+        )
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    remaining: int
+    retry_after: float  # seconds, 0 when allowed
+
+
+def default_rules() -> List[RateLimitRule]:
+    """Rules from settings; the first matching rule applies, a limit of 0 means unlimited"""
+    return [
+        # Provider callbacks arrive from a few shared IPs and must never be dropped
+        RateLimitRule("webhooks", ("/api/v1/webhooks/",), None, 0, 0),
+        RateLimitRule(
+            "design_generate",
+            ("/api/v1/design/generate",),
+            ("POST",),
+            settings.RATE_LIMIT_DESIGN_REQUESTS,
+            settings.RATE_LIMIT_DESIGN_WINDOW,
+        ),
+        RateLimitRule(
+            "analysis_upload",
+            ("/api/v1/analysis/upload", "/api/v1/analysis/batch"),
+            ("POST",),
+            settings.RATE_LIMIT_UPLOAD_REQUESTS,
+            settings.RATE_LIMIT_UPLOAD_WINDOW,
+        ),
+        RateLimitRule(
+            "default",
+            ("/api/",),
+            None,
+            settings.RATE_LIMIT_REQUESTS,
+            settings.RATE_LIMIT_WINDOW,
+        ),
+    ]
+
+
+def _gcra(tat: Optional[float], now: float, limit: int, window: int) -> Tuple[RateLimitResult, float]:
+    """Apply one request; returns the result and the new TAT"""
+    interval = window / limit
+    tat = max(tat or now, now)
+    new_tat = tat + interval
+    allow_at = new_tat - window
+    if now < allow_at:
+        return RateLimitResult(False, 0, allow_at - now), tat
+    remaining = int((window - (new_tat - now)) / interval)
+    return RateLimitResult(True, remaining, 0.0), new_tat
+
+
+class MemoryRateLimitBackend:
+    """Per-process limiter; each API worker enforces its own budget"""
+
+    # Drop idle keys every this many hits so the table doesn't grow unbounded
+    PRUNE_EVERY = 10000
+
+    def __init__(self):
+        self._tats: Dict[str, float] = {}
+        self._hits = 0
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitResult:
+        now = time.monotonic()
+        result, self._tats[key] = _gcra(self._tats.get(key), now, limit, window)
+
+        self._hits += 1
+        if self._hits >= self.PRUNE_EVERY:
+            self._hits = 0
+            self._tats = {k: tat for k, tat in self._tats.items() if tat > now}
+
+        return result
+
+
+# Same algorithm as _gcra, run atomically in Redis using the server clock so
+# every API worker shares one budget per key
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - window
+if now < allow_at then
+    return {0, 0, tostring(allow_at - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, math.floor((window - (new_tat - now)) / interval), '0'}
+"""
+
+
+class RedisRateLimitBackend:
+    """Limiter shared by all API workers through Redis"""
+
+    KEY_PREFIX = "ratelimit:"
+
+    def __init__(self, url: str = None):
+        import redis.asyncio as redis_asyncio
+
+        self._client = redis_asyncio.from_url(url or settings.REDIS_URL)
+        self._script = self._client.register_script(GCRA_SCRIPT)
+        # Used while Redis is unreachable, so limits degrade to per-process instead of off
+        self._fallback = MemoryRateLimitBackend()
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitResult:
+        try:
+            allowed, remaining, retry_after = await self._script(
+                keys=[self.KEY_PREFIX + key],
+                args=[window / limit, window],
+            )
+        except Exception as e:
+            logger.warning(f"Redis rate limiter unavailable, using in-memory limits: {e}")
+            return await self._fallback.hit(key, limit, window)
+        return RateLimitResult(bool(allowed), int(remaining), float(retry_after))
+
+
+def create_backend():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimitBackend()
+    return MemoryRateLimitBackend()
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware enforcing per-user and per-IP request budgets
+
+    Every request under a rule counts against the client IP and, when it has a
+    valid bearer token, against the user as well; it is rejected with 429 if
+    either budget is exhausted.
+    """
+
+    def __init__(self, app, backend=None, rules: Optional[List[RateLimitRule]] = None):
+        self.app = app
+        self.backend = backend or create_backend()
+        self.rules = rules if rules is not None else default_rules()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        path = scope["path"]
+        rule = next((r for r in self.rules if r.matches(method, path)), None)
+        if rule is None or rule.limit <= 0 or method == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        keys = [f"{rule.name}:ip:{client_ip(scope)}"]
+        user_id = self._user_id(headers)
+        if user_id:
+            keys.append(f"{rule.name}:user:{user_id}")
+
+        remaining = rule.limit
+        for key in keys:
+            result = await self.backend.hit(key, rule.limit, rule.window)
+            if not result.allowed:
+                logger.info(f"Rate limit exceeded for {key} on {method} {path}")
+                await self._reject(send, rule, result)
+                return
+            remaining = min(remaining, result.remaining)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-ratelimit-limit", str(rule.limit).encode()),
+                    (b"x-ratelimit-remaining", str(remaining).encode()),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    @staticmethod
+    def _user_id(headers: Dict[str, str]) -> Optional[str]:
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        return verify_token(token.strip())
+
+    @staticmethod
+    async def _reject(send, rule: RateLimitRule, result: RateLimitResult):
+        body = json.dumps({"detail": "Too many requests, please slow down"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(result.retry_after)).encode()),
+                (b"x-ratelimit-limit", str(rule.limit).encode()),
+                (b"x-ratelimit-remaining", b"0"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,20 @@
+import asyncio
+import weakref
+
+import redis.asyncio as redis_asyncio
+
+from app.core.config import settings
+
+
+# One async Redis client per event loop (connections are bound to the loop that
+# opened them), mirroring the shared HTTP client in app.core.http
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, redis_asyncio.Redis]" = weakref.WeakKeyDictionary()
+
+
+def get_async_redis() -> redis_asyncio.Redis:
+    """Return the shared async Redis client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = redis_asyncio.from_url(settings.REDIS_URL)
+    return client
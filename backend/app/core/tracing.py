@@ -0,0 +1,302 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import stage_duration
+
+logger = logging.getLogger(__name__)
+
+
+# Request tracing
+#
+# Spans follow the OpenTelemetry data model: 128-bit trace IDs, 64-bit span IDs,
+# parent links, attributes and an ok/error status, propagated between processes
+# in a W3C `traceparent` header (HTTP requests and Celery messages). Finished
+# spans go to the exporter picked by TRACING_EXPORTER:
+#
+#     none     - dropped (default)
+#     console  - one log line per span
+#     file     - one JSON object per line in TRACING_FILE_PATH, using the
+#                OTLP field names so the file can be replayed into a collector
+#
+# Whatever the exporter, every span's duration is recorded in the stage latency
+# histogram served by /metrics. Span names are therefore kept low cardinality
+# ("design.generate_concepts", "provider.flux-pro"); IDs go in attributes.
+
+OK = "ok"
+ERROR = "error"
+CANCELLED = "cancelled"
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes", "status", "start", "_start_clock", "end_time")
+
+    def __init__(self, name: str, parent: Optional[Tuple[str, str]] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        if parent is None:
+            self.trace_id, self.parent_id = f"{random.getrandbits(128):032x}", None
+        else:
+            self.trace_id, self.parent_id = parent
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.attributes = dict(attributes or {})
+        self.status = OK
+        self.start = time.time()
+        self._start_clock = time.perf_counter()
+        self.end_time: Optional[float] = None
+
+    @property
+    def context(self) -> Tuple[str, str]:
+        """(trace ID, span ID), the parent reference for child spans"""
+        return self.trace_id, self.span_id
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException) -> None:
+        if isinstance(exc, asyncio.CancelledError):
+            # Cancelled by the caller (a lost hedge, a timeout upstream), not a failure
+            self.status = CANCELLED
+            return
+        self.status = ERROR
+        self.attributes["exception.type"] = type(exc).__name__
+        self.attributes["exception.message"] = str(exc)[:500]
+
+    def end(self) -> None:
+        if self.end_time is not None:
+            return
+        duration = time.perf_counter() - self._start_clock
+        self.end_time = self.start + duration
+        stage_duration.observe(duration, self.name, self.status)
+        _export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": int(self.start * 1e9),
+            "end_time_unix_nano": int((self.end_time or time.time()) * 1e9),
+            "attributes": self.attributes,
+            "status": {"code": {OK: "STATUS_CODE_OK", ERROR: "STATUS_CODE_ERROR"}.get(self.status, "STATUS_CODE_UNSET")},
+        }
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+_file_lock = threading.Lock()
+
+
+def _export(span: Span) -> None:
+    exporter = settings.TRACING_EXPORTER
+    if exporter == "none":
+        return
+    try:
+        if exporter == "console":
+            logger.info(
+                f"span {span.name} {(span.end_time - span.start) * 1000:.1f}ms {span.status} "
+                f"trace={span.trace_id} span={span.span_id} parent={span.parent_id} {span.attributes}"
+            )
+        elif exporter == "file":
+            line = json.dumps(span.to_dict(), default=str, ensure_ascii=False)
+            with _file_lock:
+                with open(settings.TRACING_FILE_PATH, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+    except Exception as e:
+        logger.warning(f"Failed to export span {span.name}: {e}")
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(trace ID, parent span ID) from a W3C traceparent header, None if invalid"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2]
+
+
+def current_traceparent() -> Optional[str]:
+    """traceparent header for the current span, to hand the trace to another process"""
+    span = _current.get()
+    return span.traceparent if span is not None else None
+
+
+@contextmanager
+def span(name: str, parent: Optional[Tuple[str, str]] = None, **attributes) -> Iterator[Span]:
+    """
+    Run a block inside a new span, child of the current one
+
+    Exceptions mark the span as failed and propagate.
+    """
+    if parent is None:
+        current = _current.get()
+        parent = current.context if current is not None else None
+    new = Span(name, parent, attributes)
+    token = _current.set(new)
+    try:
+        yield new
+    except BaseException as e:
+        new.record_exception(e)
+        raise
+    finally:
+        _current.reset(token)
+        new.end()
+
+
+def start_span(name: str, parent: Optional[Tuple[str, str]] = None, **attributes) -> Tuple[Span, contextvars.Token]:
+    """
+    Start a span and make it current until `finish_span`
+
+    For spans that begin and end in different callbacks (Celery signals, ASGI
+    messages); otherwise use `span`.
+    """
+    if parent is None:
+        current = _current.get()
+        parent = current.context if current is not None else None
+    new = Span(name, parent, attributes)
+    return new, _current.set(new)
+
+
+def finish_span(new: Span, token: contextvars.Token) -> None:
+    try:
+        _current.reset(token)
+    except ValueError:
+        # Reset from another context; the span still ends
+        pass
+    new.end()
+
+
+def traced(name: str) -> Callable:
+    """Decorator running a coroutine function, async generator or function inside a span"""
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def gen_wrapper(*args, **kwargs):
+                # Generators are resumed by their consumer, possibly from another
+                # context, so the span is timed but not made current
+                current = _current.get()
+                new = Span(name, current.context if current is not None else None)
+                try:
+                    async for item in func(*args, **kwargs):
+                        yield item
+                except BaseException as e:
+                    if not isinstance(e, GeneratorExit):
+                        new.record_exception(e)
+                    raise
+                finally:
+                    new.end()
+            return gen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def instrument(prefix: str) -> Callable[[type], type]:
+    """
+    Class decorator tracing every public async method as "<prefix>.<method>"
+
+    Synchronous helpers are left alone; they are cheap and would only add noise.
+    """
+
+    def decorator(cls: type) -> type:
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith("_"):
+                continue
+            func = value.__func__ if isinstance(value, (staticmethod, classmethod)) else value
+            if not (inspect.iscoroutinefunction(func) or inspect.isasyncgenfunction(func)):
+                continue
+            wrapped = traced(f"{prefix}.{attr}")(func)
+            if isinstance(value, staticmethod):
+                wrapped = staticmethod(wrapped)
+            elif isinstance(value, classmethod):
+                wrapped = classmethod(wrapped)
+            setattr(cls, attr, wrapped)
+        return cls
+
+    return decorator
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a root span per HTTP request
+
+    Continues the caller's trace if the request has a traceparent header and
+    returns the request's own traceparent in the response. The span ends when
+    the response body is complete, so background tasks run afterwards are not
+    counted in the request latency but still belong to its trace.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        parent = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        request_span, token = start_span(
+            "http.request",
+            parent,
+            **{"http.method": scope["method"], "http.target": scope["path"]},
+        )
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                request_span.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    request_span.status = ERROR
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (b"traceparent", request_span.traceparent.encode())],
+                }
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                request_span.end()
+
+        try:
+            await self.app(scope, receive, traced_send)
+        except BaseException as e:
+            request_span.record_exception(e)
+            raise
+        finally:
+            finish_span(request_span, token)
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+from typing import AsyncIterator, Optional, Tuple
+
+from starlette.exceptions import HTTPException
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Image uploads are read in chunks: the size limit is enforced as bytes arrive,
+# the content is hashed on the way through and the type comes from the file's
+# magic bytes, never from the client's Content-Type.
+
+# (magic bytes at offset, offset, MIME type, extension)
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", 0, "image/jpeg", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", 0, "image/png", "png"),
+    (b"WEBP", 8, "image/webp", "webp"),  # after "RIFF" and the chunk size
+)
+SNIFF_BYTES = 12
+
+
+class UploadRejected(HTTPException):
+    """
+    Raised while reading an upload that is too large or not a supported image
+
+    An HTTPException so it becomes the error response wherever it is raised,
+    including from inside request body parsing.
+    """
+
+
+def sniff_image_type(head: bytes) -> Optional[Tuple[str, str]]:
+    """(MIME type, extension) from the first bytes of a file, None if not a supported image"""
+    for signature, offset, mime_type, extension in IMAGE_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            if mime_type == "image/webp" and head[:4] != b"RIFF":
+                continue
+            return mime_type, extension
+    return None
+
+
+def max_upload_bytes() -> int:
+    return settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
+
+
+class ImageUploadReader:
+    """
+    Reads an UploadFile chunk by chunk, validating as it goes
+
+    Iterate `chunks()` to consume the file; once it is exhausted `sha256`,
+    `size`, `content_type` and `extension` describe the whole upload. The
+    first chunk is only yielded after its magic bytes have been checked.
+    """
+
+    def __init__(self, file, max_bytes: int = None, chunk_size: int = None):
+        self.file = file
+        self.max_bytes = max_bytes or max_upload_bytes()
+        self.chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+        self.size = 0
+        self.content_type: Optional[str] = None
+        self.extension: Optional[str] = None
+        self._hash = hashlib.sha256()
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    async def _read(self, size: int) -> bytes:
+        return await self.file.read(size)
+
+    async def sniff(self) -> Tuple[str, str]:
+        """Read and check the first bytes; returns (MIME type, extension)"""
+        head = await self._read(SNIFF_BYTES)
+        sniffed = sniff_image_type(head)
+        if sniffed is None:
+            raise UploadRejected(400, "Unsupported file type. Supported types: image/jpeg, image/png, image/webp")
+        self.content_type, self.extension = sniffed
+        self._head = head
+        return sniffed
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        if self.content_type is None:
+            await self.sniff()
+
+        chunk = self._head
+        while chunk:
+            self.size += len(chunk)
+            if self.size > self.max_bytes:
+                raise UploadRejected(413, f"File size cannot exceed {settings.MAX_UPLOAD_SIZE_MB}MB")
+            self._hash.update(chunk)
+            yield chunk
+            chunk = await self._read(self.chunk_size)
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware capping the request body size of upload endpoints
+
+    Starlette spools multipart bodies to disk before the endpoint runs, so the
+    per-file check alone would still accept (and write out) an arbitrarily large
+    request. Requests declaring a larger Content-Length are refused up front and
+    streamed bodies are cut off once they cross the limit.
+    """
+
+    # Path -> number of files the body may carry
+    UPLOAD_PATHS = {
+        "/api/v1/analysis/upload": 1,
+        "/api/v1/analysis/batch": None,  # settings.MAX_BATCH_UPLOAD_FILES
+    }
+    # Allowance for multipart boundaries and part headers
+    OVERHEAD_BYTES = 64 * 1024
+
+    def __init__(self, app):
+        self.app = app
+
+    def _limit(self, path: str) -> Optional[int]:
+        if path not in self.UPLOAD_PATHS:
+            return None
+        files = self.UPLOAD_PATHS[path] or settings.MAX_BATCH_UPLOAD_FILES
+        return files * max_upload_bytes() + self.OVERHEAD_BYTES
+
+    async def __call__(self, scope, receive, send):
+        limit = self._limit(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                await self._reject(send)
+                return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise UploadRejected(413, "Request body too large")
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except UploadRejected:
+            logger.info(f"Upload to {scope['path']} cut off after {received} bytes")
+            if not response_started:
+                await self._reject(send)
+
+    @staticmethod
+    async def _reject(send):
+        body = json.dumps({"detail": "Request body too large"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
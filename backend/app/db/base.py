@@ -7,5 +7,5 @@ class Base(DeclarativeBase):
 
 
 # Import all models here for Alembic
-from app.db.models import user, project, design, furniture  # noqa
+from app.db.models import user, project, design, furniture, usage  # noqa
 
@@ -3,6 +3,7 @@ from app.db.models.user import User
 from app.db.models.project import Project
 from app.db.models.design import Design, DesignFurniture
 from app.db.models.furniture import Furniture, FurnitureCategory
+from app.db.models.usage import DailyUsage, UsageEvent
 
 __all__ = [
     "User",
@@ -11,5 +12,7 @@ __all__ = [
     "DesignFurniture",
     "Furniture",
     "FurnitureCategory",
+    "UsageEvent",
+    "DailyUsage",
 ]
 
@@ -0,0 +1,70 @@
+from datetime import date, datetime
+from sqlalchemy import String, Float, Date, DateTime, Integer, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from typing import Optional
+
+from app.db.base import Base
+
+
+class UsageEvent(Base):
+    """One paid provider call (Claude request or image generation), attributed to a job"""
+    __tablename__ = "usage_events"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    job_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True, index=True)
+    user_key: Mapped[str] = mapped_column(String(100), index=True)  # User ID, "anon:<ip>" or "system"
+    kind: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)  # "analysis", "design", ...
+    
+    call_site: Mapped[str] = mapped_column(String(100))
+    model: Mapped[str] = mapped_column(String(200))
+    
+    # Claude token counts
+    input_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    output_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cache_creation_input_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cache_read_input_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    
+    # Images produced by image models
+    images: Mapped[int] = mapped_column(Integer, default=0)
+    
+    # Estimated cost in USD
+    cost_usd: Mapped[float] = mapped_column(Float, default=0)
+    
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, index=True
+    )
+    
+    def __repr__(self) -> str:
+        return f"<UsageEvent {self.call_site} {self.model} ${self.cost_usd:.4f}>"
+
+
+class DailyUsage(Base):
+    """Running usage totals per user and (UTC) day"""
+    __tablename__ = "daily_usage"
+    __table_args__ = (UniqueConstraint("user_key", "day"),)
+    
+    # Columns summed on every write
+    TOTAL_COLUMNS = (
+        "calls",
+        "input_tokens",
+        "output_tokens",
+        "cache_creation_input_tokens",
+        "cache_read_input_tokens",
+        "images",
+        "cost_usd",
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_key: Mapped[str] = mapped_column(String(100), index=True)
+    day: Mapped[date] = mapped_column(Date, index=True)
+    
+    calls: Mapped[int] = mapped_column(Integer, default=0)
+    input_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    output_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cache_creation_input_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cache_read_input_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    images: Mapped[int] = mapped_column(Integer, default=0)
+    cost_usd: Mapped[float] = mapped_column(Float, default=0)
+    
+    def __repr__(self) -> str:
+        return f"<DailyUsage {self.user_key} {self.day} ${self.cost_usd:.2f}>"
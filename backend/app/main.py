@@ -1,10 +1,21 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 
+from app.core.circuit_breaker import provider_breakers
 from app.core.config import settings
+from app.core.http import close_http_client
+from app.core.llm import llm_usage
+from app.core.metering import usage_meter
+from app.core.metrics import metrics_registry
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.tracing import TracingMiddleware
+from app.core.uploads import UploadSizeLimitMiddleware
 from app.api.v1.router import api_router
+from app.services.image_generation_service import hedge_metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -22,6 +33,8 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down Room Design AI Backend...")
+    await usage_meter.flush()
+    await close_http_client()
 
 
 app = FastAPI(
@@ -43,6 +56,12 @@ app = FastAPI(
     openapi_url="/api/openapi.json",
 )
 
+# Upload body size cap, inside rate limiting so oversized uploads still count
+app.add_middleware(UploadSizeLimitMiddleware)
+
+# Rate limiting (added before CORS so 429 responses still get CORS headers)
+app.add_middleware(RateLimitMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -52,6 +71,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Tracing (outermost, so the request span covers every other middleware)
+app.add_middleware(TracingMiddleware)
+
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
 
@@ -74,3 +96,26 @@ async def health_check():
         "environment": settings.ENVIRONMENT,
     }
 
+
+@app.get("/metrics/llm")
+async def llm_metrics():
+    """Claude token usage per call site, including prompt cache reads and writes"""
+    return {
+        "usage": llm_usage.snapshot(),
+    }
+
+
+@app.get("/metrics/providers")
+async def provider_metrics():
+    """Circuit breaker state, error rate, latency and concurrency limit per image provider"""
+    return {
+        "providers": provider_breakers.snapshot(),
+        "hedging": hedge_metrics.snapshot(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus metrics: stage latency histograms, provider call outcomes and queue depths"""
+    body = await asyncio.to_thread(metrics_registry.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
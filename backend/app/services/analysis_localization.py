@@ -0,0 +1,344 @@
+import asyncio
+import hashlib
+import json
+import logging
+import weakref
+from typing import Dict, List, Optional
+
+import openai
+
+from app.core.config import settings
+from app.core.http import get_http_client, shared_http_client
+from app.core.json_utils import extract_json
+from app.core.llm import ANTHROPIC_MESSAGES_URL, anthropic_headers, cached_system, llm_usage
+from app.core.redis_client import get_async_redis
+from app.core.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+
+# Room analyses are produced once in a language-neutral form: room type and
+# furniture as canonical IDs, dimensions as numbers and the free-text fields in
+# English. Showing one in another language is a dictionary lookup for the IDs
+# plus, for Chinese, the translations the vision model returned alongside the
+# English text. Fixed texts (mock and offline analyses) come from STATIC_TEXTS;
+# only what neither covers costs one small cached translation call.
+
+LANGUAGES = ("zh", "en")
+
+ROOM_TYPES = ("living", "bedroom", "kitchen", "bathroom", "office", "dining", "other")
+
+# Canonical furniture IDs the vision prompt chooses from
+FURNITURE_NAMES: Dict[str, Dict[str, str]] = {
+    "sofa": {"zh": "沙发", "en": "Sofa"},
+    "sectional_sofa": {"zh": "转角沙发", "en": "Sectional Sofa"},
+    "armchair": {"zh": "单人沙发", "en": "Armchair"},
+    "coffee_table": {"zh": "茶几", "en": "Coffee Table"},
+    "side_table": {"zh": "边几", "en": "Side Table"},
+    "tv_stand": {"zh": "电视柜", "en": "TV Stand"},
+    "tv": {"zh": "电视", "en": "TV"},
+    "bookshelf": {"zh": "书架", "en": "Bookshelf"},
+    "shelving": {"zh": "置物架", "en": "Shelving"},
+    "cabinet": {"zh": "柜子", "en": "Cabinet"},
+    "wardrobe": {"zh": "衣柜", "en": "Wardrobe"},
+    "dresser": {"zh": "五斗柜", "en": "Dresser"},
+    "bed": {"zh": "床", "en": "Bed"},
+    "nightstand": {"zh": "床头柜", "en": "Nightstand"},
+    "desk": {"zh": "书桌", "en": "Desk"},
+    "office_chair": {"zh": "办公椅", "en": "Office Chair"},
+    "chair": {"zh": "椅子", "en": "Chair"},
+    "dining_table": {"zh": "餐桌", "en": "Dining Table"},
+    "dining_chair": {"zh": "餐椅", "en": "Dining Chair"},
+    "bar_stool": {"zh": "吧台凳", "en": "Bar Stool"},
+    "floor_lamp": {"zh": "落地灯", "en": "Floor Lamp"},
+    "table_lamp": {"zh": "台灯", "en": "Table Lamp"},
+    "ceiling_light": {"zh": "吸顶灯", "en": "Ceiling Light"},
+    "pendant_light": {"zh": "吊灯", "en": "Pendant Light"},
+    "rug": {"zh": "地毯", "en": "Rug"},
+    "curtains": {"zh": "窗帘", "en": "Curtains"},
+    "mirror": {"zh": "镜子", "en": "Mirror"},
+    "plant": {"zh": "绿植", "en": "Plant"},
+    "wall_art": {"zh": "装饰画", "en": "Wall Art"},
+    "computer": {"zh": "电脑", "en": "Computer"},
+    "monitor": {"zh": "显示器", "en": "Monitor"},
+    "kitchen_island": {"zh": "厨房岛台", "en": "Kitchen Island"},
+    "refrigerator": {"zh": "冰箱", "en": "Refrigerator"},
+    "stove": {"zh": "灶台", "en": "Stove"},
+    "sink": {"zh": "水槽", "en": "Sink"},
+    "bathtub": {"zh": "浴缸", "en": "Bathtub"},
+    "shower": {"zh": "淋浴", "en": "Shower"},
+    "toilet": {"zh": "马桶", "en": "Toilet"},
+    "vanity": {"zh": "浴室柜", "en": "Vanity"},
+    "storage_boxes": {"zh": "收纳箱", "en": "Storage Boxes"},
+}
+
+# Text fields written in English by the vision model and translated on demand
+TEXT_FIELDS = ("current_style", "lighting", "potential")
+
+ROOM_NAMES: Dict[str, Dict[str, str]] = {
+    "living": {"zh": "客厅", "en": "living room"},
+    "bedroom": {"zh": "卧室", "en": "bedroom"},
+    "kitchen": {"zh": "厨房", "en": "kitchen"},
+    "bathroom": {"zh": "浴室", "en": "bathroom"},
+    "office": {"zh": "书房", "en": "office"},
+    "dining": {"zh": "餐厅", "en": "dining room"},
+    "other": {"zh": "房间", "en": "room"},
+}
+
+# Potential written by the local models, formatted with the English room name
+LOCAL_POTENTIAL = "The {room} can be refreshed with a coordinated furniture layout, lighting and decor"
+
+# Translations of the fixed English texts of mock, offline and default analyses
+STATIC_TEXTS: Dict[str, Dict[str, str]] = {
+    # VisionService defaults
+    "Unknown": {"zh": "未知"},
+    "Normal": {"zh": "正常"},
+    "Has renovation potential": {"zh": "具有改造潜力"},
+    # Mock analysis
+    "Modern Minimalist": {"zh": "现代简约"},
+    "Natural light sufficient, east-facing windows": {"zh": "自然采光充足，东向窗户"},
+    "Underutilized space": {"zh": "空间利用率不高"},
+    "Monotone colors": {"zh": "色彩单调"},
+    "Lack of decorative elements": {"zh": "缺少装饰元素"},
+    "Can improve space by adding plants, artwork, and adjusting furniture layout": {
+        "zh": "可以通过添加绿植、装饰画以及调整家具布局来改善空间",
+    },
+    # Local models
+    "Not determined (offline analysis)": {"zh": "未确定（离线分析）"},
+    "Bright, with plenty of light": {"zh": "明亮，光线充足"},
+    "Moderate lighting": {"zh": "光线适中"},
+    "Dim, the room needs more light": {"zh": "光线昏暗，需要增加照明"},
+    "Insufficient lighting": {"zh": "照明不足"},
+    "Sparsely furnished": {"zh": "家具较少"},
+    "Crowded layout for the floor area": {"zh": "相对面积而言布局拥挤"},
+    **{
+        LOCAL_POTENTIAL.format(room=names["en"]): {"zh": f"{names['zh']}可以通过协调家具布局、照明和装饰焕然一新"}
+        for names in ROOM_NAMES.values()
+    },
+}
+
+TRANSLATION_CACHE_KEY = "analysis:l10n:{language}:{digest}"
+
+LOCALIZATION_SYSTEM_PROMPT = """Translate the values of the JSON object you are given from English into {language_name}.
+
+This is a room analysis for an interior design app. Keep the same keys and the same structure (strings stay strings, lists keep their length and order). Use natural, concise interior design wording. Return only the JSON object."""
+
+LANGUAGE_NAMES = {"zh": "Simplified Chinese", "en": "English"}
+
+LOCALIZATION_MAX_TOKENS = 1024
+
+# OpenAI clients per event loop, on the loop's shared connection pool
+_openai_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, openai.AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+
+def canonical_furniture_id(name: str) -> str:
+    """Normalize a furniture name from the model to its ID form"""
+    return name.strip().lower().replace("-", "_").replace(" ", "_")
+
+
+def furniture_name(furniture_id: str, language: str) -> Optional[str]:
+    """Localized furniture name, None if the ID is not in the vocabulary"""
+    names = FURNITURE_NAMES.get(furniture_id)
+    return names[language] if names else None
+
+
+def _static_translation(value, language: str):
+    """Translation of a string or string list from STATIC_TEXTS, None unless all of it is covered"""
+    values = value if isinstance(value, list) else [value]
+    translated = [STATIC_TEXTS.get(text, {}).get(language) for text in values]
+    if None in translated:
+        return None
+    return translated if isinstance(value, list) else translated[0]
+
+
+def _model_translations(canonical: dict, texts: dict, unknown: List[str], language: str) -> dict:
+    """Fields of `texts` the vision model already translated, with the same types"""
+    provided = (canonical.get("translations") or {}).get(language)
+    if not isinstance(provided, dict):
+        return {}
+
+    translated = {
+        field: provided[field]
+        for field, value in texts.items()
+        if field != "other_furniture"
+        and isinstance(provided.get(field), type(value))
+        and (not isinstance(value, list) or len(provided[field]) == len(value))
+    }
+    # The model names the furniture outside the vocabulary by ID
+    names = provided.get("other_furniture")
+    if isinstance(names, dict) and unknown and all(isinstance(names.get(fid), str) for fid in unknown):
+        translated["other_furniture"] = [names[fid] for fid in unknown]
+    return translated
+
+
+async def _request_anthropic_translation(payload: str, system_prompt: str) -> Optional[str]:
+    async with shared_http_client(timeout=30.0) as client:
+        response = await client.post(
+            ANTHROPIC_MESSAGES_URL,
+            headers=anthropic_headers(),
+            json={
+                "model": "claude-3-haiku-20240307",
+                "max_tokens": LOCALIZATION_MAX_TOKENS,
+                "system": cached_system(system_prompt),
+                "messages": [{"role": "user", "content": payload}],
+            },
+        )
+    if response.status_code != 200:
+        logger.warning(f"Localization API error: {response.status_code}")
+        return None
+
+    result = response.json()
+    llm_usage.record("analysis.localize", result.get("usage"), result.get("model"))
+    return result.get("content", [{}])[0].get("text", "")
+
+
+def _openai_client() -> openai.AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    client = _openai_clients.get(loop)
+    if client is None or client.is_closed():
+        client = openai.AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_API_BASE,
+            timeout=30.0,
+            http_client=get_http_client(),
+        )
+        _openai_clients[loop] = client
+    return client
+
+
+async def _request_openai_translation(payload: str, system_prompt: str) -> Optional[str]:
+    client = _openai_client()
+    response = await client.chat.completions.create(
+        model=settings.OPENAI_MODEL,
+        max_tokens=LOCALIZATION_MAX_TOKENS,
+        response_format={"type": "json_object"},
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": payload},
+        ],
+    )
+    if response.usage:
+        llm_usage.record(
+            "analysis.localize",
+            {"input_tokens": response.usage.prompt_tokens, "output_tokens": response.usage.completion_tokens},
+            response.model,
+        )
+    return response.choices[0].message.content
+
+
+async def _translate_texts(texts: dict, language: str) -> dict:
+    """
+    Translate a dict of English strings (and string lists), cached in Redis
+
+    Uses Claude when configured, otherwise OpenAI; English is kept only when
+    neither key is set or the call fails.
+    """
+    payload = json.dumps(texts, ensure_ascii=False, sort_keys=True)
+    key = TRANSLATION_CACHE_KEY.format(language=language, digest=hashlib.sha256(payload.encode()).hexdigest())
+
+    try:
+        cached = await get_async_redis().get(key)
+        if cached:
+            return json.loads(cached)
+    except Exception as e:
+        logger.warning(f"Localization cache lookup failed: {e}")
+
+    if settings.ANTHROPIC_API_KEY:
+        request_translation = _request_anthropic_translation
+    elif settings.OPENAI_API_KEY:
+        request_translation = _request_openai_translation
+    else:
+        logger.warning(f"No LLM provider configured, analysis text left in English for {language}")
+        return texts
+
+    try:
+        system_prompt = LOCALIZATION_SYSTEM_PROMPT.format(language_name=LANGUAGE_NAMES[language])
+        content = await request_translation(payload, system_prompt)
+        if content is None:
+            return texts
+        translated = extract_json(content)
+        # Keep English for anything the model dropped or reshaped
+        translated = {
+            field: translated[field] if isinstance(translated.get(field), type(value)) else value
+            for field, value in texts.items()
+        }
+    except Exception as e:
+        logger.error(f"Analysis localization failed: {e}")
+        return texts
+
+    try:
+        await get_async_redis().set(key, json.dumps(translated, ensure_ascii=False), ex=settings.ANALYSIS_LOCALIZATION_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Failed to cache localized analysis: {e}")
+    return translated
+
+
+@traced("analysis.localize")
+async def localize_analysis(canonical: dict, language: str = "zh") -> dict:
+    """
+    Render a language-neutral analysis in the given language
+
+    Args:
+        canonical: Analysis as returned by VisionService.analyze_room_canonical
+        language: "zh" or "en"
+
+    Returns:
+        Analysis dict in the API shape, with the canonical form kept under
+        "canonical" so it can be re-rendered later
+    """
+    language = language if language in LANGUAGES else "zh"
+    furniture_ids: List[str] = canonical.get("existing_furniture", [])
+
+    texts = {field: canonical.get(field, "") for field in TEXT_FIELDS}
+    texts["problems"] = list(canonical.get("problems", []))
+    # Furniture outside the vocabulary is translated with the rest of the text
+    unknown = [fid for fid in furniture_ids if fid not in FURNITURE_NAMES]
+    if unknown:
+        texts["other_furniture"] = [fid.replace("_", " ") for fid in unknown]
+
+    unknown_names = {}
+    if language != "en":
+        # Translations from the vision call first, then fixed texts; only the
+        # rest goes to a translation model
+        translated = _model_translations(canonical, texts, unknown, language)
+        for field, value in texts.items():
+            if field not in translated:
+                static = _static_translation(value, language)
+                if static is not None:
+                    translated[field] = static
+        remaining = {field: value for field, value in texts.items() if field not in translated}
+        if remaining:
+            translated.update(await _translate_texts(remaining, language))
+        texts = translated
+        unknown_names = dict(zip(unknown, texts.get("other_furniture", [])))
+    existing_furniture = [
+        furniture_name(fid, language) or unknown_names.get(fid) or fid.replace("_", " ").title()
+        for fid in furniture_ids
+    ]
+
+    return {
+        "room_type": canonical.get("room_type", "living"),
+        "dimensions": canonical.get("dimensions"),
+        "existing_furniture": existing_furniture,
+        "current_style": texts["current_style"],
+        "lighting": texts["lighting"],
+        "problems": texts["problems"],
+        "potential": texts["potential"],
+        "confidence": canonical.get("confidence", 0.7),
+        "language": language,
+        "canonical": canonical,
+    }
+
+
+async def relocalize_result(result: dict, language: str) -> dict:
+    """
+    Return a finished analysis result in another language
+
+    Results without a canonical form (from before it was stored) are returned
+    unchanged.
+    """
+    canonical = result.get("canonical")
+    if not canonical or result.get("language") == language:
+        return result
+    localized = await localize_analysis(canonical, language)
+    return {**result, **localized}
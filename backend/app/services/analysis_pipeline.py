@@ -0,0 +1,176 @@
+import asyncio
+import base64
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.tracing import instrument
+from app.services.segmentation_service import SegmentationService
+from app.services.storage_service import StorageService
+from app.services.vision_service import VisionService
+
+logger = logging.getLogger(__name__)
+
+
+# Room analysis runs as a small DAG of stages. Each stage starts as soon as the
+# stages it depends on have finished, so independent calls (vision analysis and
+# segmentation) overlap, and callers get an update after every stage so they
+# can show the vision result while segmentation is still running.
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class Stage(NamedTuple):
+    name: str
+    run: Callable[[Dict[str, Any]], Awaitable[Any]]  # Receives results of finished stages
+    depends: Tuple[str, ...] = ()
+    weight: int = 1  # Share of overall progress
+    optional: bool = False  # A failure is logged and dependents are skipped
+
+
+async def run_stages(
+    stages: List[Stage],
+    on_update: Optional[Callable[[Dict[str, str], Dict[str, Any]], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """
+    Run stages concurrently in dependency order
+
+    Args:
+        stages: Stages; dependencies must refer to earlier stages
+        on_update: Awaited with (stage states, results so far) whenever a stage
+            starts or finishes
+
+    Returns:
+        Result per stage name (None for failed or skipped optional stages)
+
+    Raises:
+        Exception: The first error of a required stage; the rest are cancelled
+    """
+    states = {stage.name: PENDING for stage in stages}
+    results: Dict[str, Any] = {}
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def notify():
+        if on_update is not None:
+            try:
+                await on_update(dict(states), dict(results))
+            except Exception as e:
+                logger.warning(f"Analysis progress update failed: {e}")
+
+    async def run(stage: Stage):
+        for name in stage.depends:
+            await asyncio.shield(tasks[name])
+        if any(states[name] in (FAILED, SKIPPED) for name in stage.depends):
+            states[stage.name] = SKIPPED
+            results[stage.name] = None
+            await notify()
+            return
+
+        states[stage.name] = RUNNING
+        await notify()
+        try:
+            results[stage.name] = await stage.run(results)
+            states[stage.name] = COMPLETED
+        except Exception as e:
+            states[stage.name] = FAILED
+            results[stage.name] = None
+            if not stage.optional:
+                raise
+            logger.warning(f"Optional stage {stage.name} failed: {e}")
+        await notify()
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.create_task(run(stage))
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+    return results
+
+
+def stage_progress(stages: List[Stage], states: Dict[str, str], start: int = 10, end: int = 95) -> int:
+    """Overall progress from the weights of finished stages"""
+    total = sum(stage.weight for stage in stages)
+    done = sum(stage.weight for stage in stages if states.get(stage.name) in (COMPLETED, FAILED, SKIPPED))
+    return start + (end - start) * done // max(total, 1)
+
+
+@instrument("analysis")
+class RoomAnalysisPipeline:
+    """Vision analysis and segmentation of one room photo"""
+
+    def __init__(self):
+        self.vision_service = VisionService()
+        self.segmentation_service = SegmentationService()
+        self.storage_service = StorageService()
+
+    def stages(self, job_id: str, image_base64: str, language: str = "zh") -> List[Stage]:
+        async def vision(results):
+            return await self.vision_service.analyze_room(image_base64, language)
+
+        async def segmentation(results):
+            return await self.segmentation_service.segment_image(image_base64)
+
+        async def upload_segmentation(results):
+            if not results["segmentation"]:
+                return None
+            return await self.storage_service.upload_file(
+                base64.b64decode(results["segmentation"]),
+                f"rooms/{job_id}/segmentation.png",
+                "image/png",
+            )
+
+        return [
+            Stage("vision", vision, weight=6),
+            Stage("segmentation", segmentation, weight=3, optional=True),
+            Stage("segmentation_upload", upload_segmentation, ("segmentation",), weight=1, optional=True),
+        ]
+
+    @staticmethod
+    def build_result(job_id: str, image_url: str, results: Dict[str, Any]) -> Optional[dict]:
+        """Analysis result from the stages finished so far, None before the vision result"""
+        if results.get("vision") is None:
+            return None
+        return {
+            "id": job_id,
+            "image_url": image_url,
+            "segmentation_url": results.get("segmentation_upload"),
+            **results["vision"],
+        }
+
+    async def run(
+        self,
+        job_id: str,
+        image_base64: str,
+        image_url: str,
+        language: str = "zh",
+        on_progress: Optional[Callable[[int, Dict[str, str], Optional[dict]], Awaitable[None]]] = None,
+    ) -> dict:
+        """
+        Analyze a room photo
+
+        Args:
+            on_progress: Awaited with (progress, stage states, partial result)
+                after every stage change; the partial result is available as
+                soon as the vision stage has finished
+
+        Returns:
+            Analysis result with segmentation_url (None if segmentation failed)
+        """
+        stages = self.stages(job_id, image_base64, language)
+
+        async def on_update(states, results):
+            if on_progress is not None:
+                await on_progress(
+                    stage_progress(stages, states),
+                    states,
+                    self.build_result(job_id, image_url, results),
+                )
+
+        results = await run_stages(stages, on_update)
+        return self.build_result(job_id, image_url, results)
@@ -0,0 +1,378 @@
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Concept templates
+#
+# Built once into immutable tuples and shared by every job; callers get fresh
+# dicts from ConceptTemplate.to_concept, so the edits generate_concepts makes to
+# a concept never reach the registry. Image prompts are English whatever the
+# output language, so each template carries both translations of its text.
+
+LANGUAGES = ("zh", "en")
+
+
+class ConceptTemplate(NamedTuple):
+    name: Mapping[str, str]  # language -> text
+    description: Mapping[str, str]
+    highlights: Mapping[str, Tuple[str, ...]]
+    prompt: str
+    confidence: float
+
+    def to_concept(self, language: str = "zh") -> dict:
+        """A new, mutable concept dict in the given language"""
+        language = language if language in LANGUAGES else "zh"
+        return {
+            "name": self.name[language],
+            "description": self.description[language],
+            "highlights": list(self.highlights[language]),
+            "prompt": self.prompt,
+            "confidence": self.confidence,
+        }
+
+
+def _template(zh: Tuple[str, str, Tuple[str, ...]], en: Tuple[str, str, Tuple[str, ...]], prompt: str, confidence: float) -> ConceptTemplate:
+    """Build a template from (name, description, highlights) per language"""
+    return ConceptTemplate(
+        name=MappingProxyType({"zh": zh[0], "en": en[0]}),
+        description=MappingProxyType({"zh": zh[1], "en": en[1]}),
+        highlights=MappingProxyType({"zh": tuple(zh[2]), "en": tuple(en[2])}),
+        prompt=prompt,
+        confidence=confidence,
+    )
+
+
+DEFAULT_STYLE = "modern"
+
+BUILTIN_TEMPLATES: Dict[str, Tuple[ConceptTemplate, ...]] = {
+    "modern": (
+        _template(
+            ("都市极简", "极简线条与中性色调，打造都市精英的高效生活空间", ("简约大气", "功能至上", "质感选材")),
+            ("Urban Minimalist", "Clean lines and neutral tones create an efficient living space for urban professionals",
+             ("Minimalist Design", "Functional Focus", "Premium Materials")),
+            "ultra modern minimalist interior, clean geometric lines, monochromatic palette, high-end finishes",
+            0.95,
+        ),
+        _template(
+            ("现代温馨", "现代设计融入温暖元素，平衡美学与舒适度", ("温暖氛围", "舒适面料", "人性化设计")),
+            ("Modern Warmth", "Modern design infused with warm elements, balancing aesthetics and comfort",
+             ("Warm Atmosphere", "Comfortable Textiles", "Human-centered Design")),
+            "modern warm interior design, soft textures, warm lighting, comfortable furniture",
+            0.92,
+        ),
+        _template(
+            ("艺术现代", "将现代空间打造成艺术画廊，展现独特品味", ("艺术元素", "个性展示", "视觉焦点")),
+            ("Artistic Modern", "Transform your space into an art gallery showcasing unique taste",
+             ("Artistic Elements", "Personal Expression", "Visual Focal Points")),
+            "modern artistic interior, gallery-like space, statement art pieces, designer furniture",
+            0.88,
+        ),
+    ),
+    "nordic": (
+        _template(
+            ("北欧阳光", "明亮通透的北欧风格，让自然光成为主角", ("自然采光", "白色基调", "原木质感")),
+            ("Nordic Sunlight", "Bright and airy Scandinavian style, letting natural light take center stage",
+             ("Natural Light", "White Base", "Wood Textures")),
+            "bright scandinavian interior, white walls, large windows, natural wood floors, hygge atmosphere",
+            0.94,
+        ),
+        _template(
+            ("北欧森林", "将森林的宁静带入室内，打造自然栖息地", ("自然元素", "绿植装饰", "有机材质")),
+            ("Nordic Forest", "Bring the tranquility of the forest indoors, creating a natural habitat",
+             ("Natural Elements", "Plant Decor", "Organic Materials")),
+            "nordic forest interior, indoor plants, natural materials, wooden furniture, green accents",
+            0.91,
+        ),
+        _template(
+            ("北欧舒适", "Hygge风格的终极体现，温暖舒适的小窝", ("温暖织物", "蜡烛氛围", "舒适角落")),
+            ("Nordic Cozy", "The ultimate expression of Hygge style, a warm and cozy retreat",
+             ("Warm Textiles", "Candle Ambiance", "Cozy Corners")),
+            "hygge scandinavian interior, cozy textiles, candles, reading nook, warm blankets",
+            0.93,
+        ),
+    ),
+    "japanese": (
+        _template(
+            ("禅意空间", "日式禅宗美学，营造冥想般的宁静氛围", ("极简主义", "禅意布置", "自然素材")),
+            ("Zen Space", "Japanese Zen aesthetics creating a meditation-like peaceful atmosphere",
+             ("Minimalism", "Zen Arrangement", "Natural Materials")),
+            "japanese zen interior, minimal furniture, tatami elements, shoji screens, rock garden view",
+            0.92,
+        ),
+        _template(
+            ("和风现代", "传统日式与现代设计的完美融合", ("传统元素", "现代功能", "和谐统一")),
+            ("Modern Japanese", "Perfect fusion of traditional Japanese and modern design",
+             ("Traditional Elements", "Modern Function", "Harmonious Unity")),
+            "modern japanese interior, contemporary furniture with traditional elements, paper lanterns, bonsai",
+            0.90,
+        ),
+        _template(
+            ("木之温度", "以木材为主角，感受自然的温度", ("原木家具", "自然质感", "温润氛围")),
+            ("Wood Warmth", "Wood takes center stage, feeling the warmth of nature",
+             ("Natural Wood", "Organic Texture", "Warm Ambiance")),
+            "japanese wood interior, natural wood throughout, warm tones, minimalist design, natural light",
+            0.89,
+        ),
+    ),
+    "industrial": (
+        _template(
+            ("工业经典", "裸露砖墙与金属管道，重现工业时代的粗犷美", ("裸露材质", "金属元素", "复古工业")),
+            ("Industrial Classic", "Exposed brick and metal pipes recreate the raw beauty of the industrial era",
+             ("Exposed Materials", "Metal Elements", "Vintage Industrial")),
+            "classic industrial interior, exposed brick walls, metal pipes, concrete floors, vintage lighting",
+            0.93,
+        ),
+        _template(
+            ("工业温暖", "工业风格中注入温暖元素，刚柔并济", ("皮质家具", "暖色点缀", "混搭风格")),
+            ("Industrial Warmth", "Industrial style infused with warm elements, balancing strength and softness",
+             ("Leather Furniture", "Warm Accents", "Mixed Styles")),
+            "warm industrial interior, leather furniture, warm wood accents, soft lighting, cozy textiles",
+            0.90,
+        ),
+        _template(
+            ("都市LOFT", "开放式LOFT空间，自由不羁的都市生活", ("开放空间", "高挑天花", "功能分区")),
+            ("Urban Loft", "Open loft space for free-spirited urban living",
+             ("Open Space", "High Ceilings", "Functional Zones")),
+            "urban loft interior, open floor plan, high ceilings, industrial elements, modern furniture",
+            0.91,
+        ),
+    ),
+    "bohemian": (
+        _template(
+            ("波西米亚旅人", "来自世界各地的织物与手工艺品，自由随性的多彩空间", ("多彩织物", "手工艺品", "随性布置")),
+            ("Bohemian Traveler", "Textiles and handicrafts from around the world in a free-spirited, colorful space",
+             ("Colorful Textiles", "Handcrafted Pieces", "Relaxed Layout")),
+            "bohemian interior, layered patterned rugs, colorful textiles, floor cushions, eclectic global decor",
+            0.92,
+        ),
+        _template(
+            ("丛林波西", "藤编家具与大量绿植，营造热带丛林般的放松氛围", ("藤编家具", "大型绿植", "自然光线")),
+            ("Jungle Boho", "Rattan furniture and lush greenery create a relaxed tropical atmosphere",
+             ("Rattan Furniture", "Lush Plants", "Natural Light")),
+            "boho jungle interior, rattan furniture, macrame wall hangings, abundant hanging plants, natural light",
+            0.90,
+        ),
+        _template(
+            ("暖调波西", "大地色系与柔软织物，温暖而富有层次的休憩空间", ("大地色系", "层次织物", "温暖灯光")),
+            ("Warm Boho", "Earthy tones and soft textiles for a warm, richly layered retreat",
+             ("Earthy Palette", "Layered Textiles", "Warm Lighting")),
+            "warm bohemian interior, terracotta and ochre tones, low seating, woven baskets, lantern lighting",
+            0.88,
+        ),
+    ),
+    "midcentury": (
+        _template(
+            ("经典中古", "柚木家具与锥形木腿，重现五六十年代的经典设计", ("柚木家具", "锥形木腿", "经典单品")),
+            ("Classic Mid-Century", "Teak furniture and tapered legs recreate iconic 1950s and 60s design",
+             ("Teak Furniture", "Tapered Legs", "Iconic Pieces")),
+            "mid-century modern interior, teak wood furniture, tapered legs, iconic lounge chair, clean lines",
+            0.93,
+        ),
+        _template(
+            ("复古撞色", "芥末黄与墨绿的大胆撞色，充满年代感的活力空间", ("大胆配色", "几何图案", "复古灯具")),
+            ("Retro Color Pop", "Bold mustard and deep green accents in a lively, period-inspired space",
+             ("Bold Colors", "Geometric Patterns", "Retro Lighting")),
+            "retro mid-century interior, mustard yellow and teal accents, geometric patterns, sputnik chandelier",
+            0.89,
+        ),
+        _template(
+            ("中古暖木", "温润木饰面与大面积玻璃，室内外自然相连", ("木饰墙面", "落地玻璃", "低矮家具")),
+            ("Warm Wood Mid-Century", "Warm wood paneling and wide glazing connect indoors and out",
+             ("Wood Paneling", "Floor-to-ceiling Glass", "Low-profile Furniture")),
+            "mid-century modern living space, walnut wood paneling, floor-to-ceiling windows, low-profile sofa",
+            0.90,
+        ),
+    ),
+    "coastal": (
+        _template(
+            ("海岸清风", "白色与海蓝色调，把海边的清爽带回家", ("海洋色调", "轻盈面料", "明亮通透")),
+            ("Coastal Breeze", "White and ocean blue tones bring the freshness of the seaside home",
+             ("Ocean Palette", "Airy Fabrics", "Bright and Open")),
+            "coastal interior, white and ocean blue palette, linen slipcovered sofa, sheer curtains, bright airy light",
+            0.93,
+        ),
+        _template(
+            ("海滨小屋", "浮木质感与天然纤维，悠闲的海滨度假氛围", ("浮木质感", "天然纤维", "度假氛围")),
+            ("Beach Cottage", "Driftwood textures and natural fibers for a relaxed seaside getaway feel",
+             ("Driftwood Textures", "Natural Fibers", "Vacation Vibe")),
+            "beach cottage interior, whitewashed wood, jute rugs, driftwood decor, rattan accents, shiplap walls",
+            0.90,
+        ),
+        _template(
+            ("现代海岸", "现代线条融合海岸元素，简洁而轻松", ("现代线条", "沙色点缀", "自然采光")),
+            ("Modern Coastal", "Modern lines blended with coastal elements, clean and relaxed",
+             ("Modern Lines", "Sand-toned Accents", "Natural Light")),
+            "modern coastal interior, clean lines, sand and navy accents, large windows, light oak floors",
+            0.89,
+        ),
+    ),
+    "farmhouse": (
+        _template(
+            ("现代农舍", "谷仓门与白色护墙板，质朴与现代的平衡", ("谷仓门", "护墙板", "质朴木材")),
+            ("Modern Farmhouse", "Barn doors and white shiplap balance rustic charm with modern living",
+             ("Barn Doors", "Shiplap Walls", "Rustic Wood")),
+            "modern farmhouse interior, white shiplap walls, sliding barn door, reclaimed wood beams, black fixtures",
+            0.93,
+        ),
+        _template(
+            ("田园温馨", "格纹织物与做旧家具，温暖舒适的乡村生活", ("格纹织物", "做旧家具", "温馨氛围")),
+            ("Country Cozy", "Plaid textiles and distressed furniture for warm, comfortable country living",
+             ("Plaid Textiles", "Distressed Furniture", "Cozy Atmosphere")),
+            "cozy country farmhouse interior, plaid throws, distressed wood furniture, stone fireplace, warm lighting",
+            0.90,
+        ),
+        _template(
+            ("法式乡村", "柔和色调与复古细节，优雅的法式田园风情", ("柔和色调", "复古细节", "优雅质朴")),
+            ("French Country", "Soft hues and vintage details bring elegant French countryside charm",
+             ("Soft Hues", "Vintage Details", "Rustic Elegance")),
+            "french country farmhouse interior, soft neutral tones, vintage furniture, linen fabrics, fresh flowers",
+            0.88,
+        ),
+    ),
+}
+
+# Style names the frontend or older clients may send, mapped to template keys
+STYLE_ALIASES = {
+    "现代简约": "modern",
+    "北欧风格": "nordic",
+    "日式禅风": "japanese",
+    "工业风格": "industrial",
+    "波西米亚": "bohemian",
+    "中古世纪": "midcentury",
+    "海岸风格": "coastal",
+    "田园农舍": "farmhouse",
+    "简约": "modern",
+    "北欧": "nordic",
+    "日式": "japanese",
+    "工业": "industrial",
+    "scandinavian": "nordic",
+    "boho": "bohemian",
+    "mid-century": "midcentury",
+    "midcenturymodern": "midcentury",
+}
+
+
+def _load_file(path: str) -> Dict[str, Tuple[ConceptTemplate, ...]]:
+    """
+    Read templates from a JSON file
+
+    Format: {"<style>": [{"prompt": ..., "confidence": ...,
+    "zh": {"name", "description", "highlights"}, "en": {...}}, ...]}
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    templates = {}
+    for style, concepts in data.items():
+        templates[style] = tuple(
+            _template(
+                (c["zh"]["name"], c["zh"]["description"], tuple(c["zh"]["highlights"])),
+                (c["en"]["name"], c["en"]["description"], tuple(c["en"]["highlights"])),
+                c["prompt"],
+                float(c.get("confidence", 0.9)),
+            )
+            for c in concepts
+        )
+        if not templates[style]:
+            raise ValueError(f"style '{style}' has no concepts")
+    return templates
+
+
+class ConceptTemplateRegistry:
+    """
+    Read-only registry of concept templates per style
+
+    Uses the built-in templates, or the JSON file at CONCEPT_TEMPLATES_PATH
+    merged over them. The file is re-read when its modification time changes
+    (checked at most every CONCEPT_TEMPLATES_RELOAD_SECONDS); a file that fails
+    to load is logged and the previous templates stay in use.
+    """
+
+    def __init__(self, path: Optional[str] = None, reload_seconds: Optional[float] = None):
+        self.path = path if path is not None else settings.CONCEPT_TEMPLATES_PATH
+        self.reload_seconds = reload_seconds if reload_seconds is not None else settings.CONCEPT_TEMPLATES_RELOAD_SECONDS
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._publish(BUILTIN_TEMPLATES)
+        self._maybe_reload()
+
+    def _publish(self, templates: Dict[str, Tuple[ConceptTemplate, ...]]) -> None:
+        # Swapped in as a whole so readers never see a half-loaded registry
+        self._templates = MappingProxyType(dict(templates))
+        self._prompts = frozenset(t.prompt for concepts in templates.values() for t in concepts)
+
+    def _maybe_reload(self) -> None:
+        if not self.path:
+            return
+        now = time.monotonic()
+        if self._mtime is not None and now - self._checked_at < self.reload_seconds:
+            return
+
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError as e:
+                logger.error(f"Concept templates file {self.path} unavailable: {e}")
+                self._mtime = self._mtime or 0.0
+                return
+            if mtime == self._mtime:
+                return
+            # Remember the version even if it fails, so a bad file is reported once
+            self._mtime = mtime
+            try:
+                templates = {**BUILTIN_TEMPLATES, **_load_file(self.path)}
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                # OSError: the file was replaced or removed between stat() and open()
+                logger.error(f"Failed to load concept templates from {self.path}: {e}")
+                return
+            self._publish(templates)
+            logger.info(f"Loaded concept templates for {len(templates)} styles from {self.path}")
+
+    @property
+    def templates(self) -> Mapping[str, Tuple[ConceptTemplate, ...]]:
+        self._maybe_reload()
+        return self._templates
+
+    def styles(self) -> List[str]:
+        return list(self.templates)
+
+    def get(self, style: str) -> Tuple[ConceptTemplate, ...]:
+        """Templates for a style key, falling back to the default style"""
+        templates = self.templates
+        return templates.get(style) or templates[DEFAULT_STYLE]
+
+    def concepts(self, style: str, language: str = "zh") -> List[dict]:
+        """Fresh concept dicts for a style, safe to edit"""
+        return [template.to_concept(language) for template in self.get(style)]
+
+    def prompts(self) -> Dict[str, List[str]]:
+        return {style: [t.prompt for t in concepts] for style, concepts in self.templates.items()}
+
+    def is_template_prompt(self, prompt: str) -> bool:
+        self._maybe_reload()
+        return prompt in self._prompts
+
+    def normalize_style(self, style: str) -> str:
+        """Map a style name, alias or ID to its template key; unknown styles get DEFAULT_STYLE"""
+        templates = self.templates
+        key = str(style or "").strip().lower().replace(" ", "").replace("_", "")
+        for name in (style, key):
+            name = STYLE_ALIASES.get(name, name)
+            if name in templates:
+                return name
+        logger.warning(f"Unknown design style {style!r}, using {DEFAULT_STYLE}")
+        return DEFAULT_STYLE
+
+
+concept_templates = ConceptTemplateRegistry()
@@ -1,11 +1,17 @@
 import logging
-from typing import List, Optional
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Tuple
 import uuid
 import json
-import httpx
 import urllib.parse
+from pydantic import BaseModel
 
 from app.core.config import settings
+from app.core.http import shared_http_client
+from app.core.json_utils import StreamingArrayParser, extract_json
+from app.core.llm import ANTHROPIC_MESSAGES_URL, anthropic_headers, cached_system, llm_usage
+from app.core.tracing import instrument
+from app.services.requirement_intents import detect_intents
 
 logger = logging.getLogger(__name__)
 
@@ -47,59 +53,9 @@ PLATFORMS = {
 }
 
 
-class FurnitureMatchingService:
-    """Service for matching furniture using Claude AI as search engine"""
-    
-    def __init__(self):
-        self.platforms = PLATFORMS
-        self.anthropic_key = settings.ANTHROPIC_API_KEY
-    
-    def get_currency_info(self, region: str) -> dict:
-        """Get currency info for region"""
-        platform_info = self.platforms.get(region, self.platforms["CA"])
-        return {
-            "currency": platform_info["currency"],
-            "symbol": platform_info["currency_symbol"],
-        }
-    
-    def generate_search_links(self, query: str, region: str) -> List[dict]:
-        """Generate search links for all platforms in region"""
-        platform_info = self.platforms.get(region, self.platforms["CA"])
-        links = []
-        
-        encoded_query = urllib.parse.quote(query)
-        
-        for platform in platform_info["platforms"]:
-            links.append({
-                "name": platform["name"],
-                "url": platform["url"].format(query=encoded_query),
-                "icon": platform["icon"],
-            })
-        
-        return links
-    
-    async def search_with_claude(
-        self,
-        style: str,
-        room_type: str,
-        budget: float,
-        user_needs: str,
-        region: str = "CA",
-    ) -> List[dict]:
-        """
-        Use Claude AI to recommend products with realistic prices
-        """
-        currency_info = self.get_currency_info(region)
-        currency = currency_info["currency"]
-        
-        # Build the prompt for Claude
-        prompt = f"""You are a professional interior designer and shopping assistant. Based on the following requirements, recommend specific products.
-
-**Room Style**: {style}
-**Room Type**: {room_type}
-**Budget**: {budget} {currency}
-**User's Specific Requests**: {user_needs if user_needs else "No specific requests"}
-**Region**: {region} (use local pricing and stores)
+# Static instructions for Claude product search. Sent as a cached system block;
+# the per-request details (style, budget, region, user needs) go in the user message.
+PRODUCT_SEARCH_SYSTEM_PROMPT = """You are a professional interior designer and shopping assistant. Based on the user's requirements, recommend specific products.
 
 CRITICAL INSTRUCTIONS - YOU MUST FOLLOW EXACTLY:
 
@@ -123,22 +79,22 @@ CRITICAL INSTRUCTIONS - YOU MUST FOLLOW EXACTLY:
    - Do not add "helpful suggestions"
    - Do not add decorations or accessories unless asked
 
-4. **Prices must be realistic for {region} market in {currency}**
+4. **Prices must be realistic for the user's region, in the user's currency**
 
-5. **Total cost should be within the budget of {budget} {currency}**
+5. **Total cost should be within the user's budget**
 
 Please recommend products based STRICTLY on user's request. For each product, provide:
 1. Product name (specific model if applicable)
 2. Brand
 3. Category (tools/furniture/electronics/decor/lighting)
-4. Estimated price in {currency}
+4. Estimated price in the user's currency
 5. Dimensions or specifications
 6. Search keywords for finding this product
 
 Respond in JSON format only:
-{{
+{
   "products": [
-    {{
+    {
       "name": "Product Name",
       "name_en": "English Name",
       "brand": "Brand Name",
@@ -146,24 +102,136 @@ Respond in JSON format only:
       "price": 299.99,
       "dimensions": "100x50x75cm",
       "search_keywords": "brand model type"
-    }}
+    }
   ],
   "total_cost": 1234.56,
   "notes": "Brief note about the selection"
-}}"""
+}"""
+
+
+class ProductRecommendations(BaseModel):
+    """Expected shape of Claude's product recommendation JSON"""
+    products: List[dict]
+    total_cost: float = 0
+    notes: str = ""
+
+
+DEFAULT_REGION = "CA"
+
+# Search URL templates split around the "{query}" placeholder, built once at import
+# time so that link generation is a concatenation instead of str.format per platform
+LINK_TEMPLATES = {
+    region: tuple(
+        (platform["name"], *platform["url"].split("{query}", 1), platform["icon"])
+        for platform in info["platforms"]
+    )
+    for region, info in PLATFORMS.items()
+}
+
+
+@lru_cache(maxsize=4096)
+def _compiled_search_links(query: str, region: str) -> Tuple[Tuple[str, str, str], ...]:
+    """Build (name, url, icon) tuples for a query in a known region (cached)"""
+    encoded_query = urllib.parse.quote(query)
+    return tuple(
+        (name, f"{prefix}{encoded_query}{suffix}", icon)
+        for name, prefix, suffix, icon in LINK_TEMPLATES[region]
+    )
+
+
+def build_search_links(query: str, region: str) -> List[dict]:
+    """
+    Generate search links for all platforms in region
+    
+    Unknown regions fall back to Canada. Each call returns fresh dicts so callers
+    can safely mutate them; only the encoded URLs are shared through the cache.
+    """
+    if region not in LINK_TEMPLATES:
+        region = DEFAULT_REGION
+    return [
+        {"name": name, "url": url, "icon": icon}
+        for name, url, icon in _compiled_search_links(query, region)
+    ]
+
+
+@instrument("furniture")
+class FurnitureMatchingService:
+    """Service for matching furniture using Claude AI as search engine"""
+    
+    def __init__(self):
+        self.platforms = PLATFORMS
+        self.anthropic_key = settings.ANTHROPIC_API_KEY
+    
+    def get_currency_info(self, region: str) -> dict:
+        """Get currency info for region"""
+        platform_info = self.platforms.get(region, self.platforms["CA"])
+        return {
+            "currency": platform_info["currency"],
+            "symbol": platform_info["currency_symbol"],
+        }
+    
+    def generate_search_links(self, query: str, region: str) -> List[dict]:
+        """Generate search links for all platforms in region"""
+        return build_search_links(query, region)
+    
+    def _build_search_prompt(
+        self,
+        style: str,
+        room_type: str,
+        budget: float,
+        user_needs: str,
+        region: str,
+    ) -> str:
+        """Build the per-request part of the product recommendation prompt"""
+        currency_info = self.get_currency_info(region)
+        currency = currency_info["currency"]
+        
+        return f"""**Room Style**: {style}
+**Room Type**: {room_type}
+**Budget**: {budget} {currency}
+**User's Specific Requests**: {user_needs if user_needs else "No specific requests"}
+**Region**: {region} (use local pricing and stores)
+
+Prices must be realistic for the {region} market in {currency}, and the total cost should be within {budget} {currency}.
+Respond in JSON format only."""
+    
+    def _format_product(self, p: dict, region: str) -> dict:
+        """Convert a product recommended by Claude into the API product shape"""
+        search_query = p.get("search_keywords", p.get("name", ""))
+        return {
+            "id": f"claude-{uuid.uuid4().hex[:8]}",
+            "name": p.get("name", "Unknown"),
+            "name_en": p.get("name_en", p.get("name", "")),
+            "brand": p.get("brand", "Various"),
+            "category": p.get("category", "furniture"),
+            "price": float(p.get("price", 0)),
+            "dimensions": p.get("dimensions", "See product page"),
+            "image": "",  # No image for now
+            "links": self.generate_search_links(search_query, region),
+        }
+    
+    async def search_with_claude(
+        self,
+        style: str,
+        room_type: str,
+        budget: float,
+        user_needs: str,
+        region: str = "CA",
+    ) -> List[dict]:
+        """
+        Use Claude AI to recommend products with realistic prices
+        """
+        prompt = self._build_search_prompt(style, room_type, budget, user_needs, region)
 
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
+            async with shared_http_client(timeout=60.0) as client:
                 response = await client.post(
-                    "https://api.anthropic.com/v1/messages",
-                    headers={
-                        "x-api-key": self.anthropic_key,
-                        "anthropic-version": "2023-06-01",
-                        "content-type": "application/json",
-                    },
+                    ANTHROPIC_MESSAGES_URL,
+                    headers=anthropic_headers(),
                     json={
                         "model": settings.CLAUDE_MODEL,
                         "max_tokens": 2000,
+                        "system": cached_system(PRODUCT_SEARCH_SYSTEM_PROMPT),
                         "messages": [
                             {"role": "user", "content": prompt}
                         ]
@@ -175,44 +243,105 @@ Respond in JSON format only:
                     return await self._get_fallback_products(style, budget, user_needs, region)
                 
                 result = response.json()
+                llm_usage.record("furniture.search", result.get("usage"), result.get("model", settings.CLAUDE_MODEL))
                 content = result.get("content", [{}])[0].get("text", "{}")
                 
-                # Parse JSON from response
-                # Handle markdown code blocks
-                if "```json" in content:
-                    content = content.split("```json")[1].split("```")[0]
-                elif "```" in content:
-                    content = content.split("```")[1].split("```")[0]
-                
-                data = json.loads(content.strip())
+                # Parse JSON from response (code fences and surrounding prose are skipped)
+                data = extract_json(content, schema=ProductRecommendations)
                 products = data.get("products", [])
                 
                 # Add search links to each product
-                result_products = []
-                for p in products:
-                    search_query = p.get("search_keywords", p.get("name", ""))
-                    result_products.append({
-                        "id": f"claude-{uuid.uuid4().hex[:8]}",
-                        "name": p.get("name", "Unknown"),
-                        "name_en": p.get("name_en", p.get("name", "")),
-                        "brand": p.get("brand", "Various"),
-                        "category": p.get("category", "furniture"),
-                        "price": float(p.get("price", 0)),
-                        "dimensions": p.get("dimensions", "See product page"),
-                        "image": "",  # No image for now
-                        "links": self.generate_search_links(search_query, region),
-                    })
+                result_products = [self._format_product(p, region) for p in products]
                 
                 logger.info(f"Claude recommended {len(result_products)} products, total: {data.get('total_cost', 0)}")
                 return result_products
                 
-        except json.JSONDecodeError as e:
+        except ValueError as e:
             logger.error(f"Failed to parse Claude response: {e}")
             return await self._get_fallback_products(style, budget, user_needs, region)
         except Exception as e:
             logger.error(f"Claude search failed: {e}")
             return await self._get_fallback_products(style, budget, user_needs, region)
     
+    async def stream_with_claude(
+        self,
+        style: str,
+        room_type: str,
+        budget: float,
+        user_needs: str,
+        region: str = "CA",
+    ) -> AsyncIterator[dict]:
+        """
+        Stream Claude product recommendations one product at a time
+        
+        Uses the Messages streaming API and yields each product as soon as its
+        JSON object is complete. Falls back to the static catalog if Claude
+        fails before any product has been produced.
+        """
+        prompt = self._build_search_prompt(style, room_type, budget, user_needs, region)
+        parser = StreamingArrayParser("products")
+        usage = {}
+        yielded = 0
+        
+        try:
+            async with shared_http_client(timeout=60.0) as client:
+                async with client.stream(
+                    "POST",
+                    ANTHROPIC_MESSAGES_URL,
+                    headers=anthropic_headers(),
+                    json={
+                        "model": settings.CLAUDE_MODEL,
+                        "max_tokens": 2000,
+                        "stream": True,
+                        "system": cached_system(PRODUCT_SEARCH_SYSTEM_PROMPT),
+                        "messages": [
+                            {"role": "user", "content": prompt}
+                        ]
+                    }
+                ) as response:
+                    if response.status_code != 200:
+                        body = await response.aread()
+                        raise Exception(f"Claude API error: {response.status_code} - {body[:500]!r}")
+                    
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        event = json.loads(line[5:].strip())
+                        event_type = event.get("type")
+                        
+                        if event_type == "error":
+                            raise Exception(f"Claude stream error: {event.get('error')}")
+                        if event_type == "message_start":
+                            # Input and cache token counts arrive up front
+                            usage.update(event.get("message", {}).get("usage", {}))
+                            continue
+                        if event_type == "message_delta":
+                            usage.update(event.get("usage", {}))
+                            continue
+                        if event_type != "content_block_delta":
+                            continue
+                        
+                        delta = event.get("delta", {})
+                        if delta.get("type") != "text_delta":
+                            continue
+                        
+                        for p in parser.feed(delta.get("text", "")):
+                            yielded += 1
+                            yield self._format_product(p, region)
+            
+            llm_usage.record("furniture.search_stream", usage, settings.CLAUDE_MODEL)
+            logger.info(f"Claude streamed {yielded} products")
+            if yielded:
+                return
+        except Exception as e:
+            logger.error(f"Claude streaming search failed: {e}")
+            if yielded:
+                # Products already sent to the client, don't mix in fallbacks
+                return
+        
+        for product in await self._get_fallback_products(style, budget, user_needs, region):
+            yield product
+    
     async def _get_fallback_products(
         self,
         style: str,
@@ -224,11 +353,11 @@ Respond in JSON format only:
         currency_info = self.get_currency_info(region)
         
         # Check for brand mentions
-        user_lower = (user_needs or "").lower()
+        intents = detect_intents(user_needs)
         products = []
         
         # Tech products if mentioned
-        if any(b in user_lower for b in ["asus", "华硕", "msi", "gaming", "游戏", "电竞"]):
+        if not intents.isdisjoint(("asus", "msi", "gaming")):
             products.extend([
                 {
                     "id": f"fb-{uuid.uuid4().hex[:8]}",
@@ -254,7 +383,7 @@ Respond in JSON format only:
                 },
             ])
         
-        if any(b in user_lower for b in ["apple", "苹果", "mac", "imac"]):
+        if not intents.isdisjoint(("apple", "mac")):
             products.append({
                 "id": f"fb-{uuid.uuid4().hex[:8]}",
                 "name": "Apple Studio Display 27寸",
@@ -350,6 +479,40 @@ Respond in JSON format only:
         
         return products
     
+    async def match_furniture_stream(
+        self,
+        style: str,
+        room_type: str,
+        budget: float,
+        user_needs: str = "",
+        region: str = "CA",
+        exclude: List[str] = None,
+        language: str = "zh",
+    ) -> AsyncIterator[dict]:
+        """
+        Streaming variant of match_furniture, yields products as Claude produces them
+        """
+        exclude = exclude or []
+        
+        logger.info(f"Streaming products with Claude - Style: {style}, Budget: {budget}, Needs: {user_needs}, Language: {language}")
+        
+        async for p in self.stream_with_claude(
+            style=style,
+            room_type=room_type,
+            budget=budget,
+            user_needs=user_needs,
+            region=region,
+        ):
+            # Filter out excluded items
+            if exclude and any(ex.lower() in p["name"].lower() for ex in exclude):
+                continue
+            
+            # Swap name based on language
+            if language == "en" and p.get("name_en"):
+                p["name"], p["name_en"] = p["name_en"], p["name"]
+            
+            yield p
+    
     async def search(
         self,
         query: Optional[str] = None,
@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import uuid
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.http import shared_http_client
+from app.core.redis_client import get_async_redis
+from app.core.tracing import instrument
+from app.services.storage_service import StorageService
+
+logger = logging.getLogger(__name__)
+
+
+# Generated image cache
+#
+# Images are copied into our own storage (provider URLs expire) and indexed in
+# Redis under a hash of everything that determines the output. Each key holds a
+# small pool of variants; GENERATION_CACHE_HIT_RATE is the share of requests
+# served from the pool, the rest generate a fresh image that joins it, so
+# popular template prompts still vary between users.
+
+CACHE_KEY = "gencache:{key}"
+CACHE_VERSION = 1  # Bump to invalidate every entry after prompt/model changes
+
+CONTENT_TYPES = {
+    "image/webp": "webp",
+    "image/png": "png",
+    "image/jpeg": "jpg",
+}
+
+
+def generation_cache_key(
+    prompt: str,
+    style: str,
+    model: str,
+    source_image: Optional[str] = None,
+    params: Optional[dict] = None,
+) -> str:
+    """Hash of (prompt, style, model, source image hash, parameters)"""
+    source_hash = hashlib.sha256(source_image.encode()).hexdigest() if source_image else None
+    payload = json.dumps(
+        {
+            "v": CACHE_VERSION,
+            "prompt": prompt,
+            "style": style,
+            "model": model,
+            "source": source_hash,
+            "params": params or {},
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@instrument("generation_cache")
+class GenerationCache:
+    """Storage-backed cache of generated images with a Redis index"""
+
+    def __init__(self):
+        self.storage = StorageService()
+        self._pending = set()  # Keeps background store tasks alive
+
+    @staticmethod
+    def ttl_for(style: str) -> int:
+        return settings.GENERATION_CACHE_STYLE_TTLS.get(style, settings.GENERATION_CACHE_TTL)
+
+    async def get(self, key: str, count: int = 1, hit_rate: Optional[float] = None) -> List[str]:
+        """
+        Return up to `count` distinct cached image URLs for a key
+
+        Each requested image is served from the cache with probability
+        `hit_rate` (default GENERATION_CACHE_HIT_RATE); missing or skipped ones
+        should be generated.
+        """
+        if hit_rate is None:
+            hit_rate = settings.GENERATION_CACHE_HIT_RATE
+        if not settings.GENERATION_CACHE_ENABLED:
+            return []
+        try:
+            entries = await get_async_redis().lrange(CACHE_KEY.format(key=key), 0, -1)
+        except Exception as e:
+            logger.warning(f"Generation cache lookup failed: {e}")
+            return []
+
+        variants = [json.loads(entry)["url"] for entry in entries]
+        random.shuffle(variants)
+        served = [url for url in variants[:count] if random.random() < hit_rate]
+        if served:
+            logger.info(f"Generation cache hit: {len(served)}/{count} image(s) for {key[:12]}")
+        return served
+
+    async def put(self, key: str, style: str, image_url: str) -> None:
+        """Copy a generated image into storage and add it to the key's variant pool"""
+        # Without the index a stored copy could never be served, so don't
+        # download or upload anything while Redis is unreachable
+        client = get_async_redis()
+        await client.ping()
+
+        async with shared_http_client(timeout=60.0) as http_client:
+            response = await http_client.get(image_url)
+            response.raise_for_status()
+
+        content_type = response.headers.get("content-type", "image/webp").split(";")[0]
+        extension = CONTENT_TYPES.get(content_type, "webp")
+        storage_key = f"generated/cache/{key[:2]}/{key}-{uuid.uuid4().hex[:8]}.{extension}"
+        url = await self.storage.upload_file(response.content, storage_key, content_type)
+
+        redis_key = CACHE_KEY.format(key=key)
+        pipe = client.pipeline()
+        pipe.rpush(redis_key, json.dumps({"url": url, "storage_key": storage_key}))
+        pipe.expire(redis_key, self.ttl_for(style))
+        try:
+            await pipe.execute()
+        except Exception:
+            # Don't leave an unindexed copy behind
+            await self.storage.delete_file(storage_key)
+            raise
+
+        # Evict the oldest variants beyond the pool size
+        while await client.llen(redis_key) > settings.GENERATION_CACHE_MAX_VARIANTS:
+            evicted = await client.lpop(redis_key)
+            if evicted:
+                await self.storage.delete_file(json.loads(evicted)["storage_key"])
+
+    def put_later(self, key: str, style: str, image_url: str) -> None:
+        """Store in the background so callers don't wait for the copy"""
+        if not settings.GENERATION_CACHE_ENABLED:
+            return
+
+        async def store():
+            try:
+                await self.put(key, style, image_url)
+            except Exception as e:
+                logger.warning(f"Failed to cache generated image {image_url[:80]}: {e}")
+
+        task = asyncio.create_task(store())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+
+generation_cache = GenerationCache()
@@ -1,16 +1,90 @@
-import httpx
 import replicate
+import asyncio
 import logging
-from typing import Optional
+import random
+import threading
+from typing import Dict, List, Optional
 import base64
 import openai
 
+from app.core.circuit_breaker import provider_breakers
 from app.core.config import settings
+from app.core.http import shared_http_client
+from app.core.metering import usage_meter
+from app.core.tracing import instrument
+from app.services.generation_cache import generation_cache, generation_cache_key
+from app.services.replicate_predictions import TERMINAL_STATUSES, get_prediction_waiter
 from app.services.storage_service import StorageService
 
 logger = logging.getLogger(__name__)
 
 
+# Estimated cost per image in USD, used to cap hedged spend per job and for
+# usage metering
+PROVIDER_IMAGE_COST = {
+    "dalle3": 0.12,  # 1792x1024 HD
+    "flux-pro": 0.04,
+    "flux-dev": 0.025,
+    "flux-schnell": 0.003,
+    "sdxl": 0.01,
+    # Billed by GPU time on Replicate; typical run length at our settings
+    "sdxl-img2img": 0.01,
+    "controlnet-canny": 0.015,
+    "controlnet-depth": 0.015,
+    "instruct-pix2pix": 0.01,
+}
+
+
+# num_outputs limit shared by FLUX Dev and SDXL on Replicate
+MAX_BATCH_OUTPUTS = 4
+
+# Seconds of the SDXL call's timeout kept for polling when the webhook doesn't come
+SDXL_POLL_RESERVE_SECONDS = 30.0
+
+
+class GenerationBudget:
+    """Estimated image spend of one job; hedges only fire while under the ceiling"""
+    
+    def __init__(self, ceiling: float = None):
+        self.ceiling = settings.IMAGE_JOB_COST_CEILING if ceiling is None else ceiling
+        self.spent = 0.0
+    
+    def spend(self, amount: float) -> None:
+        self.spent += amount
+    
+    def try_spend(self, amount: float) -> bool:
+        if self.spent + amount > self.ceiling:
+            return False
+        self.spent += amount
+        return True
+
+
+class HedgeMetrics:
+    """Counters for hedged image requests"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(
+            ("requests", "hedges_fired", "hedge_wins", "primary_wins", "skipped_budget", "failed"), 0
+        )
+    
+    def incr(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = dict(self._counts)
+        result["hedge_win_rate"] = (
+            round(result["hedge_wins"] / result["hedges_fired"], 4) if result["hedges_fired"] else 0.0
+        )
+        return result
+
+
+hedge_metrics = HedgeMetrics()
+
+
+@instrument("image_generation")
 class ImageGenerationService:
     """Service for generating room design images using Replicate"""
     
@@ -25,6 +99,12 @@ class ImageGenerationService:
             logger.info("Replicate API configured")
         else:
             logger.warning("No Replicate API token configured")
+        
+        # Library calls go to the same base as the direct prediction requests
+        self.replicate_client = replicate.Client(
+            api_token=self.replicate_token or None,
+            base_url=settings.REPLICATE_API_BASE.removesuffix("/v1"),
+        )
     
     async def generate_room_image(
         self,
@@ -32,6 +112,9 @@ class ImageGenerationService:
         style: str = "modern",
         negative_prompt: str = None,
         source_image: str = None,  # Base64 encoded source image for img2img
+        hedge: Optional[bool] = None,
+        budget: Optional[GenerationBudget] = None,
+        cache_hit_rate: Optional[float] = None,
     ) -> str:
         """
         Generate room design image using FLUX, SDXL, or img2img
@@ -41,6 +124,12 @@ class ImageGenerationService:
             style: Design style for additional context
             negative_prompt: Things to avoid in generation
             source_image: Base64 encoded source image for img2img mode
+            hedge: Race the first provider against the next one once it runs
+                longer than usual (defaults to IMAGE_HEDGING_ENABLED)
+            budget: Spend tracker shared by all images of a job; hedges are
+                skipped once it would go over its ceiling
+            cache_hit_rate: Share of requests served from the generation cache
+                (defaults to GENERATION_CACHE_HIT_RATE)
             
         Returns:
             URL of generated image
@@ -49,24 +138,290 @@ class ImageGenerationService:
             logger.warning("No Replicate API configured, returning placeholder")
             return self._get_placeholder_url(style)
         
-        try:
-            # Try DALL-E 3 first (best quality for interior design)
-            if settings.OPENAI_API_KEY:
-                try:
-                    return await self._generate_with_dalle3(prompt)
-                except Exception as e:
-                    logger.warning(f"DALL-E 3 failed: {e}, falling back to FLUX")
+        cache_key = self._cache_key(prompt, style, negative_prompt)
+        cached = await generation_cache.get(cache_key, hit_rate=cache_hit_rate)
+        if cached:
+            return cached[0]
+        
+        image_url = await self._generate_uncached(prompt, negative_prompt, hedge, budget)
+        if image_url is None:
+            logger.error("All image providers failed, returning placeholder")
+            return self._get_placeholder_url(style)
+        
+        generation_cache.put_later(cache_key, style, image_url)
+        return image_url
+    
+    async def prerender(self, prompt: str, style: str, count: int) -> int:
+        """
+        Generate fresh images for a prompt straight into the generation cache
+        
+        Used to warm the style gallery; older variants are evicted as new ones
+        arrive.
+        
+        Returns:
+            Number of images stored
+        
+        Raises:
+            RuntimeError: Every provider failed, so nothing was generated
+        """
+        if not self.replicate_token:
+            return 0
+        
+        cache_key = self._cache_key(prompt, style, None)
+        budget = GenerationBudget(float("inf"))
+        image_urls = await self._generate_batch(prompt, count, None, budget) if count > 1 else []
+        while len(image_urls) < count:
+            image_url = await self._generate_uncached(prompt, None, False, budget)
+            if image_url is None:
+                break
+            image_urls.append(image_url)
+        if count > 0 and not image_urls:
+            raise RuntimeError(f"No images generated for {style} template")
+        
+        for image_url in image_urls:
+            await generation_cache.put(cache_key, style, image_url)
+        return len(image_urls)
+    
+    def _cache_key(self, prompt: str, style: str, negative_prompt: Optional[str]) -> str:
+        # The provider chain is text-to-image only, so the source image doesn't
+        # affect the output and is left out of the key; template prompts then hit
+        # the cache whatever photo the user uploaded
+        model = "dalle3" if settings.OPENAI_API_KEY else "flux-pro"
+        return generation_cache_key(prompt, style, model, params={"negative_prompt": negative_prompt})
+    
+    async def _generate_uncached(
+        self,
+        prompt: str,
+        negative_prompt: Optional[str],
+        hedge: Optional[bool],
+        budget: Optional[GenerationBudget],
+    ) -> Optional[str]:
+        """Run the provider chain; returns None if every provider failed"""
+        # Providers in order of preference. Each model sits behind its own circuit
+        # breaker, so a provider that is down fails immediately instead of after
+        # a full timeout and the next one is tried.
+        # Entries are (name, leading provider, generate)
+        chain = []
+        if settings.OPENAI_API_KEY:
+            chain.append(("DALL-E 3", "dalle3", lambda: self._generate_with_dalle3(prompt)))
+        chain.append(("FLUX", "flux-pro", lambda: self._generate_with_flux(prompt)))
+        chain.append(("SDXL", "sdxl", lambda: self._generate_with_sdxl(prompt, negative_prompt)))
+        
+        if hedge is None:
+            hedge = settings.IMAGE_HEDGING_ENABLED
+        if budget is None:
+            budget = GenerationBudget()
+        
+        if hedge and len(chain) > 1:
+            try:
+                return await self._generate_hedged(chain[0], chain[1], budget)
+            except Exception as e:
+                logger.warning(f"Hedged generation failed: {e}, trying remaining providers")
+            chain = chain[2:]
+        
+        for name, provider, generate in chain:
+            budget.spend(PROVIDER_IMAGE_COST.get(provider, 0.0))
+            try:
+                return await generate()
+            except Exception as e:
+                logger.warning(f"{name} generation failed: {e}, trying next provider")
+        
+        return None
+    
+    async def generate_room_images(
+        self,
+        prompts: List[str],
+        style: str = "modern",
+        negative_prompt: str = None,
+        source_image: str = None,
+        budget: Optional[GenerationBudget] = None,
+        stagger_seconds: float = 0,
+        cache_hit_rate: Optional[float] = None,
+    ) -> List[str]:
+        """
+        Generate one image per prompt, batching identical prompts
+        
+        Each group of identical prompts is served from the generation cache
+        first. Whatever is left is generated; two or more images for the same
+        prompt (e.g. concepts overridden by the user's own requirements) are sent
+        as one multi-output prediction to a model that supports num_outputs
+        (FLUX Dev, then SDXL). Groups run concurrently, optionally starting
+        stagger_seconds apart.
+        
+        Returns:
+            Image URLs in the same order as prompts
+        """
+        if budget is None:
+            budget = GenerationBudget()
+        
+        groups: Dict[str, List[int]] = {}
+        for index, prompt in enumerate(prompts):
+            groups.setdefault(prompt, []).append(index)
+        
+        async def run_group(position: int, prompt: str, indices: List[int]) -> List[str]:
+            if position and stagger_seconds:
+                await asyncio.sleep(position * stagger_seconds)
             
-            # Fallback to FLUX
-            return await self._generate_with_flux(prompt)
-        except Exception as e:
-            logger.error(f"FLUX generation failed: {e}")
+            if not self.replicate_token:
+                return [self._get_placeholder_url(style)] * len(indices)
+            
+            cache_key = self._cache_key(prompt, style, negative_prompt)
+            image_urls = await generation_cache.get(cache_key, count=len(indices), hit_rate=cache_hit_rate)
+            missing = len(indices) - len(image_urls)
+            
+            fresh = []
+            # All prompts share the same source image and output size, so identical
+            # prompts are interchangeable requests
+            if missing > 1 and settings.IMAGE_BATCHING_ENABLED:
+                fresh = await self._generate_batch(prompt, missing, negative_prompt, budget)
+            
+            # Anything the batch didn't cover is generated one by one
+            while len(fresh) < missing:
+                image_url = await self._generate_uncached(prompt, negative_prompt, None, budget)
+                if image_url is None:
+                    break
+                fresh.append(image_url)
+            
+            for image_url in fresh:
+                generation_cache.put_later(cache_key, style, image_url)
+            
+            image_urls += fresh
+            image_urls += [self._get_placeholder_url(style)] * (len(indices) - len(image_urls))
+            random.shuffle(image_urls)  # Don't always put cached images first
+            return image_urls
+        
+        results = await asyncio.gather(*(
+            run_group(position, prompt, indices)
+            for position, (prompt, indices) in enumerate(groups.items())
+        ))
+        
+        image_urls = [None] * len(prompts)
+        for indices, group_urls in zip(groups.values(), results):
+            for index, image_url in zip(indices, group_urls):
+                image_urls[index] = image_url
+        return image_urls
+    
+    async def _generate_batch(
+        self,
+        prompt: str,
+        count: int,
+        negative_prompt: Optional[str],
+        budget: GenerationBudget,
+    ) -> List[str]:
+        """One multi-output prediction for a prompt; returns [] if no batch-capable model works"""
+        batch_models = [
+            ("flux-dev", lambda n: self._generate_flux_dev_images(prompt, n)),
+            ("sdxl", lambda n: self._generate_sdxl_images(prompt, negative_prompt, n)),
+        ]
+        num_outputs = min(count, MAX_BATCH_OUTPUTS)
+        
+        for provider, generate in batch_models:
+            budget.spend(PROVIDER_IMAGE_COST.get(provider, 0.0) * num_outputs)
             try:
-                # Fallback to SDXL text2img
-                return await self._generate_with_sdxl(prompt, negative_prompt)
-            except Exception as e2:
-                logger.error(f"SDXL generation also failed: {e2}")
-                return self._get_placeholder_url(style)
+                image_urls = await generate(num_outputs)
+                logger.info(f"Generated {len(image_urls)} of {count} images for one prompt with {provider}")
+                return image_urls[:count]
+            except Exception as e:
+                logger.warning(f"Batch generation with {provider} failed: {e}")
+        return []
+    
+    def _hedge_delay(self, provider: str) -> float:
+        """How long to wait for a provider before hedging: its recent latency percentile"""
+        delay = provider_breakers.get(provider).latency_percentile(settings.IMAGE_HEDGE_PERCENTILE)
+        return delay if delay is not None else settings.IMAGE_HEDGE_DELAY_SECONDS
+    
+    async def _generate_hedged(self, primary: tuple, secondary: tuple, budget: GenerationBudget) -> str:
+        """
+        Start the primary provider and, if it is still running after its usual
+        latency, fire the secondary too and return whichever succeeds first
+        
+        The losing request is cancelled. A provider that fails before the delay
+        lets the secondary start right away, like a normal fallback.
+        """
+        primary_name, primary_provider, primary_generate = primary
+        secondary_name, secondary_provider, secondary_generate = secondary
+        hedge_metrics.incr("requests")
+        
+        budget.spend(PROVIDER_IMAGE_COST.get(primary_provider, 0.0))
+        primary_task = asyncio.ensure_future(primary_generate())
+        tasks = {primary_task: primary_name}
+        hedged = False
+        
+        try:
+            await asyncio.wait({primary_task}, timeout=self._hedge_delay(primary_provider))
+            if primary_task.done() and primary_task.exception() is None:
+                hedge_metrics.incr("primary_wins")
+                return primary_task.result()
+            
+            if not primary_task.done():
+                if not budget.try_spend(PROVIDER_IMAGE_COST.get(secondary_provider, 0.0)):
+                    hedge_metrics.incr("skipped_budget")
+                    logger.info(f"Not hedging {primary_name}: job image budget of ${budget.ceiling:.2f} reached")
+                    result = await primary_task
+                    hedge_metrics.incr("primary_wins")
+                    return result
+                logger.info(f"{primary_name} is slow, hedging with {secondary_name}")
+                hedge_metrics.incr("hedges_fired")
+                hedged = True
+            else:
+                logger.warning(f"{primary_name} failed: {primary_task.exception()}, trying {secondary_name}")
+                budget.spend(PROVIDER_IMAGE_COST.get(secondary_provider, 0.0))
+            
+            secondary_task = asyncio.ensure_future(secondary_generate())
+            tasks[secondary_task] = secondary_name
+            
+            pending = {task for task in tasks if not task.done()}
+            last_error = primary_task.exception() if primary_task.done() else None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary_task and hedged:
+                            hedge_metrics.incr("hedge_wins")
+                        elif task is primary_task:
+                            hedge_metrics.incr("primary_wins")
+                        logger.info(f"Image from {tasks[task]} won")
+                        return task.result()
+                    last_error = task.exception()
+            
+            hedge_metrics.incr("failed")
+            raise last_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    @staticmethod
+    def _meter_images(provider: str, model: str, count: int) -> None:
+        """Record generated images against the current job"""
+        if count:
+            usage_meter.record(
+                f"image.{provider}", model, PROVIDER_IMAGE_COST.get(provider, 0.0) * count, images=count
+            )
+    
+    async def _run_replicate(self, provider: str, model: str, input: dict):
+        """
+        Run a Replicate model through the provider's circuit breaker
+        
+        Uses the client's async API: a call that times out or loses a hedge is
+        cancelled outright instead of holding a worker thread until Replicate
+        answers.
+        """
+        output = await provider_breakers.get(provider).call(
+            self.replicate_client.async_run,
+            model,
+            input=input,
+            timeout=settings.PROVIDER_TIMEOUT_SECONDS,
+        )
+        self._meter_images(provider, model, len(output) if isinstance(output, (list, tuple)) else int(bool(output)))
+        return output
+    
+    @staticmethod
+    def _first_output(output) -> Optional[str]:
+        """Image URL from a Replicate output (single file or list of files)"""
+        if isinstance(output, (list, tuple)):
+            return str(output[0]) if output else None
+        return str(output) if output else None
     
     async def _generate_with_controlnet(
         self,
@@ -97,7 +452,8 @@ class ImageGenerationService:
         try:
             # Use ControlNet Canny model for edge-based structure preservation
             # This maintains 95%+ room structure similarity
-            output = replicate.run(
+            output = await self._run_replicate(
+                "controlnet-canny",
                 "jagilley/controlnet-canny:aff48af9c68d162388d230a2ab003f68d2638571f6dffa6c2519b6e9bb5d3cbb",
                 input={
                     "image": f"data:image/jpeg;base64,{source_image}",
@@ -147,7 +503,8 @@ class ImageGenerationService:
         logger.info(f"Trying ControlNet depth model...")
         
         try:
-            output = replicate.run(
+            output = await self._run_replicate(
+                "controlnet-depth",
                 "jagilley/controlnet-depth:922c7bb67b87ec32cbc2fd11b1d5f94f0ba4f5519c4dbd02856f0f7e65a97c32",
                 input={
                     "image": f"data:image/jpeg;base64,{source_image}",
@@ -196,7 +553,8 @@ class ImageGenerationService:
         try:
             # Use SDXL img2img model with balanced prompt_strength
             # 0.55 = keep 45% original structure, allow 55% changes for adding items
-            output = replicate.run(
+            output = await self._run_replicate(
+                "sdxl-img2img",
                 "stability-ai/sdxl:7762fd07cf82c948538e41f63f77d685e02b063e37e496e96eefd46c929f9bdc",
                 input={
                     "prompt": full_prompt,
@@ -244,7 +602,8 @@ class ImageGenerationService:
         
         logger.info(f"Trying InstructPix2Pix: {instruction[:100]}...")
         
-        output = replicate.run(
+        output = await self._run_replicate(
+            "instruct-pix2pix",
             "timothybrooks/instruct-pix2pix:30c1d0b916a6f8efce20493f5d61ee27491ab2a60437c13c588468b9810ec23f",
             input={
                 "image": f"data:image/jpeg;base64,{source_image}",
@@ -274,16 +633,19 @@ class ImageGenerationService:
         logger.info(f"Generating with DALL-E 3: {full_prompt[:150]}...")
         
         try:
-            client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+            client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_API_BASE)
             
-            response = client.images.generate(
+            response = await provider_breakers.get("dalle3").call(
+                client.images.generate,
                 model="dall-e-3",
                 prompt=full_prompt,
                 size="1792x1024",  # Wide format for room design
                 quality="hd",  # Higher quality
                 n=1,
+                timeout=settings.PROVIDER_TIMEOUT_SECONDS,
             )
             
+            self._meter_images("dalle3", "dall-e-3", len(response.data))
             image_url = response.data[0].url
             logger.info(f"DALL-E 3 generation successful: {image_url[:80]}...")
             return image_url
@@ -293,82 +655,86 @@ class ImageGenerationService:
             raise
 
     async def _generate_with_flux(self, prompt: str) -> str:
-        """Generate image using FLUX.1.1 Pro (highest quality)"""
+        """Generate image using FLUX.1.1 Pro, falling back to Dev and then Schnell"""
+        
+        full_prompt = self._flux_prompt(prompt)
+        logger.info(f"Generating with FLUX: {full_prompt[:200]}...")
+        
+        models = [
+            # FLUX 1.1 Pro (highest quality)
+            ("flux-pro", "black-forest-labs/flux-1.1-pro", {
+                "prompt": full_prompt,
+                "aspect_ratio": "16:9",
+                "output_format": "webp",
+                "output_quality": 95,
+                "safety_tolerance": 2,
+                "prompt_upsampling": True,  # Enhance prompt for better results
+            }),
+            # FLUX Dev (still high quality, cheaper)
+            ("flux-dev", "black-forest-labs/flux-dev", {
+                "prompt": full_prompt,
+                "num_outputs": 1,
+                "aspect_ratio": "16:9",
+                "output_format": "webp",
+                "output_quality": 90,
+                "guidance": 3.5,
+                "num_inference_steps": 28,
+            }),
+            # FLUX Schnell (fastest, lower quality)
+            ("flux-schnell", "black-forest-labs/flux-schnell", {
+                "prompt": full_prompt,
+                "num_outputs": 1,
+                "aspect_ratio": "16:9",
+                "output_format": "webp",
+                "output_quality": 90,
+            }),
+        ]
         
+        last_error = None
+        for provider, model, model_input in models:
+            try:
+                image_url = self._first_output(await self._run_replicate(provider, model, model_input))
+                if image_url:
+                    logger.info(f"{provider} generation successful: {image_url}")
+                    return image_url
+                last_error = Exception(f"No output from {provider}")
+            except Exception as e:
+                logger.warning(f"{provider} failed: {e}")
+                last_error = e
+        
+        logger.error(f"FLUX generation error: {last_error}")
+        raise last_error
+    
+    @staticmethod
+    def _flux_prompt(prompt: str) -> str:
         # Clean and enhance the prompt for better results
-        full_prompt = (
+        return (
             f"{prompt}, "
             "interior design photograph, professional photography, "
             "sharp focus, high resolution, photorealistic, "
             "natural lighting, clean image, no distortion, no blur"
         )
-        
-        logger.info(f"Generating with FLUX Pro: {full_prompt[:200]}...")
-        
-        try:
-            # Try FLUX 1.1 Pro first (highest quality)
-            try:
-                output = replicate.run(
-                    "black-forest-labs/flux-1.1-pro",
-                    input={
-                        "prompt": full_prompt,
-                        "aspect_ratio": "16:9",
-                        "output_format": "webp",
-                        "output_quality": 95,
-                        "safety_tolerance": 2,
-                        "prompt_upsampling": True,  # Enhance prompt for better results
-                    }
-                )
-                
-                if output:
-                    image_url = str(output)
-                    logger.info(f"FLUX Pro generation successful: {image_url}")
-                    return image_url
-                    
-            except Exception as pro_error:
-                logger.warning(f"FLUX Pro failed, trying Dev: {pro_error}")
-                
-                # Fallback to FLUX Dev (still high quality, cheaper)
-                output = replicate.run(
-                    "black-forest-labs/flux-dev",
-                    input={
-                        "prompt": full_prompt,
-                        "num_outputs": 1,
-                        "aspect_ratio": "16:9",
-                        "output_format": "webp",
-                        "output_quality": 90,
-                        "guidance": 3.5,
-                        "num_inference_steps": 28,
-                    }
-                )
-                
-                if output and len(output) > 0:
-                    image_url = output[0]
-                    logger.info(f"FLUX Dev generation successful: {image_url}")
-                    return str(image_url)
-            
-            # Last resort: FLUX Schnell (fastest, lower quality)
-            output = replicate.run(
-                "black-forest-labs/flux-schnell",
-                input={
-                    "prompt": full_prompt,
-                    "num_outputs": 1,
-                    "aspect_ratio": "16:9",
-                    "output_format": "webp",
-                    "output_quality": 90,
-                }
-            )
-            
-            if output and len(output) > 0:
-                image_url = output[0]
-                logger.info(f"FLUX Schnell generation successful: {image_url}")
-                return str(image_url)
-            else:
-                raise Exception("No output from FLUX")
-                
-        except Exception as e:
-            logger.error(f"FLUX generation error: {e}")
-            raise
+    
+    async def _generate_flux_dev_images(self, prompt: str, num_outputs: int) -> List[str]:
+        """Generate several images for the same prompt with FLUX Dev in a single prediction"""
+        output = await self._run_replicate(
+            "flux-dev",
+            "black-forest-labs/flux-dev",
+            {
+                "prompt": self._flux_prompt(prompt),
+                "num_outputs": num_outputs,
+                "aspect_ratio": "16:9",
+                "output_format": "webp",
+                "output_quality": 90,
+                "guidance": 3.5,
+                "num_inference_steps": 28,
+            },
+        )
+        image_urls = [str(url) for url in (output or [])]
+        if not image_urls:
+            raise Exception("No output from flux-dev")
+        logger.info(f"flux-dev batch generation successful: {len(image_urls)} image(s)")
+        return image_urls
     
     async def _generate_with_sdxl(
         self,
@@ -376,6 +742,15 @@ class ImageGenerationService:
         negative_prompt: str = None,
     ) -> str:
         """Generate image using Stable Diffusion XL via Replicate"""
+        return (await self._generate_sdxl_images(prompt, negative_prompt, num_outputs=1))[0]
+    
+    async def _generate_sdxl_images(
+        self,
+        prompt: str,
+        negative_prompt: str = None,
+        num_outputs: int = 1,
+    ) -> List[str]:
+        """Generate one or more images for the same prompt with SDXL in a single prediction"""
         
         if not negative_prompt:
             negative_prompt = (
@@ -390,66 +765,116 @@ class ImageGenerationService:
             "8k uhd, high resolution, photorealistic, detailed textures"
         )
         
-        logger.info(f"Generating with SDXL: {full_prompt[:100]}...")
+        logger.info(f"Generating {num_outputs} image(s) with SDXL: {full_prompt[:100]}...")
         
         try:
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                # Start prediction
-                response = await client.post(
-                    "https://api.replicate.com/v1/predictions",
+            return await provider_breakers.get("sdxl").call(
+                self._run_sdxl_prediction,
+                full_prompt,
+                negative_prompt,
+                num_outputs,
+                timeout=settings.PROVIDER_TIMEOUT_SECONDS,
+            )
+        except Exception as e:
+            logger.error(f"SDXL generation failed: {e}")
+            raise
+    
+    async def _run_sdxl_prediction(self, full_prompt: str, negative_prompt: str, num_outputs: int = 1) -> List[str]:
+        """
+        Run an SDXL prediction over the Replicate HTTP API
+        
+        With REPLICATE_WEBHOOK_URL set, the prediction reports back through the
+        webhook endpoint and this coroutine is parked until then; otherwise (or if
+        the webhook doesn't arrive) the prediction is polled with backoff.
+        
+        Runs under the breaker's PROVIDER_TIMEOUT_SECONDS, so the webhook wait and
+        the polling share that budget; the webhook wait always leaves
+        SDXL_POLL_RESERVE_SECONDS for polling after a lost webhook.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.PROVIDER_TIMEOUT_SECONDS
+        body = {
+            "version": settings.SDXL_MODEL.split(":")[-1],
+            "input": {
+                "prompt": full_prompt,
+                "negative_prompt": negative_prompt,
+                "width": 1344,
+                "height": 768,
+                "num_outputs": num_outputs,
+                "scheduler": "K_EULER",
+                "num_inference_steps": 30,
+                "guidance_scale": 7.5,
+            },
+        }
+        if settings.REPLICATE_WEBHOOK_URL:
+            body["webhook"] = settings.REPLICATE_WEBHOOK_URL
+            body["webhook_events_filter"] = ["completed"]
+        
+        async with shared_http_client(timeout=30.0) as client:
+            # Start prediction
+            response = await client.post(
+                f"{settings.REPLICATE_API_BASE}/predictions",
+                headers={
+                    "Authorization": f"Token {self.replicate_token}",
+                    "Content-Type": "application/json",
+                },
+                json=body,
+            )
+        
+        if response.status_code != 201:
+            logger.error(f"Replicate API error: {response.text}")
+            raise Exception(f"Failed to start image generation: {response.text}")
+        
+        prediction = response.json()
+        prediction_id = prediction["id"]
+        logger.info(f"SDXL prediction started: {prediction_id}")
+        
+        status = None
+        if settings.REPLICATE_WEBHOOK_URL:
+            webhook_wait = min(
+                settings.REPLICATE_WEBHOOK_TIMEOUT,
+                deadline - loop.time() - SDXL_POLL_RESERVE_SECONDS,
+            )
+            try:
+                status = await get_prediction_waiter().wait(prediction_id, timeout=max(webhook_wait, 0.0))
+            except Exception as e:
+                logger.warning(f"No webhook for prediction {prediction_id} ({e!r}), polling instead")
+        
+        if status is None:
+            # Time out just before the breaker would, with our own error
+            status = await self._poll_prediction(prediction_id, max_wait=deadline - loop.time() - 1.0)
+        
+        if status["status"] == "succeeded" and status.get("output"):
+            image_urls = [str(url) for url in status["output"]]
+            self._meter_images("sdxl", settings.SDXL_MODEL, len(image_urls))
+            logger.info(f"SDXL generation successful: {image_urls}")
+            return image_urls
+        raise Exception(f"Generation failed: {status.get('error') or status['status']}")
+    
+    async def _poll_prediction(self, prediction_id: str, max_wait: float = 120.0) -> dict:
+        """Poll a prediction with exponential backoff until it finishes"""
+        delay = 1.0
+        deadline = asyncio.get_running_loop().time() + max_wait
+        
+        async with shared_http_client(timeout=30.0) as client:
+            while True:
+                status_response = await client.get(
+                    f"{settings.REPLICATE_API_BASE}/predictions/{prediction_id}",
                     headers={
                         "Authorization": f"Token {self.replicate_token}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "version": settings.SDXL_MODEL.split(":")[-1],
-                        "input": {
-                            "prompt": full_prompt,
-                            "negative_prompt": negative_prompt,
-                            "width": 1344,
-                            "height": 768,
-                            "num_outputs": 1,
-                            "scheduler": "K_EULER",
-                            "num_inference_steps": 30,
-                            "guidance_scale": 7.5,
-                        },
                     },
                 )
+                status = status_response.json()
                 
-                if response.status_code != 201:
-                    logger.error(f"Replicate API error: {response.text}")
-                    raise Exception(f"Failed to start image generation: {response.text}")
+                if status["status"] in TERMINAL_STATUSES:
+                    return status
                 
-                prediction = response.json()
-                prediction_id = prediction["id"]
-                logger.info(f"SDXL prediction started: {prediction_id}")
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    raise Exception("Generation timeout")
                 
-                # Poll for completion
-                import asyncio
-                for _ in range(60):  # Max 2 minutes
-                    status_response = await client.get(
-                        f"https://api.replicate.com/v1/predictions/{prediction_id}",
-                        headers={
-                            "Authorization": f"Token {self.replicate_token}",
-                        },
-                    )
-                    
-                    status = status_response.json()
-                    
-                    if status["status"] == "succeeded":
-                        image_url = status["output"][0]
-                        logger.info(f"SDXL generation successful: {image_url}")
-                        return image_url
-                    elif status["status"] == "failed":
-                        raise Exception(f"Generation failed: {status.get('error')}")
-                    
-                    await asyncio.sleep(2)
-                
-                raise Exception("Generation timeout")
-                    
-        except Exception as e:
-            logger.error(f"SDXL generation failed: {e}")
-            raise
+                await asyncio.sleep(min(delay, remaining))
+                delay = min(delay * 1.5, 10.0)
     
     def _get_placeholder_url(self, style: str) -> str:
         """Return a placeholder image URL based on style"""
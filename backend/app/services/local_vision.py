@@ -0,0 +1,344 @@
+import asyncio
+import base64
+import io
+import logging
+import math
+import os
+import threading
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+from app.services.analysis_localization import LOCAL_POTENTIAL, ROOM_NAMES
+from app.core.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+
+# Local room analysis on CPU, for deployments without outbound network access
+#
+# Three ONNX models are loaded once per process:
+#   room_classifier.onnx  scene classifier (e.g. a Places365 ResNet/MobileNet),
+#                         class names in room_classifier.labels, one per line
+#   depth.onnx            monocular relative depth (e.g. MiDaS small)
+#   detector.onnx         COCO object detector exported from YOLOv8 ([N, 84, boxes])
+# Concurrent requests are collected into batches so each model runs once per
+# batch. The result has the same language-neutral shape as the API backends.
+
+CLASSIFIER_FILE = "room_classifier.onnx"
+CLASSIFIER_LABELS_FILE = "room_classifier.labels"
+DEPTH_FILE = "depth.onnx"
+DETECTOR_FILE = "detector.onnx"
+
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32).reshape(3, 1, 1)
+IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32).reshape(3, 1, 1)
+
+# Scene classifier label keywords -> room type (first match wins)
+ROOM_LABEL_KEYWORDS = (
+    ("bathroom", "bathroom"),
+    ("shower", "bathroom"),
+    ("kitchen", "kitchen"),
+    ("dining", "dining"),
+    ("bedroom", "bedroom"),
+    ("dorm", "bedroom"),
+    ("nursery", "bedroom"),
+    ("office", "office"),
+    ("study", "office"),
+    ("living", "living"),
+    ("television_room", "living"),
+    ("recreation_room", "living"),
+)
+
+# COCO class index -> canonical furniture ID
+COCO_FURNITURE = {
+    56: "chair",
+    57: "sofa",
+    58: "plant",
+    59: "bed",
+    60: "dining_table",
+    61: "toilet",
+    62: "tv",
+    63: "computer",
+    69: "stove",
+    71: "sink",
+    72: "refrigerator",
+    73: "bookshelf",  # "book"; books in a room almost always mean a bookshelf
+}
+DETECTION_THRESHOLD = 0.35
+
+# Camera assumptions for the dimension heuristic (typical phone photo of a room)
+CAMERA_HEIGHT = 1.4  # meters
+VERTICAL_FOV = math.radians(50)
+HORIZONTAL_FOV = math.radians(65)
+CAMERA_TILT = math.radians(10)  # pointing slightly down
+DEFAULT_CEILING_HEIGHT = 2.8
+
+
+class LocalVisionUnavailable(Exception):
+    """Raised when the local models or onnxruntime are missing"""
+
+
+def models_available(model_dir: str = None) -> bool:
+    model_dir = model_dir or settings.LOCAL_VISION_MODEL_DIR
+    return all(
+        os.path.exists(os.path.join(model_dir, name))
+        for name in (CLASSIFIER_FILE, CLASSIFIER_LABELS_FILE, DEPTH_FILE, DETECTOR_FILE)
+    )
+
+
+def _room_type(label: str) -> str:
+    label = label.lower()
+    for keyword, room_type in ROOM_LABEL_KEYWORDS:
+        if keyword in label:
+            return room_type
+    return "other"
+
+
+def _to_nchw(image: Image.Image, size: Tuple[int, int], normalize: bool) -> np.ndarray:
+    array = np.asarray(image.resize(size, Image.BILINEAR), dtype=np.float32) / 255.0
+    array = array.transpose(2, 0, 1)
+    if normalize:
+        array = (array - IMAGENET_MEAN) / IMAGENET_STD
+    return array
+
+
+def _input_size(session, default: int) -> Tuple[int, int]:
+    """(width, height) from the model's input shape, default for dynamic axes"""
+    shape = session.get_inputs()[0].shape
+    height = shape[2] if isinstance(shape[2], int) else default
+    width = shape[3] if isinstance(shape[3], int) else default
+    return width, height
+
+
+def estimate_dimensions(inverse_depth: np.ndarray) -> Dict[str, float]:
+    """
+    Estimate room width and length from a relative inverse depth map
+
+    The floor at the bottom edge of the photo is at a known distance given the
+    camera height, field of view and tilt; the ratio of inverse depths between
+    that floor patch and the far wall scales it to the far wall's distance,
+    which approximates the room length. The width is what the horizontal field
+    of view covers at that distance. Ceiling height is not observable reliably
+    and uses the default.
+    """
+    h, w = inverse_depth.shape
+    near = float(np.median(inverse_depth[int(h * 0.95):, w // 3: 2 * w // 3]))
+    far = float(np.median(inverse_depth[int(h * 0.35): int(h * 0.55), int(w * 0.35): int(w * 0.65)]))
+    if near <= 0 or far <= 0:
+        return {"width": 4.0, "length": 5.0, "height": DEFAULT_CEILING_HEIGHT}
+
+    near_distance = CAMERA_HEIGHT / math.tan(VERTICAL_FOV / 2 + CAMERA_TILT)
+    far_distance = near_distance * near / far
+    length = min(15.0, max(2.0, far_distance))
+    width = min(15.0, max(2.0, 2 * far_distance * math.tan(HORIZONTAL_FOV / 2)))
+    return {"width": round(width, 1), "length": round(length, 1), "height": DEFAULT_CEILING_HEIGHT}
+
+
+class LocalVisionModels:
+    """The three ONNX sessions, shared by every request in the process"""
+
+    def __init__(self, model_dir: str = None):
+        model_dir = model_dir or settings.LOCAL_VISION_MODEL_DIR
+        if not models_available(model_dir):
+            raise LocalVisionUnavailable(f"Local vision models not found in {model_dir}")
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise LocalVisionUnavailable("onnxruntime is not installed") from e
+
+        options = onnxruntime.SessionOptions()
+        if settings.LOCAL_VISION_THREADS:
+            options.intra_op_num_threads = settings.LOCAL_VISION_THREADS
+
+        def load(name):
+            return onnxruntime.InferenceSession(
+                os.path.join(model_dir, name), options, providers=["CPUExecutionProvider"]
+            )
+
+        self.classifier = load(CLASSIFIER_FILE)
+        self.depth = load(DEPTH_FILE)
+        self.detector = load(DETECTOR_FILE)
+        with open(os.path.join(model_dir, CLASSIFIER_LABELS_FILE), encoding="utf-8") as f:
+            self.labels = [line.strip() for line in f if line.strip()]
+        self.label_room_types = [_room_type(label) for label in self.labels]
+
+        self.classifier_size = _input_size(self.classifier, 224)
+        self.depth_size = _input_size(self.depth, 256)
+        self.detector_size = _input_size(self.detector, 640)
+        logger.info(f"Loaded local vision models from {model_dir}")
+
+    def preprocess(self, image_base64: str) -> Dict[str, np.ndarray]:
+        image = Image.open(io.BytesIO(base64.b64decode(image_base64))).convert("RGB")
+        small = np.asarray(image.resize((64, 64)), dtype=np.float32) / 255.0
+        return {
+            "classifier": _to_nchw(image, self.classifier_size, normalize=True),
+            "depth": _to_nchw(image, self.depth_size, normalize=True),
+            "detector": _to_nchw(image, self.detector_size, normalize=False),
+            "brightness": float(small.mean()),
+        }
+
+    @staticmethod
+    def _run(session, batch: np.ndarray) -> np.ndarray:
+        return session.run(None, {session.get_inputs()[0].name: batch})[0]
+
+    def _run_batched(self, session, batch: np.ndarray) -> np.ndarray:
+        # Models exported with a fixed batch size of 1 are run image by image
+        if session.get_inputs()[0].shape[0] == 1 and len(batch) > 1:
+            return np.concatenate([self._run(session, batch[i:i + 1]) for i in range(len(batch))])
+        return self._run(session, batch)
+
+    def infer(self, inputs: List[Dict[str, np.ndarray]]) -> List[dict]:
+        """Run all three models on a batch of preprocessed images"""
+        logits = self._run_batched(self.classifier, np.stack([i["classifier"] for i in inputs]))
+        depth = self._run_batched(self.depth, np.stack([i["depth"] for i in inputs]))
+        detections = self._run_batched(self.detector, np.stack([i["detector"] for i in inputs]))
+
+        results = []
+        for n, item in enumerate(inputs):
+            # Room type: softmax probabilities summed per room type
+            scores = logits[n] - logits[n].max()
+            probs = np.exp(scores) / np.exp(scores).sum()
+            room_probs: Dict[str, float] = {}
+            for label_index, room_type in enumerate(self.label_room_types[:len(probs)]):
+                room_probs[room_type] = room_probs.get(room_type, 0.0) + float(probs[label_index])
+            room_type = max(room_probs, key=room_probs.get)
+
+            # Furniture: COCO classes whose best box clears the threshold
+            class_scores = detections[n][4:].max(axis=1)
+            furniture = [
+                furniture_id
+                for class_index, furniture_id in COCO_FURNITURE.items()
+                if class_index < len(class_scores) and class_scores[class_index] >= DETECTION_THRESHOLD
+            ]
+
+            inverse_depth = depth[n].squeeze()
+            results.append({
+                "room_type": room_type,
+                "room_confidence": room_probs[room_type],
+                "dimensions": estimate_dimensions(inverse_depth),
+                "existing_furniture": furniture,
+                "brightness": item["brightness"],
+            })
+        return results
+
+
+def describe(raw: dict) -> dict:
+    """
+    Turn model outputs into the language-neutral analysis (English text)
+
+    Every text here has a fixed translation in analysis_localization.STATIC_TEXTS.
+    """
+    brightness = raw["brightness"]
+    furniture = raw["existing_furniture"]
+    dims = raw["dimensions"]
+
+    if brightness > 0.6:
+        lighting = "Bright, with plenty of light"
+    elif brightness > 0.35:
+        lighting = "Moderate lighting"
+    else:
+        lighting = "Dim, the room needs more light"
+
+    problems = []
+    if brightness <= 0.35:
+        problems.append("Insufficient lighting")
+    if len(furniture) <= 1:
+        problems.append("Sparsely furnished")
+    if len(furniture) >= 6 and dims["width"] * dims["length"] < 15:
+        problems.append("Crowded layout for the floor area")
+
+    return {
+        "room_type": raw["room_type"],
+        "dimensions": dims,
+        "existing_furniture": furniture,
+        "current_style": "Not determined (offline analysis)",
+        "lighting": lighting,
+        "problems": problems,
+        "potential": LOCAL_POTENTIAL.format(room=ROOM_NAMES[raw["room_type"]]["en"]),
+        "confidence": round(raw["room_confidence"], 2),
+    }
+
+
+_models: Optional[LocalVisionModels] = None
+_models_lock = threading.Lock()
+
+
+def get_local_models() -> LocalVisionModels:
+    """Load the models on first use; every later call gets the same instance"""
+    global _models
+    if _models is None:
+        with _models_lock:
+            if _models is None:
+                _models = LocalVisionModels()
+    return _models
+
+
+class _InferenceBatcher:
+    """Collects concurrent requests on one event loop into model batches"""
+
+    def __init__(self, models: LocalVisionModels):
+        self.models = models
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    async def submit(self, inputs: Dict[str, np.ndarray]) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((inputs, future))
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + settings.LOCAL_VISION_BATCH_WAIT_MS / 1000
+            while len(batch) < settings.LOCAL_VISION_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [(inputs, future) for inputs, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                results = await asyncio.to_thread(self.models.infer, [inputs for inputs, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+_batchers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _InferenceBatcher]" = weakref.WeakKeyDictionary()
+
+
+@traced("vision.local")
+async def analyze_room_local(image_base64: str) -> dict:
+    """
+    Analyze a room photo with the local models
+
+    Returns:
+        Language-neutral analysis, same shape as VisionService.analyze_room_canonical
+
+    Raises:
+        LocalVisionUnavailable: If the models or onnxruntime are missing
+    """
+    models = get_local_models()
+    loop = asyncio.get_running_loop()
+    batcher = _batchers.get(loop)
+    if batcher is None:
+        batcher = _batchers[loop] = _InferenceBatcher(models)
+
+    inputs = await asyncio.to_thread(models.preprocess, image_base64)
+    return describe(await batcher.submit(inputs))
@@ -0,0 +1,140 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import time
+import weakref
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+
+# Replicate prediction completion
+#
+# Predictions are created with a webhook pointing at /api/v1/webhooks/replicate.
+# The API process that receives the callback stores the final prediction in
+# Redis and publishes it, and whichever process started the prediction (an API
+# worker in background mode or a Celery worker) resolves its parked coroutine
+# from a single pattern subscription instead of polling.
+
+PREDICTION_KEY = "replicate:prediction:{id}"
+PREDICTION_CHANNEL = "replicate:predictions:{id}"
+PREDICTION_TTL = 3600  # seconds
+
+TERMINAL_STATUSES = ("succeeded", "failed", "canceled")
+
+# Clock skew allowed between Replicate's webhook timestamp and ours (seconds)
+WEBHOOK_TOLERANCE = 300
+
+
+def verify_webhook_signature(headers, body: bytes, secret: str = None) -> bool:
+    """
+    Verify a Replicate webhook signature
+
+    Replicate signs "<webhook-id>.<webhook-timestamp>.<body>" with HMAC-SHA256
+    using the account's webhook signing secret ("whsec_<base64 key>").
+    """
+    secret = secret or settings.REPLICATE_WEBHOOK_SECRET
+    webhook_id = headers.get("webhook-id")
+    timestamp = headers.get("webhook-timestamp")
+    signatures = headers.get("webhook-signature")
+    if not (webhook_id and timestamp and signatures):
+        return False
+
+    try:
+        if abs(time.time() - int(timestamp)) > WEBHOOK_TOLERANCE:
+            return False
+        key = base64.b64decode(secret.split("_", 1)[-1])
+    except ValueError:
+        return False
+
+    signed = f"{webhook_id}.{timestamp}.".encode() + body
+    expected = base64.b64encode(hmac.new(key, signed, hashlib.sha256).digest()).decode()
+    return any(
+        hmac.compare_digest(expected, signature.split(",", 1)[-1])
+        for signature in signatures.split()
+    )
+
+
+class PredictionWaiter:
+    """Parks coroutines until their prediction's webhook has been received"""
+
+    def __init__(self):
+        self._client = get_async_redis()
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._listener: Optional[asyncio.Task] = None
+        self._subscribed: Optional[asyncio.Future] = None
+
+    async def publish(self, prediction: dict) -> None:
+        """Store a finished prediction and wake up its waiter, wherever it runs"""
+        payload = json.dumps(prediction)
+        prediction_id = prediction["id"]
+        pipe = self._client.pipeline()
+        pipe.set(PREDICTION_KEY.format(id=prediction_id), payload, ex=PREDICTION_TTL)
+        pipe.publish(PREDICTION_CHANNEL.format(id=prediction_id), payload)
+        await pipe.execute()
+
+    async def _listen(self) -> None:
+        pubsub = self._client.pubsub()
+        try:
+            await pubsub.psubscribe(PREDICTION_CHANNEL.format(id="*"))
+            self._subscribed.set_result(None)
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                prediction = json.loads(message["data"])
+                future = self._futures.get(prediction.get("id"))
+                if future is not None and not future.done():
+                    future.set_result(prediction)
+        except Exception as e:
+            if not self._subscribed.done():
+                self._subscribed.set_exception(e)
+            logger.warning(f"Prediction listener stopped: {e}")
+            for future in self._futures.values():
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._listener = None
+            await pubsub.reset()
+
+    async def _ensure_listener(self) -> None:
+        if self._listener is None:
+            self._subscribed = asyncio.get_running_loop().create_future()
+            self._listener = asyncio.create_task(self._listen())
+        await asyncio.shield(self._subscribed)
+
+    async def wait(self, prediction_id: str, timeout: float) -> dict:
+        """
+        Wait for a prediction's completion webhook
+
+        Raises:
+            asyncio.TimeoutError: If no webhook arrives in time
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._futures[prediction_id] = future
+        try:
+            await self._ensure_listener()
+            # The webhook may have arrived before we subscribed
+            stored = await self._client.get(PREDICTION_KEY.format(id=prediction_id))
+            if stored and not future.done():
+                future.set_result(json.loads(stored))
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._futures.pop(prediction_id, None)
+
+
+# One waiter per event loop, like the shared HTTP client
+_waiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, PredictionWaiter]" = weakref.WeakKeyDictionary()
+
+
+def get_prediction_waiter() -> PredictionWaiter:
+    loop = asyncio.get_running_loop()
+    waiter = _waiters.get(loop)
+    if waiter is None:
+        waiter = _waiters[loop] = PredictionWaiter()
+    return waiter
@@ -0,0 +1,48 @@
+import re
+from typing import FrozenSet
+
+from app.core.keyword_matcher import KeywordMatcher
+
+
+# Intent tags and the Chinese/English keywords that signal them in user
+# requirements. Add a keyword here and every rule keyed on its tag picks it up.
+INTENT_KEYWORDS = {
+    # Furniture and room features
+    "workspace": ["workspace", "work", "办公", "工作"],
+    "plants": ["plants", "绿植", "植物"],
+    "storage": ["storage", "收纳", "储物"],
+    "reading": ["reading", "阅读", "书"],
+    "sofa": ["sofa", "沙发"],
+    "tv": ["tv", "电视"],
+    "coffee_table": ["coffee", "茶几"],
+    "lamp": ["lamp", "灯"],
+    "rug": ["rug", "地毯"],
+    "art": ["art", "画", "艺术"],
+    "computer": ["computer", "pc", "电脑", "计算机"],
+    "many": ["很多", "multiple", "many"],
+    # Changing the room's walls or floor rather than only its contents
+    "base_change": [
+        "换墙", "换地板", "改墙", "改地", "木地板", "瓷砖", "大理石",
+        "change wall", "change floor", "new floor", "new wall",
+    ],
+    # Brands
+    "asus": ["asus", "华硕"],
+    "msi": ["msi"],
+    "apple": ["apple", "苹果", "imac"],
+    "gaming": ["gaming", "游戏", "电竞"],
+}
+
+# Keywords too short to match as substrings ("mac" is in "machine"): they only
+# count when not run together with other Latin letters ("mac电脑" still matches)
+WORD_INTENTS = {
+    "mac": re.compile(r"(?<![a-z])mac(?![a-z])", re.IGNORECASE),
+}
+
+intent_matcher = KeywordMatcher(INTENT_KEYWORDS)
+
+
+def detect_intents(*texts: str) -> FrozenSet[str]:
+    """Intent tags mentioned anywhere in the given texts"""
+    tags = intent_matcher.tags(*texts)
+    words = {tag for tag, pattern in WORD_INTENTS.items() if any(pattern.search(text or "") for text in texts)}
+    return tags | words if words else tags
@@ -1,13 +1,15 @@
-import httpx
 import logging
 from typing import Optional
 import base64
 
 from app.core.config import settings
+from app.core.http import shared_http_client
+from app.core.tracing import instrument
 
 logger = logging.getLogger(__name__)
 
 
+@instrument("segmentation")
 class SegmentationService:
     """SAM (Segment Anything Model) service for object segmentation"""
     
@@ -30,7 +32,7 @@ class SegmentationService:
             return None
         
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
+            async with shared_http_client(timeout=60.0) as client:
                 # Decode base64 to bytes
                 image_bytes = base64.b64decode(image_base64)
                 
@@ -122,7 +124,7 @@ class SegmentationService:
             return []
         
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
+            async with shared_http_client(timeout=60.0) as client:
                 image_bytes = base64.b64decode(image_base64)
                 
                 # Use automatic mask generation
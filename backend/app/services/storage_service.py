@@ -1,14 +1,19 @@
+import asyncio
 import os
 import uuid
 import logging
-from typing import Optional
+from typing import AsyncIterator, Optional
 import aiofiles
 
 from app.core.config import settings
+from app.core.tracing import instrument
 
 logger = logging.getLogger(__name__)
 
+S3_MULTIPART_CHUNK_SIZE = 5 * 1024 * 1024  # S3's minimum part size
 
+
+@instrument("storage")
 class StorageService:
     """Service for file storage (local, S3, or R2)"""
     
@@ -60,6 +65,107 @@ class StorageService:
         else:
             return await self._upload_local(content, filename)
     
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        filename: str,
+        content_type: str = "application/octet-stream",
+    ) -> str:
+        """
+        Upload a file from an async iterator of chunks without holding it in memory
+        
+        If the iterator raises (e.g. an upload over the size limit), the partial
+        file is removed and the exception propagates.
+        
+        Args:
+            chunks: File content in chunks
+            filename: Target filename (can include path)
+            content_type: MIME type
+            
+        Returns:
+            URL to access the file
+        """
+        if self.storage_type in ["s3", "r2"]:
+            return await self._upload_stream_to_s3(chunks, filename, content_type)
+        else:
+            return await self._upload_stream_local(chunks, filename)
+    
+    async def _upload_stream_to_s3(
+        self,
+        chunks: AsyncIterator[bytes],
+        filename: str,
+        content_type: str,
+    ) -> str:
+        """Multipart upload to S3 or R2, one part per S3_MULTIPART_CHUNK_SIZE bytes"""
+        upload = await asyncio.to_thread(
+            self.s3_client.create_multipart_upload,
+            Bucket=self.bucket,
+            Key=filename,
+            ContentType=content_type,
+        )
+        upload_id = upload["UploadId"]
+        parts = []
+        buffer = bytearray()
+        
+        async def flush():
+            response = await asyncio.to_thread(
+                self.s3_client.upload_part,
+                Bucket=self.bucket,
+                Key=filename,
+                UploadId=upload_id,
+                PartNumber=len(parts) + 1,
+                Body=bytes(buffer),
+            )
+            parts.append({"ETag": response["ETag"], "PartNumber": len(parts) + 1})
+            buffer.clear()
+        
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                # Every part but the last must be at least 5 MB
+                if len(buffer) >= S3_MULTIPART_CHUNK_SIZE:
+                    await flush()
+            if buffer or not parts:
+                await flush()
+            await asyncio.to_thread(
+                self.s3_client.complete_multipart_upload,
+                Bucket=self.bucket,
+                Key=filename,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            await asyncio.to_thread(
+                self.s3_client.abort_multipart_upload,
+                Bucket=self.bucket,
+                Key=filename,
+                UploadId=upload_id,
+            )
+            raise
+        
+        if self.storage_type == "s3":
+            return f"https://{self.bucket}.s3.{settings.AWS_S3_REGION}.amazonaws.com/{filename}"
+        return f"https://{self.bucket}.r2.dev/{filename}"
+    
+    async def _upload_stream_local(
+        self,
+        chunks: AsyncIterator[bytes],
+        filename: str,
+    ) -> str:
+        """Stream to the local filesystem"""
+        filepath = os.path.join(self.local_path, filename)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        try:
+            async with aiofiles.open(filepath, "wb") as f:
+                async for chunk in chunks:
+                    await f.write(chunk)
+        except BaseException:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            raise
+        
+        return f"/uploads/{filename}"
+    
     async def _upload_to_s3(
         self,
         content: bytes,
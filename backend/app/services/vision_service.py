@@ -1,72 +1,87 @@
 import anthropic
 import openai
-import json
 import logging
 import base64
 from typing import Optional
 
 from app.core.config import settings
+from app.core.json_utils import extract_json
+from app.core.llm import cached_system, llm_usage
+from app.core.tracing import instrument
+from app.services.analysis_localization import (
+    FURNITURE_NAMES,
+    ROOM_TYPES,
+    canonical_furniture_id,
+    localize_analysis,
+)
+from app.services.local_vision import analyze_room_local, models_available
 
 logger = logging.getLogger(__name__)
 
 
-ROOM_ANALYSIS_PROMPT_ZH = """
-分析这张室内照片,提供以下信息(以JSON格式返回):
-
-{
-  "room_type": "房间类型(living/bedroom/kitchen/bathroom/office/dining/other)",
-  "dimensions": {
-    "width": "估计宽度(米,数字)",
-    "length": "估计长度(米,数字)",
-    "height": "估计层高(米,数字)"
-  },
-  "existing_furniture": ["现有家具列表"],
-  "current_style": "当前装修风格描述",
-  "lighting": "光线情况描述",
-  "problems": ["发现的问题列表"],
-  "potential": "空间改造潜力分析",
-  "confidence": "分析置信度(0-1之间的数字)"
-}
-
-请确保返回有效的JSON格式。对于dimensions中的数值,请只返回数字,不要包含单位。所有文字描述请用中文。
-"""
-
-ROOM_ANALYSIS_PROMPT_EN = """
+# The analysis is requested in a language-neutral form (IDs, numbers, English
+# text, plus the Chinese text so zh needs no second call) and localized
+# afterwards, so switching language never repeats this call
+ROOM_ANALYSIS_PROMPT = """
 Analyze this interior photo and provide the following information (return as JSON):
 
 {
-  "room_type": "room type (living/bedroom/kitchen/bathroom/office/dining/other)",
+  "room_type": "one of: living, bedroom, kitchen, bathroom, office, dining, other",
   "dimensions": {
     "width": "estimated width in meters (number only)",
     "length": "estimated length in meters (number only)",
     "height": "estimated ceiling height in meters (number only)"
   },
-  "existing_furniture": ["list of existing furniture"],
-  "current_style": "description of current interior style",
+  "existing_furniture": ["furniture IDs, see below"],
+  "current_style": "short description of current interior style",
   "lighting": "description of lighting conditions",
   "problems": ["list of identified issues"],
   "potential": "analysis of renovation potential",
-  "confidence": "analysis confidence (number between 0-1)"
+  "confidence": "analysis confidence (number between 0-1)",
+  "translations": {
+    "zh": {
+      "current_style": "current_style in Simplified Chinese",
+      "lighting": "lighting in Simplified Chinese",
+      "problems": ["problems in Simplified Chinese, same order"],
+      "potential": "potential in Simplified Chinese",
+      "other_furniture": {"snake_case name not in the ID list": "its Simplified Chinese name"}
+    }
+  }
 }
 
-Please ensure valid JSON format. For dimension values, return numbers only without units. All text descriptions should be in English.
-"""
+For existing_furniture use these IDs where they fit: %s.
+For anything else use a short English name in snake_case.
+
+Please ensure valid JSON format. For dimension values, return numbers only without units. All text descriptions should be in English, with their Simplified Chinese versions under "translations".
+""" % ", ".join(FURNITURE_NAMES)
+
+# Per-call user message accompanying the image; the prompt above is sent as system
+ROOM_ANALYSIS_REQUEST = "Please analyze this interior photo as instructed and return JSON only."
 
 
+@instrument("vision")
 class VisionService:
-    """Vision service for room analysis - supports Claude and OpenAI"""
+    """Vision service for room analysis - supports Claude, OpenAI and local ONNX models"""
     
     def __init__(self):
         self.anthropic_client = None
         self.openai_client = None
+        self.use_local = settings.VISION_BACKEND == "local"
         
+        if self.use_local:
+            logger.info("Using local models for vision analysis")
         # Prefer Claude
-        if settings.ANTHROPIC_API_KEY:
-            self.anthropic_client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+        elif settings.ANTHROPIC_API_KEY:
+            self.anthropic_client = anthropic.AsyncAnthropic(
+                api_key=settings.ANTHROPIC_API_KEY, base_url=settings.ANTHROPIC_API_BASE
+            )
             logger.info("Using Claude for vision analysis")
         elif settings.OPENAI_API_KEY:
-            self.openai_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+            self.openai_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_API_BASE)
             logger.info("Using OpenAI for vision analysis")
+        elif settings.VISION_BACKEND == "auto" and models_available():
+            self.use_local = True
+            logger.info("No API key configured, using local models for vision analysis")
         else:
             logger.warning("No API key configured, using mock data")
     
@@ -79,21 +94,37 @@ class VisionService:
             language: Language for response ("zh" or "en")
             
         Returns:
-            Room analysis result dictionary
+            Room analysis result dictionary, including its language-neutral
+            form under "canonical" for localizing it again later
+        """
+        canonical = await self.analyze_room_canonical(image_base64)
+        return await localize_analysis(canonical, language)
+    
+    async def analyze_room_canonical(self, image_base64: str) -> dict:
         """
+        Analyze room image into the language-neutral form
+        
+        Returns:
+            Analysis with room type and furniture IDs, numeric dimensions and
+            English text fields
+        """
+        # Local models (on-prem deployments without outbound network)
+        if self.use_local:
+            return self._validate_analysis(await analyze_room_local(image_base64))
+        
         # Try Claude first
         if self.anthropic_client:
-            return await self._analyze_with_claude(image_base64, language)
+            return await self._analyze_with_claude(image_base64)
         
         # Fallback to OpenAI
         if self.openai_client:
-            return await self._analyze_with_openai(image_base64, language)
+            return await self._analyze_with_openai(image_base64)
         
         # Return mock data if no API configured
         logger.warning("No API client available, returning mock data")
-        return self._get_mock_analysis(language)
+        return self._get_mock_analysis()
     
-    async def _analyze_with_claude(self, image_base64: str, language: str = "zh") -> dict:
+    async def _analyze_with_claude(self, image_base64: str) -> dict:
         """Analyze room using Claude 3.5 Sonnet"""
         try:
             # Determine media type
@@ -105,12 +136,12 @@ class VisionService:
             elif image_base64.startswith("UklGR"):
                 media_type = "image/webp"
             
-            # Select prompt based on language
-            prompt = ROOM_ANALYSIS_PROMPT_ZH if language == "zh" else ROOM_ANALYSIS_PROMPT_EN
-            
-            message = self.anthropic_client.messages.create(
+            # Static analysis instructions go in a cached system block; only the
+            # image and a short request vary per call
+            message = await self.anthropic_client.messages.create(
                 model=settings.CLAUDE_MODEL,
                 max_tokens=2048,
+                system=cached_system(ROOM_ANALYSIS_PROMPT),
                 messages=[
                     {
                         "role": "user",
@@ -125,28 +156,26 @@ class VisionService:
                             },
                             {
                                 "type": "text",
-                                "text": prompt,
+                                "text": ROOM_ANALYSIS_REQUEST,
                             }
                         ],
                     }
                 ],
             )
+            llm_usage.record("vision.analyze_room", message.usage, message.model)
             
             # Parse response
             content = message.content[0].text
             result = self._extract_json(content)
-            return self._validate_analysis(result, language)
+            return self._validate_analysis(result)
             
         except Exception as e:
             logger.error(f"Claude vision analysis failed: {e}")
             raise
     
-    async def _analyze_with_openai(self, image_base64: str, language: str = "zh") -> dict:
+    async def _analyze_with_openai(self, image_base64: str) -> dict:
         """Analyze room using OpenAI GPT-4 Vision"""
         try:
-            # Select prompt based on language
-            prompt = ROOM_ANALYSIS_PROMPT_ZH if language == "zh" else ROOM_ANALYSIS_PROMPT_EN
-            
             response = await self.openai_client.chat.completions.create(
                 model=settings.OPENAI_MODEL,
                 messages=[
@@ -155,7 +184,7 @@ class VisionService:
                         "content": [
                             {
                                 "type": "text",
-                                "text": prompt,
+                                "text": ROOM_ANALYSIS_PROMPT,
                             },
                             {
                                 "type": "image_url",
@@ -172,7 +201,7 @@ class VisionService:
             
             content = response.choices[0].message.content
             result = self._extract_json(content)
-            return self._validate_analysis(result, language)
+            return self._validate_analysis(result)
             
         except Exception as e:
             logger.error(f"OpenAI vision analysis failed: {e}")
@@ -180,46 +209,11 @@ class VisionService:
     
     def _extract_json(self, content: str) -> dict:
         """Extract JSON from API response"""
-        import re
-        
-        # Try direct JSON parse
-        try:
-            return json.loads(content)
-        except json.JSONDecodeError:
-            pass
-        
-        # Try to find JSON in markdown code block
-        json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', content)
-        if json_match:
-            try:
-                return json.loads(json_match.group(1))
-            except json.JSONDecodeError:
-                pass
-        
-        # Try to find JSON object pattern
-        json_match = re.search(r'\{[\s\S]*\}', content)
-        if json_match:
-            try:
-                return json.loads(json_match.group(0))
-            except json.JSONDecodeError:
-                pass
-        
-        raise ValueError("Could not extract JSON from response")
+        return extract_json(content)
     
-    def _validate_analysis(self, result: dict, language: str = "zh") -> dict:
-        """Validate and normalize analysis result"""
-        defaults_zh = {
-            "room_type": "living",
-            "dimensions": {"width": 4.0, "length": 5.0, "height": 2.8},
-            "existing_furniture": [],
-            "current_style": "未识别",
-            "lighting": "一般",
-            "problems": [],
-            "potential": "有改造空间",
-            "confidence": 0.7,
-        }
-        
-        defaults_en = {
+    def _validate_analysis(self, result: dict) -> dict:
+        """Validate and normalize a language-neutral analysis result"""
+        defaults = {
             "room_type": "living",
             "dimensions": {"width": 4.0, "length": 5.0, "height": 2.8},
             "existing_furniture": [],
@@ -230,12 +224,13 @@ class VisionService:
             "confidence": 0.7,
         }
         
-        defaults = defaults_zh if language == "zh" else defaults_en
-        
         for key, default in defaults.items():
             if key not in result:
                 result[key] = default
         
+        if result["room_type"] not in ROOM_TYPES:
+            result["room_type"] = "other"
+        
         # Ensure dimensions are floats
         dims = result.get("dimensions", {})
         result["dimensions"] = {
@@ -244,43 +239,31 @@ class VisionService:
             "height": float(dims.get("height", 2.8)),
         }
         
+        result["existing_furniture"] = [
+            canonical_furniture_id(str(item)) for item in result["existing_furniture"] if str(item).strip()
+        ]
+        
         # Ensure confidence is float
         result["confidence"] = float(result.get("confidence", 0.7))
         
         return result
     
-    def _get_mock_analysis(self, language: str = "zh") -> dict:
+    def _get_mock_analysis(self) -> dict:
         """Return mock analysis data for development"""
-        if language == "zh":
-            return {
-                "room_type": "living",
-                "dimensions": {
-                    "width": 5.5,
-                    "length": 4.2,
-                    "height": 2.8,
-                },
-                "existing_furniture": ["沙发", "茶几", "电视柜", "书架"],
-                "current_style": "现代简约",
-                "lighting": "自然光充足，东向窗户",
-                "problems": ["空间利用不足", "色彩单调", "缺乏装饰元素"],
-                "potential": "可以通过添加绿植、艺术画和调整家具布局来提升空间感",
-                "confidence": 0.92,
-            }
-        else:
-            return {
-                "room_type": "living",
-                "dimensions": {
-                    "width": 5.5,
-                    "length": 4.2,
-                    "height": 2.8,
-                },
-                "existing_furniture": ["Sofa", "Coffee Table", "TV Stand", "Bookshelf"],
-                "current_style": "Modern Minimalist",
-                "lighting": "Natural light sufficient, east-facing windows",
-                "problems": ["Underutilized space", "Monotone colors", "Lack of decorative elements"],
-                "potential": "Can improve space by adding plants, artwork, and adjusting furniture layout",
-                "confidence": 0.92,
-            }
+        return {
+            "room_type": "living",
+            "dimensions": {
+                "width": 5.5,
+                "length": 4.2,
+                "height": 2.8,
+            },
+            "existing_furniture": ["sofa", "coffee_table", "tv_stand", "bookshelf"],
+            "current_style": "Modern Minimalist",
+            "lighting": "Natural light sufficient, east-facing windows",
+            "problems": ["Underutilized space", "Monotone colors", "Lack of decorative elements"],
+            "potential": "Can improve space by adding plants, artwork, and adjusting furniture layout",
+            "confidence": 0.92,
+        }
 
 
 # Design prompt generation
@@ -1,25 +1,41 @@
+import asyncio
+import base64
 import logging
+from typing import List, Optional
+
+from celery import group
+from celery.result import GroupResult
+
 from app.celery_app import celery_app
-from app.services.vision_service import VisionService
-from app.services.segmentation_service import SegmentationService
+from app.services.analysis_pipeline import RoomAnalysisPipeline
 from app.services.storage_service import StorageService
+from app.tasks.runtime import run_async
 
 logger = logging.getLogger(__name__)
 
-vision_service = VisionService()
-segmentation_service = SegmentationService()
+analysis_pipeline = RoomAnalysisPipeline()
 storage_service = StorageService()
 
 
 @celery_app.task(bind=True, max_retries=3)
-def analyze_room_image(self, job_id: str, image_base64: str, image_url: str):
+def analyze_room_image(
+    self,
+    job_id: str,
+    image_base64: Optional[str],
+    image_url: str,
+    language: str = "zh",
+    storage_key: Optional[str] = None,
+):
     """
     Celery task to analyze room image
     
     Args:
         job_id: Unique job identifier
-        image_base64: Base64 encoded image data
+        image_base64: Base64 encoded image data, or None when storage_key is given
         image_url: URL of the uploaded image
+        language: Response language ("zh" or "en")
+        storage_key: Storage key of the uploaded image; preferred over passing the
+            image through the broker
     
     Returns:
         Analysis result dictionary
@@ -27,61 +43,45 @@ def analyze_room_image(self, job_id: str, image_base64: str, image_url: str):
     try:
         logger.info(f"Starting room analysis for job {job_id}")
         
+        if image_base64 is None:
+            content = run_async(storage_service.get_file(storage_key))
+            if content is None:
+                raise Exception(f"Image not found in storage: {storage_key}")
+            image_base64 = base64.b64encode(content).decode("utf-8")
+        
         # Update task state
         self.update_state(
             state="PROGRESS",
             meta={"progress": 10, "status": "Analyzing room..."}
         )
         
-        # Step 1: GPT-4 Vision Analysis
-        import asyncio
-        loop = asyncio.get_event_loop()
-        analysis_result = loop.run_until_complete(
-            vision_service.analyze_room(image_base64)
-        )
-        
-        self.update_state(
-            state="PROGRESS",
-            meta={"progress": 50, "status": "Room analysis complete"}
-        )
+        # Vision analysis and segmentation run concurrently; each stage change is
+        # published with the partial result so clients see the analysis before
+        # segmentation is done. Updates are written off the event loop, one at a
+        # time so they land in order (the request context is thread-local, so the
+        # task ID is passed explicitly).
+        task_id = self.request.id
+        publish_lock = asyncio.Lock()
         
-        # Step 2: Object Segmentation (optional)
-        segmentation_url = None
-        try:
-            self.update_state(
-                state="PROGRESS",
-                meta={"progress": 60, "status": "Segmenting objects..."}
-            )
-            
-            segmentation_result = loop.run_until_complete(
-                segmentation_service.segment_image(image_base64)
-            )
-            
-            if segmentation_result:
-                import base64
-                segmentation_url = loop.run_until_complete(
-                    storage_service.upload_file(
-                        base64.b64decode(segmentation_result),
-                        f"rooms/{job_id}/segmentation.png",
-                        "image/png"
-                    )
+        async def on_progress(progress, stages, partial_result):
+            running = [name for name, state in stages.items() if state == "running"]
+            async with publish_lock:
+                await asyncio.to_thread(
+                    self.update_state,
+                    task_id=task_id,
+                    state="PROGRESS",
+                    meta={
+                        "progress": progress,
+                        "status": f"Running {', '.join(running)}..." if running else "Finalizing...",
+                        "stages": stages,
+                        "result": partial_result,
+                    },
                 )
-        except Exception as e:
-            logger.warning(f"Segmentation failed for job {job_id}: {e}")
         
-        self.update_state(
-            state="PROGRESS",
-            meta={"progress": 90, "status": "Finalizing..."}
+        result = run_async(
+            analysis_pipeline.run(job_id, image_base64, image_url, language, on_progress=on_progress)
         )
         
-        # Combine results
-        result = {
-            "id": job_id,
-            "image_url": image_url,
-            "segmentation_url": segmentation_url,
-            **analysis_result
-        }
-        
         logger.info(f"Room analysis completed for job {job_id}")
         return result
         
@@ -90,35 +90,118 @@ def analyze_room_image(self, job_id: str, image_base64: str, image_url: str):
         self.retry(countdown=10, exc=e)
 
 
-@celery_app.task(bind=True)
-def batch_analyze_rooms(self, job_ids: list, images: list):
+def start_batch_analysis(items: List[dict], language: str = "zh") -> GroupResult:
     """
-    Batch analyze multiple room images
+    Enqueue a batch of room analyses as one Celery group
+    
+    Images must already be in storage; only their keys travel through the broker.
+    The group result is saved so progress can be read and the batch cancelled later
+    from any process.
+    
+    Args:
+        items: Dicts with job_id, key (storage key) and url
+        language: Response language ("zh" or "en")
+    
+    Returns:
+        The saved GroupResult; its id is the batch ID
+    """
+    batch = group(
+        analyze_room_image.signature(
+            (item["job_id"], None, item["url"]),
+            {"language": language, "storage_key": item["key"]},
+            task_id=item["job_id"],
+        )
+        for item in items
+    )
+    result = batch.apply_async()
+    result.save()
+    
+    logger.info(f"Queued batch {result.id} with {len(items)} room analyses")
+    return result
+
+
+def get_batch_status(batch_id: str) -> Optional[dict]:
     """
-    results = []
-    total = len(job_ids)
+    Aggregate completion progress of a batch from its members' results
     
-    for i, (job_id, image_data) in enumerate(zip(job_ids, images)):
-        try:
-            self.update_state(
-                state="PROGRESS",
-                meta={
-                    "progress": int((i / total) * 100),
-                    "current": i + 1,
-                    "total": total
-                }
-            )
-            
-            result = analyze_room_image.delay(
-                job_id,
-                image_data["base64"],
-                image_data["url"]
-            )
-            results.append({"job_id": job_id, "task_id": result.id})
-            
-        except Exception as e:
-            logger.error(f"Failed to queue analysis for {job_id}: {e}")
-            results.append({"job_id": job_id, "error": str(e)})
+    Returns:
+        Batch status dict, or None if the batch is unknown
+    """
+    result = GroupResult.restore(batch_id, app=celery_app)
+    if result is None:
+        return None
     
-    return results
+    return summarize_batch(batch_id, [{"job_id": task.id, "state": task.state} for task in result.results])
 
+
+def summarize_batch(batch_id: str, jobs: List[dict]) -> dict:
+    """
+    Batch status dict from its members' Celery states
+    
+    Args:
+        batch_id: Batch ID
+        jobs: Dicts with job_id and state ("PENDING", "SUCCESS", "FAILURE", "REVOKED", ...)
+    """
+    completed = sum(job["state"] == "SUCCESS" for job in jobs)
+    failed = sum(job["state"] == "FAILURE" for job in jobs)
+    cancelled = sum(job["state"] == "REVOKED" for job in jobs)
+    
+    total = len(jobs)
+    finished = completed + failed + cancelled
+    if finished < total:
+        status = "processing" if finished or any(j["state"] != "PENDING" for j in jobs) else "pending"
+    elif cancelled:
+        status = "cancelled"
+    else:
+        status = "completed"
+    
+    return {
+        "id": batch_id,
+        "status": status,
+        "progress": int(finished * 100 / total) if total else 100,
+        "total": total,
+        "completed": completed,
+        "failed": failed,
+        "cancelled": cancelled,
+        "jobs": jobs,
+    }
+
+
+def cancel_batch(batch_id: str, terminate: bool = False) -> bool:
+    """
+    Cancel a batch: queued analyses are skipped, running ones finish unless terminate
+    
+    Returns:
+        False if the batch is unknown
+    """
+    result = GroupResult.restore(batch_id, app=celery_app)
+    if result is None:
+        return False
+    result.revoke(terminate=terminate)
+    logger.info(f"Cancelled batch {batch_id}")
+    return True
+
+
+@celery_app.task
+def batch_analyze_rooms(job_ids: list, images: list, language: str = "zh"):
+    """
+    Batch analyze multiple room images
+    
+    Args:
+        job_ids: Job ID per image
+        images: Dicts with the image storage key and url
+        language: Response language ("zh" or "en")
+    
+    Returns:
+        Batch ID (poll with get_batch_status) and the job IDs in the batch
+    """
+    items = [
+        {"job_id": job_id, "key": image["key"], "url": image["url"]}
+        for job_id, image in zip(job_ids, images)
+    ]
+    result = start_batch_analysis(items, language)
+    
+    return {
+        "batch_id": result.id,
+        "jobs": [{"job_id": item["job_id"], "task_id": item["job_id"]} for item in items],
+    }
@@ -1,9 +1,15 @@
 import logging
+from typing import Optional
+from celery import chord, group
+
 from app.celery_app import celery_app
+from app.core.config import settings
 from app.services.design_service import DesignService
-from app.services.image_generation_service import ImageGenerationService
+from app.services.image_generation_service import GenerationBudget, ImageGenerationService
 from app.services.furniture_matching_service import FurnitureMatchingService
 from app.services.storage_service import StorageService
+from app.tasks.results import advance_job_progress, reset_job_progress
+from app.tasks.runtime import run_async, run_concurrently
 
 logger = logging.getLogger(__name__)
 
@@ -19,96 +25,261 @@ def generate_design_proposals(
     job_id: str,
     analysis_data: dict,
     preferences: dict,
-    num_proposals: int = 3
+    num_proposals: int = 3,
+    language: str = "zh",
+    routing: Optional[dict] = None,
 ):
     """
     Generate design proposals based on room analysis and user preferences
     
+    Generates the concepts here, then replaces itself with a chord: one
+    generate_concept_proposal task per concept (run on any free worker, each with
+    its own time limit and retries) and assemble_design_proposals as the callback.
+    The chord callback inherits this task's ID, so the job result appears under it.
+    
     Args:
         job_id: Unique job identifier
         analysis_data: Room analysis results
         preferences: User design preferences
         num_proposals: Number of proposals to generate
+        language: Output language (zh or en)
+        routing: Queue and priority of the job (see app.tasks.scheduling), applied
+            to the chord so subtasks keep the user's tier
     
     Returns:
-        List of design proposals
+        List of design proposals (via the chord callback)
     """
     try:
         logger.info(f"Starting design generation for job {job_id}")
         
-        import asyncio
-        loop = asyncio.get_event_loop()
-        
         # Step 1: Generate design concepts
         self.update_state(
             state="PROGRESS",
             meta={"progress": 10, "status": "Generating design concepts..."}
         )
         
-        concepts = loop.run_until_complete(
+        concepts = run_async(
             design_service.generate_concepts(
                 style=preferences.get("style", "modern"),
                 requirements=preferences.get("requirements", []),
-                special_needs=preferences.get("special_needs", ""),
-                num_concepts=num_proposals
+                special_needs=design_service.combine_user_requirements(preferences),
+                room_description=preferences.get("room_description", ""),
+                num_concepts=num_proposals,
+                language=language,
             )
         )
         
-        # Step 2: Generate images for each concept
-        proposals = []
-        for i, concept in enumerate(concepts):
-            progress = 20 + (i * 25)
-            self.update_state(
-                state="PROGRESS",
-                meta={
-                    "progress": progress,
-                    "status": f"Generating design {i + 1} of {len(concepts)}..."
-                }
-            )
-            
-            # Generate image
-            image_url = loop.run_until_complete(
-                image_gen_service.generate_room_image(
-                    concept["prompt"],
-                    style=preferences.get("style", "modern")
-                )
-            )
-            
-            # Match furniture
-            furniture = loop.run_until_complete(
-                furniture_service.match_furniture(
-                    style=preferences.get("style", "modern"),
-                    room_type=analysis_data.get("room_type", "living"),
-                    budget=preferences.get("budget", 10000),
-                    exclude=preferences.get("keep_furniture", [])
-                )
-            )
-            
-            total_cost = sum(f["price"] for f in furniture)
-            
-            proposals.append({
-                "id": f"{job_id}-{i + 1}",
-                "name": concept["name"],
-                "description": concept["description"],
-                "image_url": image_url,
-                "style": preferences.get("style", "modern"),
-                "confidence": concept.get("confidence", 0.85),
-                "furniture": furniture,
-                "total_cost": total_cost,
-                "highlights": concept.get("highlights", []),
-            })
+    except Exception as e:
+        logger.error(f"Design generation failed for job {job_id}: {e}")
+        raise self.retry(countdown=30, exc=e)
+    
+    # Step 2: Fan out one subtask per concept
+    context = {
+        "style": preferences.get("style", "modern"),
+        "gallery_style": DesignService.normalize_style(preferences.get("style", "modern")),
+        "room_type": analysis_data.get("room_type", "living"),
+        "budget": preferences.get("budget", 10000),
+        "user_needs": design_service.furniture_needs(preferences),
+        "keep_furniture": preferences.get("keep_furniture", []),
+        "language": language,
+    }
+    
+    self.update_state(
+        state="PROGRESS",
+        meta={"progress": 20, "status": f"Generating {len(concepts)} designs in parallel..."}
+    )
+    reset_job_progress(job_id)
+    
+    # Concepts with identical prompts (e.g. all overridden by the user's own
+    # requirements) go to one subtask that generates their images in one prediction
+    prompt_groups = {}
+    for i, concept in enumerate(concepts):
+        prompt_groups.setdefault(concept["prompt"], []).append(i)
+    
+    subtasks = []
+    for indices in prompt_groups.values():
+        if len(indices) == 1:
+            subtasks.append(generate_concept_proposal.s(job_id, indices[0], concepts[indices[0]], context, len(concepts)))
+        else:
+            subtasks.append(generate_concept_batch.s(
+                job_id, indices, [concepts[i] for i in indices], context, len(concepts)
+            ))
+    
+    routing = routing or {}
+    header = group(subtask.set(**routing) for subtask in subtasks)
+    raise self.replace(chord(header, assemble_design_proposals.s(job_id).set(**routing)))
+
+
+@celery_app.task(bind=True, max_retries=2)
+def generate_concept_proposal(
+    self,
+    job_id: str,
+    index: int,
+    concept: dict,
+    context: dict,
+    total: int,
+):
+    """
+    Generate the image and furniture list for one design concept
+    
+    Retries only this concept on failure. Once retries are exhausted it returns
+    an error marker instead of raising, so the other concepts still complete.
+    
+    Args:
+        job_id: Parent design job ID
+        index: Position of the concept in the job
+        concept: Concept from DesignService.generate_concepts
+        context: Style, room type, budget, user needs, kept furniture and language
+        total: Number of concepts in the job (for progress reporting)
+    
+    Returns:
+        Proposal dict with its index, or {"index", "error"} on permanent failure
+    """
+    try:
+        logger.info(f"Generating concept {index + 1}/{total} for job {job_id}")
         
-        self.update_state(
-            state="PROGRESS",
-            meta={"progress": 95, "status": "Finalizing proposals..."}
+        # Image generation and furniture matching are independent, run them together.
+        # Each concept gets an equal share of the job's image budget.
+        image_url, furniture = run_concurrently(
+            image_gen_service.generate_room_image(
+                concept["prompt"],
+                style=context["gallery_style"],
+                budget=GenerationBudget(settings.IMAGE_JOB_COST_CEILING / total),
+                cache_hit_rate=_gallery_hit_rate(concept["prompt"]),
+            ),
+            furniture_service.match_furniture(
+                style=context["style"],
+                room_type=context["room_type"],
+                budget=context["budget"],
+                user_needs=context["user_needs"],
+                exclude=context["keep_furniture"],
+                language=context["language"],
+            ),
         )
         
-        logger.info(f"Design generation completed for job {job_id}")
-        return proposals
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            logger.warning(f"Concept {index + 1} of job {job_id} failed, retrying: {e}")
+            raise self.retry(countdown=30, exc=e)
+        
+        logger.error(f"Concept {index + 1} of job {job_id} failed permanently: {e}")
+        advance_job_progress(job_id, total, start=20, end=95, status="Generated {done} of {total} designs...")
+        return {"index": index, "error": str(e)}
+    
+    advance_job_progress(job_id, total, start=20, end=95, status="Generated {done} of {total} designs...")
+    
+    return _build_proposal(job_id, index, concept, context, image_url, furniture)
+
+
+@celery_app.task(bind=True, max_retries=2)
+def generate_concept_batch(
+    self,
+    job_id: str,
+    indices: list,
+    concepts: list,
+    context: dict,
+    total: int,
+):
+    """
+    Generate several concepts that share the same image prompt
+    
+    Their images come from one multi-output prediction and they share one
+    furniture match (which only depends on the job context).
+    
+    Returns:
+        List of proposal dicts (or error markers) for the given indices
+    """
+    try:
+        logger.info(f"Generating concepts {[i + 1 for i in indices]}/{total} for job {job_id} as one batch")
+        
+        image_urls, furniture = run_concurrently(
+            image_gen_service.generate_room_images(
+                [concept["prompt"] for concept in concepts],
+                style=context["gallery_style"],
+                budget=GenerationBudget(settings.IMAGE_JOB_COST_CEILING * len(indices) / total),
+                cache_hit_rate=_gallery_hit_rate(concepts[0]["prompt"]),
+            ),
+            furniture_service.match_furniture(
+                style=context["style"],
+                room_type=context["room_type"],
+                budget=context["budget"],
+                user_needs=context["user_needs"],
+                exclude=context["keep_furniture"],
+                language=context["language"],
+            ),
+        )
         
     except Exception as e:
-        logger.error(f"Design generation failed for job {job_id}: {e}")
-        self.retry(countdown=30, exc=e)
+        if self.request.retries < self.max_retries:
+            logger.warning(f"Concept batch {indices} of job {job_id} failed, retrying: {e}")
+            raise self.retry(countdown=30, exc=e)
+        
+        logger.error(f"Concept batch {indices} of job {job_id} failed permanently: {e}")
+        for _ in indices:
+            advance_job_progress(job_id, total, start=20, end=95, status="Generated {done} of {total} designs...")
+        return [{"index": index, "error": str(e)} for index in indices]
+    
+    for _ in indices:
+        advance_job_progress(job_id, total, start=20, end=95, status="Generated {done} of {total} designs...")
+    
+    return [
+        _build_proposal(job_id, index, concept, context, image_url, furniture)
+        for index, concept, image_url in zip(indices, concepts, image_urls)
+    ]
+
+
+def _gallery_hit_rate(prompt: str) -> Optional[float]:
+    """Always use the pre-rendered gallery for untouched template prompts"""
+    return 1.0 if DesignService.is_template_prompt(prompt) else None
+
+
+def _build_proposal(job_id: str, index: int, concept: dict, context: dict, image_url: str, furniture: list) -> dict:
+    return {
+        "index": index,
+        "id": f"{job_id}-{index + 1}",
+        "name": concept["name"],
+        "description": concept["description"],
+        "image_url": image_url,
+        "style": context["style"],
+        "confidence": concept.get("confidence", 0.85),
+        "furniture": furniture,
+        "total_cost": sum(f["price"] for f in furniture),
+        "highlights": concept.get("highlights", []),
+    }
+
+
+@celery_app.task
+def assemble_design_proposals(results: list, job_id: str):
+    """
+    Chord callback: order concept results and drop concepts that failed
+    
+    Batch subtasks return a list of results, single-concept subtasks one result.
+    
+    Returns:
+        List of design proposals
+    """
+    flattened = []
+    for result in results:
+        flattened.extend(result if isinstance(result, list) else [result])
+    
+    proposals = []
+    failed = []
+    for result in sorted(flattened, key=lambda r: r["index"]):
+        result = dict(result)
+        result.pop("index")
+        if "error" in result:
+            failed.append(result["error"])
+        else:
+            proposals.append(result)
+    
+    if not proposals:
+        raise Exception(f"All design concepts failed: {'; '.join(failed)}")
+    
+    if failed:
+        logger.warning(f"Design job {job_id} completed with {len(failed)} failed concept(s)")
+    
+    logger.info(f"Design generation completed for job {job_id}")
+    return proposals
 
 
 @celery_app.task(bind=True, max_retries=2)
@@ -130,10 +301,7 @@ def generate_design_image(
         URL of generated image
     """
     try:
-        import asyncio
-        loop = asyncio.get_event_loop()
-        
-        image_url = loop.run_until_complete(
+        image_url = run_async(
             image_gen_service.generate_room_image(
                 prompt=prompt,
                 style=style,
@@ -175,11 +343,8 @@ def regenerate_design(
             "special_needs": f"{original_preferences.get('special_needs', '')} {feedback}"
         }
         
-        import asyncio
-        loop = asyncio.get_event_loop()
-        
         # Generate single new concept
-        concepts = loop.run_until_complete(
+        concepts = run_async(
             design_service.generate_concepts(
                 style=updated_preferences.get("style", "modern"),
                 requirements=updated_preferences.get("requirements", []),
@@ -193,21 +358,17 @@ def regenerate_design(
         
         concept = concepts[0]
         
-        # Generate image
-        image_url = loop.run_until_complete(
+        # Generate image and match furniture concurrently
+        image_url, furniture = run_concurrently(
             image_gen_service.generate_room_image(
                 concept["prompt"],
                 style=updated_preferences.get("style", "modern")
-            )
-        )
-        
-        # Match furniture
-        furniture = loop.run_until_complete(
+            ),
             furniture_service.match_furniture(
                 style=updated_preferences.get("style", "modern"),
                 room_type="living",
                 budget=updated_preferences.get("budget", 10000)
-            )
+            ),
         )
         
         return {
@@ -3,6 +3,7 @@ import io
 from datetime import datetime
 from app.celery_app import celery_app
 from app.services.storage_service import StorageService
+from app.tasks.runtime import run_async
 
 logger = logging.getLogger(__name__)
 storage_service = StorageService()
@@ -182,9 +183,7 @@ def generate_shopping_list_pdf(
         
         # Upload to storage
         buffer.seek(0)
-        import asyncio
-        loop = asyncio.get_event_loop()
-        pdf_url = loop.run_until_complete(
+        pdf_url = run_async(
             storage_service.upload_file(
                 buffer.getvalue(),
                 f"exports/{list_id}/shopping_list.pdf",
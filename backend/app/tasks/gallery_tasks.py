@@ -0,0 +1,69 @@
+import logging
+
+from app.celery_app import celery_app
+from app.core.config import settings
+from app.core.metering import SYSTEM_USER, metered_job
+from app.services.design_service import DesignService
+from app.services.image_generation_service import ImageGenerationService
+from app.tasks.runtime import run_async
+
+logger = logging.getLogger(__name__)
+
+image_gen_service = ImageGenerationService()
+
+
+@celery_app.task(bind=True, max_retries=1)
+def warm_style_gallery(self, images_per_prompt: int = None, styles: list = None):
+    """
+    Pre-render images for every style's concept templates into the generation cache
+    
+    Scheduled nightly by Celery Beat. Jobs without custom requirements use the
+    template prompts unchanged, so they are then served straight from storage.
+    Each run adds fresh variants and the oldest ones are evicted, so the gallery
+    keeps changing. Styles whose templates all failed (typically a provider
+    outage) are retried once, on their own, a few minutes later.
+    
+    Args:
+        images_per_prompt: New images per template prompt (default GALLERY_IMAGES_PER_PROMPT)
+        styles: Only warm these styles (default all)
+    
+    Returns:
+        Number of images stored per style
+    """
+    if not settings.GENERATION_CACHE_ENABLED:
+        logger.info("Generation cache disabled, skipping style gallery warm-up")
+        return {}
+    
+    images_per_prompt = images_per_prompt or settings.GALLERY_IMAGES_PER_PROMPT
+    stored = {}
+    failed_styles = []
+    last_error = None
+    
+    # Metered as one system job per run
+    with metered_job(self.request.id, SYSTEM_USER, "gallery"):
+        for style, prompts in DesignService.gallery_prompts().items():
+            if styles and style not in styles:
+                continue
+            stored[style] = 0
+            failures = 0
+            for prompt in prompts:
+                try:
+                    stored[style] += run_async(image_gen_service.prerender(prompt, style, images_per_prompt))
+                except Exception as e:
+                    # One failing template shouldn't stop the rest of the gallery;
+                    # prerender raises when the providers produced nothing
+                    logger.error(f"Gallery warm-up failed for {style} prompt '{prompt[:60]}': {e}")
+                    failures += 1
+                    last_error = e
+            if prompts and failures == len(prompts):
+                failed_styles.append(style)
+    
+    logger.info(f"Style gallery warmed: {stored}")
+    if failed_styles and self.request.retries < self.max_retries:
+        logger.warning(f"Retrying gallery warm-up for {failed_styles}")
+        raise self.retry(
+            countdown=300,
+            kwargs={"images_per_prompt": images_per_prompt, "styles": failed_styles},
+            exc=last_error,
+        )
+    return stored
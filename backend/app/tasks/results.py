@@ -0,0 +1,109 @@
+import logging
+from typing import Optional
+
+from celery.result import AsyncResult
+
+from app.celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_KEY = "job-progress:{job_id}"
+
+
+def get_task_result(task_id: str) -> AsyncResult:
+    """Get the result handle for a task (job IDs are used as task IDs)"""
+    return AsyncResult(task_id, app=celery_app)
+
+
+def get_task_status(task_id: str) -> dict:
+    """
+    Map a task's result-backend state to the API job status shape
+    
+    Returns:
+        Dict with status ("pending", "processing", "completed", "failed"),
+        progress (0-100), result and error (plus stages while processing,
+        for tasks that report them)
+    """
+    task = get_task_result(task_id)
+    state = task.state
+    
+    if state == "SUCCESS":
+        return {"status": "completed", "progress": 100, "result": task.result, "error": None}
+    
+    if state in ("FAILURE", "REVOKED"):
+        return {"status": "failed", "progress": 100, "result": None, "error": str(task.result)}
+    
+    if state in ("STARTED", "PROGRESS", "RETRY"):
+        info = task.info if isinstance(task.info, dict) else {}
+        return {
+            "status": "processing",
+            "progress": info.get("progress", 5),
+            "result": info.get("result"),  # Partial result, if the task publishes one
+            "stages": info.get("stages"),
+            "error": None,
+        }
+    
+    # PENDING: queued, or unknown to the result backend
+    return {"status": "pending", "progress": 0, "result": None, "error": None}
+
+
+def get_completed_result(task_id: str) -> Optional[dict]:
+    """Return a task's result if it finished successfully, otherwise None"""
+    task = get_task_result(task_id)
+    if task.state != "SUCCESS":
+        return None
+    return task.result
+
+
+def reset_job_progress(job_id: str) -> None:
+    """Reset the completed-subtask counter for a fan-out job"""
+    client = getattr(celery_app.backend, "client", None)
+    if client is None:
+        return
+    try:
+        client.delete(PROGRESS_KEY.format(job_id=job_id))
+    except Exception as e:
+        logger.warning(f"Failed to reset progress for job {job_id}: {e}")
+
+
+def advance_job_progress(
+    job_id: str,
+    total: int,
+    start: int = 0,
+    end: int = 100,
+    status: str = "{done}/{total}",
+) -> int:
+    """
+    Record one finished subtask of a fan-out job and publish aggregate progress
+    
+    Subtasks run on different workers, so completion is counted atomically in the
+    result backend (Redis) and written to the parent job as a PROGRESS state.
+    
+    Args:
+        job_id: Parent job/task ID that clients poll
+        total: Number of subtasks in the job
+        start: Progress value before any subtask finished
+        end: Progress value once every subtask finished
+        status: Status message, formatted with done and total
+    
+    Returns:
+        Number of subtasks finished so far (0 if the backend has no counter support)
+    """
+    client = getattr(celery_app.backend, "client", None)
+    if client is None:
+        return 0
+    
+    key = PROGRESS_KEY.format(job_id=job_id)
+    try:
+        done = client.incr(key)
+        client.expire(key, celery_app.conf.result_expires or 3600)
+        progress = start + (end - start) * min(done, total) // max(total, 1)
+        celery_app.backend.store_result(
+            job_id,
+            {"progress": progress, "status": status.format(done=done, total=total), "done": done, "total": total},
+            "PROGRESS",
+        )
+        return done
+    except Exception as e:
+        logger.warning(f"Failed to update progress for job {job_id}: {e}")
+        return 0
@@ -0,0 +1,212 @@
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Dict, List, Optional
+
+from celery.signals import (
+    before_task_publish,
+    task_failure,
+    task_postrun,
+    task_prerun,
+    worker_process_init,
+    worker_process_shutdown,
+)
+
+from app.core.http import close_http_client
+from app.core.metering import (
+    current_usage_context,
+    decode_usage_context,
+    encode_usage_context,
+    reset_usage_context,
+    set_usage_context,
+    usage_meter,
+)
+from app.core.tracing import current_traceparent, finish_span, parse_traceparent, start_span
+
+logger = logging.getLogger(__name__)
+
+
+# Worker-side async runtime
+#
+# Each worker process owns one event loop running in a daemon thread for the
+# lifetime of the process. Tasks are synchronous Celery callables, so they submit
+# coroutines to that loop and block on the result. Keeping the loop alive means
+# shared clients (app.core.http) keep their connection pools between tasks, and
+# it works the same under the prefork and threads pools.
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def start_loop() -> asyncio.AbstractEventLoop:
+    """Start the worker event loop if it is not already running"""
+    global _loop, _thread
+
+    with _lock:
+        if _loop is not None and _loop.is_running():
+            return _loop
+
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(ready.set)
+            loop.run_forever()
+
+        _thread = threading.Thread(target=run, name="celery-async-runtime", daemon=True)
+        _thread.start()
+        ready.wait()
+        _loop = loop
+
+        logger.info("Worker async runtime started")
+        return loop
+
+
+def stop_loop(timeout: float = 10.0) -> None:
+    """Close shared clients and stop the worker event loop"""
+    global _loop, _thread
+
+    with _lock:
+        loop, thread = _loop, _thread
+        _loop, _thread = None, None
+
+    if loop is None or not loop.is_running():
+        return
+
+    try:
+        asyncio.run_coroutine_threadsafe(usage_meter.flush(), loop).result(timeout)
+    except Exception as e:
+        logger.warning(f"Failed to flush usage records: {e}")
+
+    try:
+        asyncio.run_coroutine_threadsafe(close_http_client(), loop).result(timeout)
+    except Exception as e:
+        logger.warning(f"Failed to close shared HTTP client: {e}")
+
+    loop.call_soon_threadsafe(loop.stop)
+    if thread is not None:
+        thread.join(timeout)
+    loop.close()
+    logger.info("Worker async runtime stopped")
+
+
+def run_async(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """
+    Run a coroutine on the worker loop and return its result
+
+    Blocks the calling task. If the task is interrupted (e.g. soft time limit),
+    the coroutine is cancelled before the exception propagates.
+    """
+    loop = _loop if _loop is not None and _loop.is_running() else start_loop()
+    future: Future = asyncio.run_coroutine_threadsafe(_with_caller_context(coro), loop)
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
+
+
+def _with_caller_context(coro: Awaitable[Any]) -> Awaitable[Any]:
+    """
+    Run a coroutine with the calling thread's context variables
+    
+    Coroutines submitted to the loop thread otherwise start from that thread's
+    context, losing the task's trace span and usage metering job.
+    """
+    context = contextvars.copy_context()
+
+    async def bound():
+        for var, value in context.items():
+            var.set(value)
+        return await coro
+
+    return bound()
+
+
+async def _gather(aws, return_exceptions: bool) -> List[Any]:
+    return await asyncio.gather(*aws, return_exceptions=return_exceptions)
+
+
+def run_concurrently(*aws: Awaitable[Any], return_exceptions: bool = False) -> List[Any]:
+    """
+    Run several coroutines concurrently on the worker loop
+
+    Returns:
+        Results in the same order as the arguments
+    """
+    return run_async(_gather(aws, return_exceptions))
+
+
+@worker_process_init.connect
+def _on_worker_process_init(**kwargs):
+    global _loop, _thread
+    # Each forked child needs its own loop; a loop inherited across fork has no thread
+    _loop, _thread = None, None
+    start_loop()
+
+
+@worker_process_shutdown.connect
+def _on_worker_process_shutdown(**kwargs):
+    stop_loop()
+
+
+# Trace and usage propagation
+#
+# The publisher's current span and usage metering job travel in message headers
+# (traceparent, usage_context). Each task runs inside a "celery.<task>" span
+# continuing that trace and is metered against that job, or against its own
+# task ID when the job was not set by the publisher (batch members).
+
+_task_contexts: Dict[str, tuple] = {}
+
+
+@before_task_publish.connect
+def _on_before_task_publish(headers=None, **kwargs):
+    if headers is None:
+        return
+    traceparent = current_traceparent()
+    if traceparent:
+        headers["traceparent"] = traceparent
+    usage_context = current_usage_context()
+    if usage_context is not None:
+        headers["usage_context"] = encode_usage_context(usage_context)
+
+
+@task_prerun.connect
+def _on_task_prerun(task_id=None, task=None, **kwargs):
+    parent = parse_traceparent(getattr(task.request, "traceparent", None))
+    span, span_token = start_span(
+        f"celery.{task.name.rsplit('.', 1)[-1]}",
+        parent,
+        **{
+            "celery.task_id": task_id,
+            "celery.queue": (task.request.delivery_info or {}).get("routing_key"),
+            "celery.retries": task.request.retries,
+        },
+    )
+    usage_context = decode_usage_context(getattr(task.request, "usage_context", None))
+    if usage_context is not None and usage_context.job_id is None:
+        usage_context = usage_context._replace(job_id=task_id)
+    usage_token = set_usage_context(usage_context)
+    _task_contexts[task_id] = (span, span_token, usage_token)
+
+
+@task_failure.connect
+def _on_task_failure(task_id=None, exception=None, **kwargs):
+    entry = _task_contexts.get(task_id)
+    if entry is not None and exception is not None:
+        entry[0].record_exception(exception)
+
+
+@task_postrun.connect
+def _on_task_postrun(task_id=None, state=None, **kwargs):
+    entry = _task_contexts.pop(task_id, None)
+    if entry is not None:
+        span, span_token, usage_token = entry
+        reset_usage_context(usage_token)
+        span.set_attribute("celery.state", state)
+        finish_span(span, span_token)
@@ -0,0 +1,132 @@
+import logging
+import time
+from typing import List, Optional
+
+import redis
+
+from app.celery_app import celery_app
+from app.core.config import settings
+from app.core.metering import daily_spend_key
+from app.tasks.results import get_task_result
+
+logger = logging.getLogger(__name__)
+
+
+# Queue and base Redis priority per tier (0 is highest)
+TIER_QUEUES = {
+    "premium": "design_premium",
+    "free": "design",
+}
+TIER_PRIORITY = {
+    "premium": 0,
+    "free": 4,
+}
+MAX_PRIORITY = 9
+
+USER_ACTIVE_KEY = "jobs:active:user:{user_key}"
+TIER_ACTIVE_KEY = "jobs:active:tier:{tier}"
+
+# Jobs older than this are considered gone even if their result never arrived
+JOB_MAX_AGE = celery_app.conf.task_time_limit * 3
+
+_redis: Optional[redis.Redis] = None
+
+
+class QuotaExceeded(Exception):
+    """Raised when a user or tier already has its maximum number of active jobs, or a user's daily spend is used up"""
+
+
+def get_redis() -> redis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis
+
+
+def user_tier(is_premium: bool) -> str:
+    return "premium" if is_premium else "free"
+
+
+def _active_jobs(client: redis.Redis, key: str) -> List[str]:
+    """Return active job IDs in a set, pruning finished and expired jobs"""
+    now = time.time()
+    members = client.zrange(key, 0, -1, withscores=True)
+    stale = [
+        job_id for job_id, started in members
+        if started < now - JOB_MAX_AGE or get_task_result(job_id).ready()
+    ]
+    if stale:
+        client.zrem(key, *stale)
+    return [job_id for job_id, _ in members if job_id not in stale]
+
+
+def daily_spend(user_key: str) -> float:
+    """Estimated USD spent on a user's jobs today (UTC), from the usage meter"""
+    return float(get_redis().get(daily_spend_key(user_key)) or 0.0)
+
+
+def admit_design_job(job_id: str, user_key: str, is_premium: bool) -> dict:
+    """
+    Admit a design job for a user, enforcing per-user and per-tier quotas
+    
+    Also implements fair share: each additional active job a user already has
+    lowers the priority of the next one, so a heavy user's backlog queues behind
+    other users of the same tier instead of in front of them.
+    
+    Args:
+        job_id: Job/task ID of the new job
+        user_key: User ID, or "anon:<ip>" for anonymous requests
+        is_premium: Whether the user has a premium subscription
+    
+    Returns:
+        Celery task options (queue and priority) for the job
+    
+    Raises:
+        QuotaExceeded: If the user or their tier is at its limit
+    """
+    tier = user_tier(is_premium)
+    per_user_limit = (
+        settings.PREMIUM_MAX_ACTIVE_JOBS_PER_USER if is_premium else settings.FREE_MAX_ACTIVE_JOBS_PER_USER
+    )
+    tier_limit = 0 if is_premium else settings.FREE_TIER_MAX_ACTIVE_JOBS
+    
+    client = get_redis()
+    user_key_name = USER_ACTIVE_KEY.format(user_key=user_key)
+    tier_key_name = TIER_ACTIVE_KEY.format(tier=tier)
+    
+    user_active = _active_jobs(client, user_key_name)
+    if len(user_active) >= per_user_limit:
+        raise QuotaExceeded(
+            f"You already have {len(user_active)} design job(s) running, please wait for them to finish"
+        )
+    
+    spend_limit = settings.PREMIUM_DAILY_SPEND_LIMIT_USD if is_premium else settings.FREE_DAILY_SPEND_LIMIT_USD
+    if spend_limit and daily_spend(user_key) >= spend_limit:
+        raise QuotaExceeded("You have used today's design generation allowance, please try again tomorrow")
+    
+    if tier_limit and len(_active_jobs(client, tier_key_name)) >= tier_limit:
+        raise QuotaExceeded("Design generation is busy right now, please try again shortly")
+    
+    # Register optimistically, then re-check so concurrent admissions can't overshoot
+    now = time.time()
+    pipe = client.pipeline()
+    pipe.zadd(user_key_name, {job_id: now})
+    pipe.zadd(tier_key_name, {job_id: now})
+    pipe.expire(user_key_name, JOB_MAX_AGE)
+    pipe.expire(tier_key_name, JOB_MAX_AGE)
+    pipe.zcard(user_key_name)
+    pipe.zcard(tier_key_name)
+    *_, user_count, tier_count = pipe.execute()
+    
+    if user_count > per_user_limit or (tier_limit and tier_count > tier_limit):
+        client.zrem(user_key_name, job_id)
+        client.zrem(tier_key_name, job_id)
+        raise QuotaExceeded("Design generation is busy right now, please try again shortly")
+    
+    priority = min(MAX_PRIORITY, TIER_PRIORITY[tier] + len(user_active))
+    logger.info(f"Admitted design job {job_id} for {user_key} (tier={tier}, priority={priority})")
+    
+    return {
+        "queue": TIER_QUEUES[tier],
+        "priority": priority,
+    }
@@ -0,0 +1,105 @@
+"""
+Benchmark JSON extraction from model responses
+
+Compares the previous VisionService._extract_json (direct parse, fenced
+block regex, then greedy brace regex) against app.core.json_utils.extract_json
+on response shapes captured from Claude and GPT-4o: bare JSON, fenced JSON,
+JSON wrapped in prose, and long responses whose trailing prose contains
+stray braces (the case that made the greedy regex fall through).
+
+Usage (from backend/):
+    python -m benchmarks.json_extraction_benchmark
+"""
+import json
+import re
+import time
+
+from app.core.json_utils import extract_json
+
+ANALYSIS = {
+    "room_type": "living",
+    "dimensions": {"width": 5.5, "length": 4.2, "height": 2.8},
+    "existing_furniture": ["沙发", "茶几", "电视柜", "书架"],
+    "current_style": "现代简约",
+    "lighting": "自然光充足，东向窗户",
+    "problems": ["空间利用不足", "色彩单调", "缺乏装饰元素"],
+    "potential": "可以通过添加绿植、艺术画和调整家具布局来提升空间感",
+    "confidence": 0.92,
+}
+
+PRODUCTS = {
+    "products": [
+        {
+            "name": f"Product {i}",
+            "name_en": f"Product {i}",
+            "brand": "IKEA",
+            "category": "furniture",
+            "price": 99.99 + i,
+            "dimensions": "100x50x75cm",
+            "search_keywords": f"ikea product {i} \"quoted\" {{braces}}",
+        }
+        for i in range(12)
+    ],
+    "total_cost": 1500.0,
+    "notes": "Selected within budget",
+}
+
+PROSE = (
+    "Note: prices are estimates {approx} and may vary by store. "
+    "Let me know if you'd like alternatives for any {category}. "
+) * 40
+
+CAPTURED_OUTPUTS = {
+    "bare": json.dumps(ANALYSIS, ensure_ascii=False),
+    "fenced": f"```json\n{json.dumps(ANALYSIS, ensure_ascii=False, indent=2)}\n```",
+    "prose": f"Here is the analysis of the room:\n\n{json.dumps(ANALYSIS, ensure_ascii=False)}\n\nHope this helps!",
+    "long_products": f"Sure! Based on your request:\n```json\n{json.dumps(PRODUCTS, indent=2)}\n```\n{PROSE}",
+    "long_unfenced": f"Based on your request: {json.dumps(PRODUCTS)} {PROSE}",
+}
+
+
+def legacy_extract_json(content: str) -> dict:
+    """Previous implementation, kept here as the baseline"""
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        pass
+
+    json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', content)
+    if json_match:
+        try:
+            return json.loads(json_match.group(1))
+        except json.JSONDecodeError:
+            pass
+
+    json_match = re.search(r'\{[\s\S]*\}', content)
+    if json_match:
+        try:
+            return json.loads(json_match.group(0))
+        except json.JSONDecodeError:
+            pass
+
+    raise ValueError("Could not extract JSON from response")
+
+
+def timed(func, content: str, iterations: int):
+    result = None
+    start = time.perf_counter()
+    for _ in range(iterations):
+        try:
+            result = func(content)
+        except ValueError:
+            result = None
+    return (time.perf_counter() - start) * 1e6 / iterations, result is not None
+
+
+def main(iterations: int = 2000):
+    print(f"{'case':<16}{'bytes':>8}{'legacy us':>12}{'ok':>5}{'scanner us':>12}{'ok':>5}")
+    for name, content in CAPTURED_OUTPUTS.items():
+        legacy_us, legacy_ok = timed(legacy_extract_json, content, iterations)
+        new_us, new_ok = timed(extract_json, content, iterations)
+        print(f"{name:<16}{len(content):>8}{legacy_us:>12.1f}{str(legacy_ok):>5}{new_us:>12.1f}{str(new_ok):>5}")
+
+
+if __name__ == "__main__":
+    main()
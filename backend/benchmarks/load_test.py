@@ -0,0 +1,515 @@
+"""
+End-to-end load test against local provider stand-ins
+
+Starts benchmarks.stub_providers and the API (uvicorn app.main:app) as
+subprocesses on free local ports, with every provider URL pointed at the stubs,
+then runs virtual users through the product's main flow:
+
+    register once, then repeatedly
+    upload photo -> poll analysis -> generate designs -> poll design -> save design
+
+Nothing leaves the machine and no Redis or Postgres is needed: the API runs
+jobs in process (JOB_EXECUTION_MODE=background), keeps uploads and accounts in
+a temporary directory, and runs with rate limiting, the generation cache and
+usage metering off. Provider latency and error rates come from the STUB_*
+variables documented in benchmarks/stub_providers.py.
+
+Reports per endpoint the requests, errors, throughput and p50/p95/p99 latency;
+per job stage the time from submit to completion; and the resident memory of
+each API worker process (peak and at the end). Background jobs live in the
+memory of the worker that accepted them, so status polling only works with a
+single worker unless JOB_EXECUTION_MODE=celery is set for the API, with Redis
+and Celery workers running separately.
+
+--output writes the results as JSON. With --baseline the run is compared to an
+earlier --output file and exits with status 1 when p95 latency, flow throughput
+or worker memory regressed by more than --max-regression, so it can gate CI.
+
+Usage (from backend/):
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --users 20 --duration 120 --output baseline.json
+    STUB_REPLICATE_ERROR_RATE=0.1 python -m benchmarks.load_test --baseline baseline.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+from PIL import Image
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+STARTUP_TIMEOUT = 60.0  # Seconds for a server to answer its first request
+JOB_TIMEOUT = 600.0  # Seconds before a polled job counts as failed
+MEMORY_SAMPLE_SECONDS = 1.0
+
+# Latency differences below this are noise, whatever the ratio
+MIN_REGRESSION_MS = 5.0
+
+DESIGN_PREFERENCES = {
+    "style": "nordic",
+    "budget": 8000,
+    "requirements": ["plants", "reading", "storage"],
+    "special_needs": "需要一个舒适的阅读角和更多收纳空间",
+    "room_description": "朝南的客厅，有一扇大窗户",
+}
+
+
+class FlowError(Exception):
+    """A step of a virtual user's flow failed; the user starts over"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def room_photo(width: int, height: int) -> bytes:
+    """A JPEG about the size of a phone photo of a room: gradient plus sensor noise"""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x / width * 180 + 40, y / height * 160 + 50, (x + y) / (width + height) * 120 + 80], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+# Process memory (Linux /proc; empty elsewhere)
+
+def _children(pid: int) -> List[int]:
+    children = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        # Fields after the parenthesised command name: state, ppid, ...
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            children.append(int(entry.name))
+    return children
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def worker_pids(server_pid: int) -> List[int]:
+    """The uvicorn process, or its worker processes when it supervises several"""
+    if not Path("/proc").is_dir():
+        return []
+    children = [pid for pid in _children(server_pid) if _rss_mb(pid) is not None]
+    return children or [server_pid]
+
+
+class MemorySampler:
+    """Samples the RSS of each API worker until stopped"""
+
+    def __init__(self, server_pid: int):
+        self.server_pid = server_pid
+        self.peak: Dict[int, float] = {}
+        self.last: Dict[int, float] = {}
+
+    def sample(self) -> None:
+        for pid in worker_pids(self.server_pid):
+            rss = _rss_mb(pid)
+            if rss is not None:
+                self.last[pid] = rss
+                self.peak[pid] = max(rss, self.peak.get(pid, 0.0))
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.to_thread(self.sample)
+            await asyncio.sleep(MEMORY_SAMPLE_SECONDS)
+
+
+class Stats:
+    """Latencies per endpoint and per flow stage"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.stage_times: Dict[str, List[float]] = defaultdict(list)
+        self.stage_failures: Dict[str, int] = defaultdict(int)
+
+    def request(self, endpoint: str, seconds: float, ok: bool) -> None:
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def stage(self, name: str, seconds: float, ok: bool) -> None:
+        if ok:
+            self.stage_times[name].append(seconds)
+        else:
+            self.stage_failures[name] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {
+            endpoint: {
+                "requests": len(values),
+                "errors": self.errors[endpoint],
+                "per_second": len(values) / elapsed,
+                "p50_ms": percentile(values, 0.5) * 1000,
+                "p95_ms": percentile(values, 0.95) * 1000,
+                "p99_ms": percentile(values, 0.99) * 1000,
+            }
+            for endpoint, values in sorted(self.latencies.items())
+        }
+        stages = {
+            name: {
+                "completed": len(self.stage_times[name]),
+                "failed": self.stage_failures[name],
+                "p50_ms": percentile(self.stage_times[name], 0.5) * 1000,
+                "p95_ms": percentile(self.stage_times[name], 0.95) * 1000,
+                "p99_ms": percentile(self.stage_times[name], 0.99) * 1000,
+            }
+            for name in sorted(set(self.stage_times) | set(self.stage_failures))
+        }
+        return {"endpoints": endpoints, "stages": stages}
+
+
+class VirtualUser:
+    """One user going through the flow in a loop; endpoints are recorded by route"""
+
+    def __init__(self, number: int, client: httpx.AsyncClient, stats: Stats, photo: bytes, poll_interval: float):
+        self.number = number
+        self.client = client
+        self.stats = stats
+        self.photo = photo
+        self.poll_interval = poll_interval
+        self.headers: Dict[str, str] = {}
+
+    async def call(self, endpoint: str, method: str, url: str, **kwargs) -> dict:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except httpx.HTTPError as e:
+            self.stats.request(endpoint, time.perf_counter() - start, False)
+            raise FlowError(f"{endpoint}: {type(e).__name__}: {e}")
+        self.stats.request(endpoint, time.perf_counter() - start, response.status_code < 400)
+        if response.status_code >= 400:
+            raise FlowError(f"{endpoint}: HTTP {response.status_code} {response.text[:200]}")
+        return response.json()
+
+    async def wait_for_job(self, endpoint: str, url: str, stage: str, submitted: float) -> dict:
+        while True:
+            job = await self.call(endpoint, "GET", url)
+            if job["status"] == "completed":
+                self.stats.stage(stage, time.perf_counter() - submitted, True)
+                return job
+            if job["status"] == "failed" or time.perf_counter() - submitted > JOB_TIMEOUT:
+                self.stats.stage(stage, 0.0, False)
+                raise FlowError(f"{stage} {job['status']}: {job.get('error')}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def register(self) -> None:
+        account = await self.call("POST /api/v1/users/register", "POST", "/api/v1/users/register", json={
+            "email": f"loadtest-{self.number}-{uuid.uuid4().hex[:8]}@example.com",
+            "password": "load-test-password",
+            "name": f"Load Test {self.number}",
+        })
+        self.headers = {"Authorization": f"Bearer {account['access_token']}"}
+
+    async def flow(self) -> None:
+        start = time.perf_counter()
+
+        upload = await self.call(
+            "POST /api/v1/analysis/upload", "POST", "/api/v1/analysis/upload",
+            params={"language": "zh"},
+            files={"file": ("room.jpg", self.photo, "image/jpeg")},
+        )
+        await self.wait_for_job(
+            "GET /api/v1/analysis/status/{id}", f"/api/v1/analysis/status/{upload['id']}", "analysis job", start,
+        )
+
+        submitted = time.perf_counter()
+        design = await self.call("POST /api/v1/design/generate", "POST", "/api/v1/design/generate", json={
+            "analysis_id": upload["id"],
+            "preferences": DESIGN_PREFERENCES,
+            "language": "zh",
+        })
+        job = await self.wait_for_job(
+            "GET /api/v1/design/status/{id}", f"/api/v1/design/status/{design['id']}", "design job", submitted,
+        )
+
+        proposal = (job.get("proposals") or [None])[0]
+        if not proposal:
+            raise FlowError("design job completed without proposals")
+        await self.call("POST /api/v1/users/me/designs", "POST", "/api/v1/users/me/designs", json={
+            "name": proposal["name"],
+            "description": proposal["description"],
+            "image_url": proposal["image_url"],
+            "style": proposal["style"],
+            "total_cost": proposal["total_cost"],
+            "furniture_items": proposal["furniture"],
+        })
+        self.stats.stage("flow", time.perf_counter() - start, True)
+
+    async def run(self, deadline: float) -> None:
+        try:
+            await self.register()
+        except FlowError as e:
+            print(f"user {self.number}: {e}", file=sys.stderr)
+            return
+        while time.perf_counter() < deadline:
+            try:
+                await self.flow()
+            except FlowError as e:
+                self.stats.stage("flow", 0.0, False)
+                print(f"user {self.number}: {e}", file=sys.stderr)
+                await asyncio.sleep(self.poll_interval)
+
+
+def start_server(app: str, port: int, env: dict, log_path: Path, workers: int = 1) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", app,
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+
+
+async def wait_until_up(url: str, process: subprocess.Popen, log_path: Path) -> None:
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with {process.returncode}, see {log_path}")
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {STARTUP_TIMEOUT:.0f}s, see {log_path}")
+
+
+def app_environment(stub_url: str, workdir: Path) -> dict:
+    """API settings pointing every provider at the stubs and every store at workdir"""
+    env = dict(os.environ)
+    env.update({
+        "ANTHROPIC_API_KEY": "stub",
+        "ANTHROPIC_API_BASE": f"{stub_url}/anthropic",
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_API_BASE": f"{stub_url}/openai/v1",
+        "REPLICATE_API_TOKEN": "stub",
+        "REPLICATE_API_BASE": f"{stub_url}/replicate/v1",
+        "REPLICATE_WEBHOOK_URL": "",
+        "HUGGINGFACE_API_TOKEN": "stub",
+        "SAM_MODEL_ENDPOINT": f"{stub_url}/huggingface/models/facebook/sam-vit-huge",
+        "VISION_BACKEND": "api",
+        "STORAGE_TYPE": "local",
+        "LOCAL_STORAGE_PATH": str(workdir / "uploads"),
+        "USERS_DB_PATH": str(workdir / "users.db"),
+        "RATE_LIMIT_ENABLED": "false",
+        "GENERATION_CACHE_ENABLED": "false",
+        "METERING_ENABLED": "false",
+    })
+    env.setdefault("JOB_EXECUTION_MODE", "background")
+    # Nothing listens here: cache lookups miss quickly, as on a cold deploy
+    env.setdefault("REDIS_URL", "redis://127.0.0.1:1/0")
+    return env
+
+
+def print_report(results: dict) -> None:
+    print(f"\n{results['flows_completed']} flows in {results['elapsed_seconds']:.1f}s "
+          f"({results['flows_per_minute']:.2f}/min) with {results['config']['users']} users\n")
+
+    print(f"{'endpoint':<36}{'reqs':>7}{'errors':>8}{'req/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, row in results["endpoints"].items():
+        print(
+            f"{endpoint:<36}{row['requests']:>7}{row['errors']:>8}{row['per_second']:>8.2f}"
+            f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}"
+        )
+
+    print(f"\n{'stage':<36}{'done':>7}{'failed':>8}{'p50 s':>10}{'p95 s':>10}{'p99 s':>10}")
+    for stage, row in results["stages"].items():
+        print(
+            f"{stage:<36}{row['completed']:>7}{row['failed']:>8}"
+            f"{row['p50_ms'] / 1000:>10.2f}{row['p95_ms'] / 1000:>10.2f}{row['p99_ms'] / 1000:>10.2f}"
+        )
+
+    print(f"\n{'worker pid':<36}{'peak MB':>10}{'end MB':>10}")
+    for worker in results["workers"]:
+        print(f"{worker['pid']:<36}{worker['peak_mb']:>10.1f}{worker['end_mb']:>10.1f}")
+    if not results["workers"]:
+        print("(memory sampling needs /proc)")
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> List[str]:
+    """Regressions of results against a baseline run, as printable lines"""
+    regressions = []
+    limit = 1 + max_regression
+
+    for section in ("endpoints", "stages"):
+        for name, row in results[section].items():
+            before = baseline.get(section, {}).get(name)
+            if not before or not before["p95_ms"]:
+                continue
+            if row["p95_ms"] > before["p95_ms"] * limit and row["p95_ms"] - before["p95_ms"] > MIN_REGRESSION_MS:
+                regressions.append(f"{name}: p95 {before['p95_ms']:.1f}ms -> {row['p95_ms']:.1f}ms")
+
+    if baseline.get("flows_per_minute") and results["flows_per_minute"] < baseline["flows_per_minute"] / limit:
+        regressions.append(
+            f"throughput: {baseline['flows_per_minute']:.2f} -> {results['flows_per_minute']:.2f} flows/min"
+        )
+
+    peak = max((worker["peak_mb"] for worker in results["workers"]), default=0.0)
+    baseline_peak = max((worker["peak_mb"] for worker in baseline.get("workers", [])), default=0.0)
+    if baseline_peak and peak > baseline_peak * limit:
+        regressions.append(f"worker memory: peak {baseline_peak:.1f}MB -> {peak:.1f}MB")
+
+    return regressions
+
+
+async def run(users: int, duration: float, ramp_up: float, poll_interval: float, workers: int, image_size: str) -> dict:
+    stub_port, app_port = free_port(), free_port()
+    stub_url, app_url = f"http://127.0.0.1:{stub_port}", f"http://127.0.0.1:{app_port}"
+    width, height = (int(value) for value in image_size.split("x"))
+    photo = room_photo(width, height)
+
+    with tempfile.TemporaryDirectory(prefix="smartroom-load-") as tmp:
+        workdir = Path(tmp)
+        env = app_environment(stub_url, workdir)
+        if workers > 1 and env["JOB_EXECUTION_MODE"] != "celery":
+            raise SystemExit("--workers > 1 needs JOB_EXECUTION_MODE=celery: background jobs live in one worker's memory")
+
+        stub = start_server("benchmarks.stub_providers:app", stub_port, dict(os.environ), workdir / "stubs.log")
+        api = start_server("app.main:app", app_port, env, workdir / "api.log", workers)
+        sampler_task = None
+        try:
+            await wait_until_up(f"{stub_url}/docs", stub, workdir / "stubs.log")
+            await wait_until_up(f"{app_url}/health", api, workdir / "api.log")
+
+            stats = Stats()
+            sampler = MemorySampler(api.pid)
+            sampler_task = asyncio.create_task(sampler.run())
+            limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+            async with httpx.AsyncClient(base_url=app_url, timeout=120.0, limits=limits) as client:
+                print(f"{users} users for {duration:.0f}s against {app_url} (stubs at {stub_url})")
+                start = time.perf_counter()
+                deadline = start + duration
+
+                async def delayed(user: VirtualUser, delay: float):
+                    await asyncio.sleep(delay)
+                    await user.run(deadline)
+
+                # Flows still running at the deadline are finished, not cut off
+                await asyncio.gather(*[
+                    delayed(VirtualUser(i, client, stats, photo, poll_interval), ramp_up * i / users)
+                    for i in range(users)
+                ])
+                elapsed = time.perf_counter() - start
+                providers = (await client.get("/metrics/providers")).json()
+            sampler.sample()
+        except Exception:
+            for log in ("api.log", "stubs.log"):
+                print(f"--- {log} ---\n{(workdir / log).read_text()[-4000:]}", file=sys.stderr)
+            raise
+        finally:
+            if sampler_task:
+                sampler_task.cancel()
+            for process in (api, stub):
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    flows = len(stats.stage_times["flow"])
+    return {
+        "config": {
+            "users": users,
+            "duration": duration,
+            "ramp_up": ramp_up,
+            "poll_interval": poll_interval,
+            "workers": workers,
+            "image_size": image_size,
+            "stubs": {name: value for name, value in os.environ.items() if name.startswith("STUB_")},
+        },
+        "elapsed_seconds": elapsed,
+        "flows_completed": flows,
+        "flows_per_minute": flows / elapsed * 60,
+        **stats.summary(elapsed),
+        "workers": [
+            {"pid": pid, "peak_mb": sampler.peak[pid], "end_mb": sampler.last[pid]}
+            for pid in sorted(sampler.peak)
+        ],
+        "providers": providers,
+    }
+
+
+def main(
+    users: int = 10,
+    duration: float = 60.0,
+    ramp_up: float = 10.0,
+    poll_interval: float = 1.0,
+    workers: int = 1,
+    image_size: str = "800x600",
+    output: Optional[str] = None,
+    baseline: Optional[str] = None,
+    max_regression: float = 0.2,
+) -> int:
+    results = asyncio.run(run(users, duration, ramp_up, poll_interval, workers, image_size))
+    print_report(results)
+
+    if output:
+        Path(output).write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {output}")
+
+    if baseline:
+        regressions = compare(results, json.loads(Path(baseline).read_text()), max_regression)
+        if regressions:
+            print(f"\nRegressions over {max_regression:.0%} against {baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions over {max_regression:.0%} against {baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds during which new flows start")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="seconds over which users start")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="seconds between job status polls")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--image-size", default="800x600", help="uploaded photo size, WIDTHxHEIGHT")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    sys.exit(main(**vars(parser.parse_args())))
@@ -0,0 +1,109 @@
+"""
+Benchmark per-image latency of the local CPU vision backend
+
+Runs app.services.local_vision on synthetic room-sized photos (or the JPEG/PNG
+files in LOCAL_VISION_BENCHMARK_IMAGES, if set) in two modes:
+
+    sequential  - one request at a time, every model call has a batch of 1
+    concurrent  - `concurrency` requests in flight, so the batcher groups them
+                  (up to LOCAL_VISION_BATCH_SIZE per model call)
+
+Reports mean / p50 / p95 latency per image and throughput. Needs onnxruntime
+and the models in LOCAL_VISION_MODEL_DIR.
+
+Usage (from backend/):
+    python -m benchmarks.local_vision_benchmark
+"""
+import asyncio
+import base64
+import io
+import os
+import random
+import time
+
+from PIL import Image
+
+from app.core.config import settings
+from app.services.local_vision import analyze_room_local, get_local_models, models_available
+
+
+def load_images(count: int, seed: int):
+    directory = os.environ.get("LOCAL_VISION_BENCHMARK_IMAGES")
+    if directory:
+        paths = sorted(
+            os.path.join(directory, name)
+            for name in os.listdir(directory)
+            if name.lower().endswith((".jpg", ".jpeg", ".png"))
+        )
+        images = []
+        for path in paths[:count]:
+            with open(path, "rb") as f:
+                images.append(base64.b64encode(f.read()).decode())
+        return images
+
+    # Noise photos at a typical upload size; latency doesn't depend on content
+    rng = random.Random(seed)
+    images = []
+    for _ in range(count):
+        image = Image.frombytes("RGB", (1600, 1200), rng.randbytes(1600 * 1200 * 3))
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=85)
+        images.append(base64.b64encode(buffer.getvalue()).decode())
+    return images
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def timed(image):
+    start = time.perf_counter()
+    await analyze_room_local(image)
+    return time.perf_counter() - start
+
+
+async def run_sequential(images):
+    return [await timed(image) for image in images]
+
+
+async def run_concurrent(images, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(image):
+        async with semaphore:
+            return await timed(image)
+
+    return await asyncio.gather(*(one(image) for image in images))
+
+
+def main(count: int = 32, concurrency: int = 8, seed: int = 42):
+    if not models_available():
+        print(f"Local vision models not found in {settings.LOCAL_VISION_MODEL_DIR}")
+        return
+
+    start = time.perf_counter()
+    get_local_models()
+    print(f"Models loaded in {time.perf_counter() - start:.2f}s")
+
+    images = load_images(count, seed)
+    asyncio.run(run_sequential(images[:2]))  # Warm-up
+
+    print(f"{len(images)} images, batch size {settings.LOCAL_VISION_BATCH_SIZE}, concurrency {concurrency}\n")
+    print(f"{'mode':<12}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'img/s':>9}")
+    for mode in ("sequential", "concurrent"):
+        start = time.perf_counter()
+        if mode == "sequential":
+            latencies = asyncio.run(run_sequential(images))
+        else:
+            latencies = asyncio.run(run_concurrent(images, concurrency))
+        elapsed = time.perf_counter() - start
+        print(
+            f"{mode:<12}{sum(latencies) / len(latencies) * 1000:>9.1f}"
+            f"{percentile(latencies, 0.5) * 1000:>9.1f}{percentile(latencies, 0.95) * 1000:>9.1f}"
+            f"{len(images) / elapsed:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
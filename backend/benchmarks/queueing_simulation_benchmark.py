@@ -0,0 +1,133 @@
+"""
+Simulate design job queueing delay per user tier
+
+Discrete-event simulation of a pool of design workers under synthetic load:
+a handful of premium users, many free users, and one heavy free user who
+submits a burst of jobs at the start. Two policies are compared:
+
+    shared  - the previous setup, one FIFO design queue and no quotas
+    tiered  - app.tasks.scheduling: premium queue drained first, Redis priority
+              raised by each job the user already has in flight (fair share),
+              and per-user / per-tier quotas enforced at enqueue time
+
+Reports jobs admitted and rejected per tier and the queueing delay (time from
+enqueue until a worker picks the job up).
+
+Usage (from backend/):
+    python -m benchmarks.queueing_simulation_benchmark
+"""
+import heapq
+import random
+from collections import defaultdict
+
+from app.core.config import settings
+from app.tasks.scheduling import MAX_PRIORITY, TIER_PRIORITY
+
+WORKERS = 4
+DURATION = 3600.0  # Seconds of arrivals
+MEAN_SERVICE_TIME = 45.0  # One design job (concepts + images + furniture)
+
+PREMIUM_USERS = 5
+FREE_USERS = 40
+PREMIUM_INTERARRIVAL = 300.0  # Mean seconds between jobs per user
+FREE_INTERARRIVAL = 900.0
+HEAVY_USER_BURST = 60
+
+
+def synthetic_arrivals(seed: int):
+    """Return (time, user, tier) tuples sorted by time"""
+    rng = random.Random(seed)
+    arrivals = []
+
+    def poisson(user, tier, mean):
+        t = rng.expovariate(1 / mean)
+        while t < DURATION:
+            arrivals.append((t, user, tier))
+            t += rng.expovariate(1 / mean)
+
+    for i in range(PREMIUM_USERS):
+        poisson(f"premium-{i}", "premium", PREMIUM_INTERARRIVAL)
+    for i in range(FREE_USERS):
+        poisson(f"free-{i}", "free", FREE_INTERARRIVAL)
+    for i in range(HEAVY_USER_BURST):
+        arrivals.append((i * 0.5, "free-heavy", "free"))
+
+    arrivals.sort()
+    return arrivals
+
+
+def simulate(arrivals, policy: str, seed: int):
+    rng = random.Random(seed)
+    events = [(t, 1, seq, "arrive", (user, tier)) for seq, (t, user, tier) in enumerate(arrivals)]
+    heapq.heapify(events)
+    seq = len(events)
+
+    waiting = []  # Heap of (queue order, priority, seq, job)
+    idle = WORKERS
+    active_by_user = defaultdict(int)
+    active_by_tier = defaultdict(int)
+    waits = defaultdict(list)
+    rejected = defaultdict(int)
+
+    def dispatch(now):
+        nonlocal idle, seq
+        while idle and waiting:
+            _, _, _, (enqueued, user, tier) = heapq.heappop(waiting)
+            waits[tier].append(now - enqueued)
+            idle -= 1
+            seq += 1
+            heapq.heappush(events, (now + rng.expovariate(1 / MEAN_SERVICE_TIME), 0, seq, "finish", (user, tier)))
+
+    while events:
+        now, _, order, kind, (user, tier) = heapq.heappop(events)
+
+        if kind == "finish":
+            idle += 1
+            active_by_user[user] -= 1
+            active_by_tier[tier] -= 1
+        elif policy == "shared":
+            active_by_user[user] += 1
+            active_by_tier[tier] += 1
+            heapq.heappush(waiting, (0, 0, order, (now, user, tier)))
+        else:
+            per_user_limit = (
+                settings.PREMIUM_MAX_ACTIVE_JOBS_PER_USER if tier == "premium" else settings.FREE_MAX_ACTIVE_JOBS_PER_USER
+            )
+            tier_limit = settings.FREE_TIER_MAX_ACTIVE_JOBS if tier == "free" else 0
+            if active_by_user[user] >= per_user_limit or (tier_limit and active_by_tier[tier] >= tier_limit):
+                rejected[tier] += 1
+                continue
+            priority = min(MAX_PRIORITY, TIER_PRIORITY[tier] + active_by_user[user])
+            active_by_user[user] += 1
+            active_by_tier[tier] += 1
+            heapq.heappush(waiting, (0 if tier == "premium" else 1, priority, order, (now, user, tier)))
+
+        dispatch(now)
+
+    return waits, rejected
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def main(seed: int = 42):
+    arrivals = synthetic_arrivals(seed)
+    print(f"{len(arrivals)} jobs over {DURATION:.0f}s on {WORKERS} workers, mean service {MEAN_SERVICE_TIME:.0f}s\n")
+    print(f"{'policy':<8}{'tier':<9}{'admitted':>9}{'rejected':>9}{'mean s':>9}{'p50 s':>9}{'p95 s':>9}")
+    for policy in ("shared", "tiered"):
+        waits, rejected = simulate(arrivals, policy, seed)
+        for tier in ("premium", "free"):
+            tier_waits = waits[tier]
+            mean = sum(tier_waits) / len(tier_waits) if tier_waits else 0.0
+            print(
+                f"{policy:<8}{tier:<9}{len(tier_waits):>9}{rejected[tier]:>9}"
+                f"{mean:>9.1f}{percentile(tier_waits, 0.5):>9.1f}{percentile(tier_waits, 0.95):>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
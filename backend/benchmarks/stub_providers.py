@@ -0,0 +1,269 @@
+"""
+Local stand-ins for every external provider the app calls
+
+One FastAPI app emulating, under a path prefix per provider:
+
+    /anthropic/v1/messages          Claude Messages API, JSON and SSE streaming
+    /openai/v1/images/generations   DALL-E 3
+    /replicate/v1/...               Replicate predictions (benchmarks.stub_replicate)
+    /huggingface/models/{model}     HuggingFace SAM inference
+
+Answers have the shape the app parses: a room analysis for vision requests,
+product recommendations for furniture searches, echoed text for translations.
+Latency and error rate are drawn per provider, so load tests can reproduce a
+slow or flaky provider without touching the real one.
+
+Usage (from backend/):
+    uvicorn benchmarks.stub_providers:app --port 9100
+
+    ANTHROPIC_API_KEY=stub  ANTHROPIC_API_BASE=http://localhost:9100/anthropic
+    OPENAI_API_KEY=stub     OPENAI_API_BASE=http://localhost:9100/openai/v1
+    REPLICATE_API_TOKEN=stub  REPLICATE_API_BASE=http://localhost:9100/replicate/v1
+    HUGGINGFACE_API_TOKEN=stub
+    SAM_MODEL_ENDPOINT=http://localhost:9100/huggingface/models/facebook/sam-vit-huge
+
+Environment (PROVIDER is ANTHROPIC, OPENAI, REPLICATE or HUGGINGFACE):
+    STUB_<PROVIDER>_LATENCY     seconds per call as "fixed:<s>", "exp:<mean>" or
+                                "lognormal:<median>,<sigma>" (defaults below)
+    STUB_<PROVIDER>_ERROR_RATE  share of calls answered with the provider's
+                                usual server error (default 0)
+"""
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import time
+import uuid
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from PIL import Image
+
+from benchmarks import stub_replicate
+
+# Rough medians of the real APIs for the requests the app makes
+DEFAULT_LATENCY = {
+    "ANTHROPIC": "lognormal:2.0,0.4",
+    "OPENAI": "lognormal:12.0,0.3",
+    "REPLICATE": "lognormal:8.0,0.4",
+    "HUGGINGFACE": "lognormal:1.5,0.3",
+}
+
+# Streamed responses are cut into this many text deltas
+STREAM_CHUNKS = 20
+
+ROOM_ANALYSIS = {
+    "room_type": "living",
+    "dimensions": {"width": 5.2, "length": 4.4, "height": 2.7},
+    "existing_furniture": ["sofa", "coffee_table", "tv_stand", "floor_lamp"],
+    "current_style": "Modern Minimalist",
+    "lighting": "Natural light from a south-facing window",
+    "problems": ["Cluttered corners", "Flat lighting in the evening"],
+    "potential": "Zone the room with a rug and layered lighting",
+    "confidence": 0.9,
+    "translations": {
+        "zh": {
+            "current_style": "现代简约",
+            "lighting": "南向窗户带来自然光",
+            "problems": ["角落杂乱", "夜间照明单调"],
+            "potential": "用地毯和分层照明划分空间",
+        },
+    },
+}
+
+PRODUCTS = [
+    ("3-Seat Fabric Sofa", "sofa", 1299.0, "220x95x85cm"),
+    ("Oak Coffee Table", "table", 349.0, "120x60x45cm"),
+    ("Arc Floor Lamp", "lighting", 189.0, "H200cm"),
+    ("Wool Area Rug", "rug", 459.0, "200x300cm"),
+    ("Open Bookshelf", "storage", 279.0, "80x30x180cm"),
+    ("Linen Accent Chair", "chair", 399.0, "75x80x85cm"),
+]
+
+
+class ProviderProfile:
+    """Latency distribution and error rate of one provider, from STUB_<NAME>_* variables"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.spec = os.getenv(f"STUB_{name}_LATENCY", DEFAULT_LATENCY[name])
+        self.error_rate = float(os.getenv(f"STUB_{name}_ERROR_RATE", "0"))
+
+        kind, _, params = self.spec.partition(":")
+        self.kind = kind
+        self.params = [float(value) for value in params.split(",") if value]
+        expected = {"fixed": 1, "exp": 1, "lognormal": 2}
+        if kind not in expected or len(self.params) != expected[kind]:
+            raise ValueError(f"STUB_{name}_LATENCY: unsupported latency spec {self.spec!r}")
+
+    def latency(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "exp":
+            return random.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0.0
+        median, sigma = self.params
+        return random.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+    def fails(self) -> bool:
+        return random.random() < self.error_rate
+
+
+anthropic = ProviderProfile("ANTHROPIC")
+openai = ProviderProfile("OPENAI")
+replicate = ProviderProfile("REPLICATE")
+huggingface = ProviderProfile("HUGGINGFACE")
+
+stub_replicate.configure(replicate.latency, replicate.fails)
+
+app = FastAPI(title="Provider stubs")
+app.mount("/replicate", stub_replicate.app)
+
+
+def _estimate_tokens(value) -> int:
+    return max(1, len(json.dumps(value, ensure_ascii=False)) // 4)
+
+
+def _claude_answer(payload: dict) -> str:
+    """Text Claude would answer with, picked from the shape of the request"""
+    content = payload["messages"][-1]["content"]
+    if isinstance(content, list):
+        if any(block.get("type") == "image" for block in content):
+            return json.dumps(ROOM_ANALYSIS)
+        content = " ".join(block.get("text", "") for block in content)
+
+    if content.startswith("Chinese:"):
+        # Translation; a real model would return English, the length is what matters
+        return f"A bright room with {content[8:].strip()}"
+    try:
+        # Analysis localization sends the texts as a JSON object
+        texts = json.loads(content)
+        if isinstance(texts, dict):
+            return json.dumps(texts, ensure_ascii=False)
+    except ValueError:
+        pass
+
+    products = [
+        {
+            "name": name,
+            "name_en": name,
+            "brand": "Stub Home",
+            "category": category,
+            "price": price,
+            "dimensions": dimensions,
+            "search_keywords": name.lower(),
+        }
+        for name, category, price, dimensions in PRODUCTS
+    ]
+    return json.dumps({
+        "products": products,
+        "total_cost": sum(p["price"] for p in products),
+        "notes": "Stub recommendations",
+    })
+
+
+def _claude_error() -> JSONResponse:
+    return JSONResponse(
+        {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}},
+        status_code=529,
+    )
+
+
+@app.post("/anthropic/v1/messages")
+async def messages(request: Request):
+    payload = await request.json()
+    model = payload.get("model", "claude-sonnet-4-20250514")
+    text = _claude_answer(payload)
+    usage = {
+        "input_tokens": _estimate_tokens(payload.get("messages")),
+        "output_tokens": _estimate_tokens(text),
+        "cache_creation_input_tokens": 0,
+        "cache_read_input_tokens": _estimate_tokens(payload.get("system", "")),
+    }
+    message_id = f"msg_{uuid.uuid4().hex[:24]}"
+    latency = anthropic.latency()
+
+    if not payload.get("stream"):
+        await asyncio.sleep(latency)
+        if anthropic.fails():
+            return _claude_error()
+        return {
+            "id": message_id,
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": usage,
+        }
+
+    # Time to first token is a fifth of the latency, the rest is spread over the deltas
+    await asyncio.sleep(latency / 5)
+    if anthropic.fails():
+        return _claude_error()
+
+    def event(kind: str, data: dict) -> str:
+        return f"event: {kind}\ndata: {json.dumps({'type': kind, **data})}\n\n"
+
+    async def stream():
+        yield event("message_start", {"message": {
+            "id": message_id, "type": "message", "role": "assistant", "model": model,
+            "content": [], "stop_reason": None, "usage": {**usage, "output_tokens": 1},
+        }})
+        yield event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+        size = math.ceil(len(text) / STREAM_CHUNKS)
+        for start in range(0, len(text), size):
+            await asyncio.sleep(latency * 0.8 / STREAM_CHUNKS)
+            yield event("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": text[start:start + size]}})
+        yield event("content_block_stop", {"index": 0})
+        yield event("message_delta", {
+            "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": usage["output_tokens"]},
+        })
+        yield event("message_stop", {})
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.post("/openai/v1/images/generations")
+async def image_generations(request: Request):
+    payload = await request.json()
+    await asyncio.sleep(openai.latency())
+    if openai.fails():
+        return JSONResponse(
+            {"error": {"message": "The server had an error processing your request.", "type": "server_error"}},
+            status_code=500,
+        )
+    width, height = payload.get("size", "1792x1024").split("x")
+    return {
+        "created": int(time.time()),
+        "data": [
+            {
+                "url": f"https://picsum.photos/seed/{uuid.uuid4().hex[:12]}/{width}/{height}",
+                "revised_prompt": payload.get("prompt", ""),
+            }
+            for _ in range(int(payload.get("n", 1)))
+        ],
+    }
+
+
+@app.post("/huggingface/models/{model:path}")
+async def segment(model: str, request: Request):
+    body = await request.body()
+    await asyncio.sleep(huggingface.latency())
+    if huggingface.fails():
+        return JSONResponse({"error": f"Model {model} is currently loading", "estimated_time": 20.0}, status_code=503)
+
+    # One mask per segment, sized like the photo: floor (bottom third) and a window
+    width, height = Image.open(io.BytesIO(body)).size
+    floor = np.zeros((height, width), dtype=np.uint8)
+    floor[height * 2 // 3:, :] = 1
+    window = np.zeros((height, width), dtype=np.uint8)
+    window[height // 8:height // 2, width // 2:width * 7 // 8] = 1
+    return [
+        {"label": "floor", "score": 0.97, "mask": floor.tolist()},
+        {"label": "window", "score": 0.91, "mask": window.tolist()},
+    ]
@@ -0,0 +1,130 @@
+"""
+Local stand-in for the Replicate predictions API
+
+Implements POST /v1/predictions, POST /v1/models/{owner}/{name}/predictions
+(what the replicate library calls for official models) and
+GET /v1/predictions/{id}. Predictions finish after a random latency and, when
+created with a webhook, call it back the way Replicate does (signed if
+STUB_WEBHOOK_SECRET is set). Use it to exercise the webhook and polling paths
+without spending credits. benchmarks.stub_providers mounts it next to the
+other provider stand-ins.
+
+Usage (from backend/):
+    uvicorn benchmarks.stub_replicate:app --port 9000
+
+    REPLICATE_API_BASE=http://localhost:9000/v1
+    REPLICATE_API_TOKEN=stub
+    REPLICATE_WEBHOOK_URL=http://localhost:8000/api/v1/webhooks/replicate
+    REPLICATE_WEBHOOK_SECRET=<same as STUB_WEBHOOK_SECRET>
+
+Environment:
+    STUB_LATENCY_SECONDS   mean prediction latency (default 5)
+    STUB_FAILURE_RATE      share of predictions that fail (default 0)
+    STUB_WEBHOOK_SECRET    "whsec_..." secret used to sign webhooks (the API rejects
+                           unsigned ones)
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+
+LATENCY = float(os.getenv("STUB_LATENCY_SECONDS", "5"))
+FAILURE_RATE = float(os.getenv("STUB_FAILURE_RATE", "0"))
+WEBHOOK_SECRET = os.getenv("STUB_WEBHOOK_SECRET", "")
+
+app = FastAPI(title="Replicate stub")
+predictions: dict = {}
+
+
+def prediction_latency() -> float:
+    return random.expovariate(1 / LATENCY) if LATENCY > 0 else 0
+
+
+def prediction_fails() -> bool:
+    return random.random() < FAILURE_RATE
+
+
+def configure(latency: Callable[[], float], fails: Callable[[], bool]) -> None:
+    """Replace the STUB_LATENCY_SECONDS / STUB_FAILURE_RATE draws"""
+    global prediction_latency, prediction_fails
+    prediction_latency, prediction_fails = latency, fails
+
+
+def sign(webhook_id: str, timestamp: str, body: bytes) -> str:
+    key = base64.b64decode(WEBHOOK_SECRET.split("_", 1)[-1])
+    digest = hmac.new(key, f"{webhook_id}.{timestamp}.".encode() + body, hashlib.sha256).digest()
+    return "v1," + base64.b64encode(digest).decode()
+
+
+async def complete(prediction_id: str, webhook: str = None):
+    await asyncio.sleep(prediction_latency())
+    prediction = predictions[prediction_id]
+    num_outputs = int(prediction["input"].get("num_outputs", 1))
+
+    if prediction_fails():
+        prediction.update(status="failed", error="Stub failure")
+    else:
+        prediction.update(
+            status="succeeded",
+            output=[f"https://picsum.photos/seed/{prediction_id}-{i}/1344/768" for i in range(num_outputs)],
+        )
+    prediction["completed_at"] = datetime.now(timezone.utc).isoformat()
+
+    if webhook:
+        body = json.dumps(prediction).encode()
+        headers = {"content-type": "application/json"}
+        if WEBHOOK_SECRET:
+            webhook_id, timestamp = f"msg_{uuid.uuid4().hex}", str(int(time.time()))
+            headers.update({
+                "webhook-id": webhook_id,
+                "webhook-timestamp": timestamp,
+                "webhook-signature": sign(webhook_id, timestamp, body),
+            })
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            await client.post(webhook, content=body, headers=headers)
+
+
+def start_prediction(payload: dict, model: str, version: str, request: Request) -> dict:
+    prediction_id = uuid.uuid4().hex[:26]
+    predictions[prediction_id] = {
+        "id": prediction_id,
+        "model": model,
+        "version": version,
+        "input": payload.get("input", {}),
+        "status": "starting",
+        "output": None,
+        "error": None,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "urls": {"get": str(request.url_for("get_prediction", prediction_id=prediction_id))},
+    }
+    asyncio.create_task(complete(prediction_id, payload.get("webhook")))
+    return predictions[prediction_id]
+
+
+@app.post("/v1/predictions", status_code=201)
+async def create_prediction(request: Request):
+    payload = await request.json()
+    return start_prediction(payload, "stub/sdxl", payload.get("version"), request)
+
+
+@app.post("/v1/models/{owner}/{name}/predictions", status_code=201)
+async def create_model_prediction(owner: str, name: str, request: Request):
+    payload = await request.json()
+    return start_prediction(payload, f"{owner}/{name}", "stub", request)
+
+
+@app.get("/v1/predictions/{prediction_id}")
+async def get_prediction(prediction_id: str):
+    if prediction_id not in predictions:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    return predictions[prediction_id]
@@ -0,0 +1,122 @@
+"""
+SDXL predictions against the local Replicate stub (benchmarks.stub_replicate)
+
+The stub and the webhook endpoint are served over real HTTP by one in-process
+uvicorn server; Redis is an in-memory fakeredis server, so the pub/sub wakeup
+runs as it does in production.
+"""
+import asyncio
+import base64
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+import pytest_asyncio
+import uvicorn
+from fastapi import FastAPI
+
+from app.api.v1.endpoints import webhooks
+from app.core.config import settings
+from app.services import image_generation_service, replicate_predictions
+from app.services.image_generation_service import ImageGenerationService
+from app.services.replicate_predictions import PREDICTION_KEY
+from benchmarks import stub_replicate
+
+WEBHOOK_SECRET = "whsec_" + base64.b64encode(b"test-webhook-signing-key").decode()
+STUB_LATENCY = 0.2
+
+
+@pytest_asyncio.fixture
+async def redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer())
+    monkeypatch.setattr(replicate_predictions, "get_async_redis", lambda: client)
+    yield client
+    await client.aclose()
+
+
+@pytest_asyncio.fixture
+async def stub_server(monkeypatch, redis):
+    """Replicate stub under /replicate and the API webhook endpoint, on a free port"""
+    app = FastAPI()
+    app.include_router(webhooks.router, prefix="/api/v1/webhooks")
+    app.mount("/replicate", stub_replicate.app)
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    base_url = f"http://127.0.0.1:{server.servers[0].sockets[0].getsockname()[1]}"
+
+    stub_replicate.predictions.clear()
+    stub_replicate.configure(lambda: STUB_LATENCY, lambda: False)
+    monkeypatch.setattr(stub_replicate, "WEBHOOK_SECRET", WEBHOOK_SECRET)
+    monkeypatch.setattr(settings, "REPLICATE_API_TOKEN", "stub")
+    monkeypatch.setattr(settings, "REPLICATE_API_BASE", f"{base_url}/replicate/v1")
+    monkeypatch.setattr(settings, "REPLICATE_WEBHOOK_URL", f"{base_url}/api/v1/webhooks/replicate")
+    monkeypatch.setattr(settings, "REPLICATE_WEBHOOK_SECRET", WEBHOOK_SECRET)
+    monkeypatch.setattr(settings, "REPLICATE_WEBHOOK_TIMEOUT", 10.0)
+    monkeypatch.setattr(settings, "METERING_ENABLED", False)
+    yield base_url
+
+    server.should_exit = True
+    await task
+
+
+@pytest.fixture
+def polls(monkeypatch):
+    """Counts the polling fallbacks taken by _run_sdxl_prediction"""
+    calls = []
+    poll = ImageGenerationService._poll_prediction
+
+    async def counting_poll(self, prediction_id, max_wait=120.0):
+        calls.append(max_wait)
+        return await poll(self, prediction_id, max_wait=max_wait)
+
+    monkeypatch.setattr(ImageGenerationService, "_poll_prediction", counting_poll)
+    return calls
+
+
+def only_prediction_id() -> str:
+    (prediction_id,) = stub_replicate.predictions
+    return prediction_id
+
+
+@pytest.mark.asyncio
+async def test_delivered_webhook_wakes_the_waiting_prediction(stub_server, redis, polls, monkeypatch):
+    monkeypatch.setattr(settings, "PROVIDER_TIMEOUT_SECONDS", 10.0)
+    monkeypatch.setattr(image_generation_service, "SDXL_POLL_RESERVE_SECONDS", 2.0)
+    loop = asyncio.get_running_loop()
+
+    started = loop.time()
+    urls = await ImageGenerationService()._run_sdxl_prediction("a bright living room", "blurry", 2)
+    elapsed = loop.time() - started
+
+    prediction_id = only_prediction_id()
+    assert urls == stub_replicate.predictions[prediction_id]["output"]
+    assert len(urls) == 2
+    # Woken by the signed webhook well before the webhook wait ran out
+    assert polls == []
+    assert elapsed < 2.0
+    assert await redis.get(PREDICTION_KEY.format(id=prediction_id)) is not None
+
+
+@pytest.mark.asyncio
+async def test_dropped_webhook_falls_back_to_polling_at_the_deadline(stub_server, redis, polls, monkeypatch):
+    # The stub signs with another key, so the endpoint rejects the webhook
+    other_secret = "whsec_" + base64.b64encode(b"not-the-configured-key").decode()
+    monkeypatch.setattr(stub_replicate, "WEBHOOK_SECRET", other_secret)
+    monkeypatch.setattr(settings, "PROVIDER_TIMEOUT_SECONDS", 4.0)
+    monkeypatch.setattr(image_generation_service, "SDXL_POLL_RESERVE_SECONDS", 2.0)
+    loop = asyncio.get_running_loop()
+
+    started = loop.time()
+    urls = await ImageGenerationService()._run_sdxl_prediction("a bright living room", "blurry")
+    elapsed = loop.time() - started
+
+    prediction_id = only_prediction_id()
+    assert urls == stub_replicate.predictions[prediction_id]["output"]
+    assert await redis.get(PREDICTION_KEY.format(id=prediction_id)) is None
+    # Waited out the webhook, leaving the poll reserve, then polled once
+    assert len(polls) == 1
+    assert 2.0 - 0.1 <= elapsed < 4.0
+    assert 0 < polls[0] <= 2.0
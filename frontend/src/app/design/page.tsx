@@ -46,6 +46,8 @@ export default function DesignPage() {
   
   const [currentStep, setCurrentStep] = useState(1)
   const [projectInfo, setProjectInfo] = useState<ProjectInfo | null>(null)
+  // Analysis job behind the shown result, and the language it was rendered in
+  const [analysisSource, setAnalysisSource] = useState<{ jobId: string; language: string } | null>(null)
   const { 
     uploadedImage, 
     setUploadedImage, 
@@ -83,6 +85,26 @@ export default function DesignPage() {
     }
   }, [projectId, setCurrentProjectId])
 
+  // Re-localize a finished analysis when the language is switched; the backend
+  // renders the stored result again instead of re-analyzing the photo
+  useEffect(() => {
+    if (!analysisSource || analysisSource.language === language || !analysis) return
+    let cancelled = false
+    import('@/lib/api').then(({ analysisApi }) => analysisApi.getStatus(analysisSource.jobId, language))
+      .then(status => {
+        if (!cancelled && status.status === 'completed' && status.result) {
+          setAnalysis(toAnalysis(status.result))
+          setAnalysisSource({ jobId: analysisSource.jobId, language })
+        }
+      })
+      .catch(err => {
+        console.error('Failed to load analysis in the selected language:', err)
+      })
+    return () => {
+      cancelled = true
+    }
+  }, [language, analysisSource])
+
   // Texts for both languages
   const texts = {
     zh: {
@@ -142,10 +164,22 @@ export default function DesignPage() {
   const txt = texts[language]
   const steps = txt.steps
 
+  const toAnalysis = (result: any) => ({
+    roomType: result.room_type || 'living',
+    dimensions: result.dimensions || { width: 4.0, length: 5.0, height: 2.8 },
+    existingFurniture: result.existing_furniture || [],
+    currentStyle: result.current_style || '未识别',
+    lighting: result.lighting || '一般',
+    problems: result.problems || [],
+    potential: result.potential || '有改造空间',
+    confidence: result.confidence || 0.7
+  })
+
   const handleImageUpload = async (file: File, preview: string) => {
     // Clear previous designs when uploading new image
     setDesigns([])
     setSelectedDesign(null)
+    setAnalysisSource(null)
     
     setUploadedImage(preview)
     setIsAnalyzing(true)
@@ -164,20 +198,11 @@ export default function DesignPage() {
       
       const pollStatus = async () => {
         attempts++
-        const status = await analysisApi.getStatus(jobId)
+        const status = await analysisApi.getStatus(jobId, language)
         
         if (status.status === 'completed' && status.result) {
-          const result = status.result
-          setAnalysis({
-            roomType: result.room_type || 'living',
-            dimensions: result.dimensions || { width: 4.0, length: 5.0, height: 2.8 },
-            existingFurniture: result.existing_furniture || [],
-            currentStyle: result.current_style || '未识别',
-            lighting: result.lighting || '一般',
-            problems: result.problems || [],
-            potential: result.potential || '有改造空间',
-            confidence: result.confidence || 0.7
-          })
+          setAnalysis(toAnalysis(status.result))
+          setAnalysisSource({ jobId, language })
           setIsAnalyzing(false)
         } else if (status.status === 'failed') {
           console.error('Analysis failed:', status.error)
@@ -235,6 +260,7 @@ export default function DesignPage() {
   const handleRemoveImage = () => {
     setUploadedImage(null)
     setAnalysis(null)
+    setAnalysisSource(null)
     // Clear designs when removing image
     setDesigns([])
     setSelectedDesign(null)
@@ -49,8 +49,9 @@ export const analysisApi = {
     return response.data
   },
   
-  getStatus: async (jobId: string) => {
-    const response = await api.get(`/analysis/status/${jobId}`)
+  getStatus: async (jobId: string, language?: string) => {
+    const query = language ? `?language=${language}` : ''
+    const response = await api.get(`/analysis/status/${jobId}${query}`)
     return response.data
   },
   
@@ -137,7 +138,48 @@ export const furnitureApi = {
     })
     return response.data
   },
-  
+
+  // Stream matches via SSE so each product renders as soon as it is recommended.
+  // Returns a function that closes the stream.
+  matchStream: (
+    params: {
+      style: string
+      roomType: string
+      budget: number
+      userNeeds?: string
+      region?: string
+      language?: string
+      existingFurniture?: string[]
+    },
+    onProduct: (product: any) => void,
+    onDone?: (summary: { count: number; total_cost: number; within_budget: boolean }) => void,
+    onError?: (error: Event) => void,
+  ) => {
+    const query = new URLSearchParams({
+      style: params.style,
+      room_type: params.roomType,
+      budget: String(params.budget),
+      user_needs: params.userNeeds || '',
+      region: params.region || 'CA',
+      language: params.language || 'zh',
+    })
+    params.existingFurniture?.forEach((item) => query.append('existing_furniture', item))
+
+    const source = new EventSource(`${API_BASE_URL}/furniture/match/stream?${query.toString()}`)
+    source.addEventListener('product', (event) => {
+      onProduct(JSON.parse((event as MessageEvent).data))
+    })
+    source.addEventListener('done', (event) => {
+      onDone?.(JSON.parse((event as MessageEvent).data))
+      source.close()
+    })
+    source.onerror = (event) => {
+      onError?.(event)
+      source.close()
+    }
+    return () => source.close()
+  },
+
   createShoppingList: async (designId: string, items: any[]) => {
     const response = await api.post('/furniture/shopping-list/create', {
       design_id: designId,